@@ -0,0 +1,88 @@
+"""
+Compares the encode/decode throughput of the alias based camel case codecs of
+the models against the previous per-call key conversion, which rebuilt every
+key using `to_camel_case_dict`/`to_snake_case_dict`.
+
+Usage:
+    python benchmarks/bench_codecs.py [--number 20000]
+"""
+
+import argparse
+import timeit
+
+from zibal.models.schemas import (
+    TransactionInquiryResponse,
+    TransactionRequireRequest,
+)
+from zibal.response_codes import STATUS_CODES, WAGE_CODES
+from zibal.utils import to_camel_case_dict, to_snake_case_dict
+
+REQUEST_MODEL = TransactionRequireRequest(
+    merchant="zibal",
+    amount=25000,
+    callback_url="https://somecallbackurl.com",
+    description="Order 12",
+    order_id="12",
+    mobile="09123456789",
+)
+
+INQUIRY_RESPONSE = {
+    "message": "success",
+    "result": 100,
+    "refNumber": None,
+    "paidAt": "2024-08-16T21:47:16.541000",
+    "verifiedAt": "2024-08-16T21:47:50.629000",
+    "status": 1,
+    "amount": 25000,
+    "orderId": "",
+    "description": "",
+    "cardNumber": None,
+    "multiplexingInfos": [],
+    "wage": 0,
+    "shaparakFee": 1200,
+    "createdAt": "2024-08-16T21:45:02.686000",
+}
+
+
+def legacy_encode():
+    return to_camel_case_dict(REQUEST_MODEL.model_dump(exclude_none=True, mode="json"))
+
+
+def encode():
+    return REQUEST_MODEL.model_dump_to_camel(exclude_none=True, mode="json")
+
+
+def legacy_decode():
+    data = to_snake_case_dict(INQUIRY_RESPONSE)
+    data["status_meaning"] = STATUS_CODES.get(data["status"], "Unknown status")
+    data["wage_meaning"] = WAGE_CODES.get(data["wage"], "Unknown wage")
+    return TransactionInquiryResponse(**data)
+
+
+def decode():
+    return TransactionInquiryResponse.from_camel_case(INQUIRY_RESPONSE)
+
+
+def report(name: str, func, number: int) -> float:
+    elapsed = min(timeit.repeat(func, number=number, repeat=5))
+    ops = number / elapsed
+    print(f"{name:<16} {ops:>12,.0f} ops/s")
+    return ops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for name, legacy, current in (
+        ("encode", legacy_encode, encode),
+        ("decode", legacy_decode, decode),
+    ):
+        legacy_ops = report(f"{name} (legacy)", legacy, args.number)
+        current_ops = report(name, current, args.number)
+        print(f"{'speedup':<16} {current_ops / legacy_ops:>12.2f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Measures the cost of opening a new TCP+TLS connection for every IPG call
+(module level `requests.post`) against the pooled keep-alive session owned by
+`ZibalIPGClient`.
+
+A local HTTPS stand-in of the IPG is started on a random port using a
+throwaway self-signed certificate (generated with the `openssl` CLI), so the
+numbers only reflect the connection handling of the client.
+
+Usage:
+    python benchmarks/bench_connection_pool.py [--calls 300]
+"""
+
+import argparse
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from zibal.client import ZibalIPGClient
+
+INQUIRY_RESPONSE = {
+    "message": "success",
+    "result": 100,
+    "refNumber": None,
+    "paidAt": "2024-08-16T21:47:16.541000",
+    "verifiedAt": "2024-08-16T21:47:50.629000",
+    "status": 1,
+    "amount": 25000,
+    "orderId": "",
+    "description": "",
+    "cardNumber": None,
+    "multiplexingInfos": [],
+    "wage": 0,
+    "shaparakFee": 1200,
+    "createdAt": "2024-08-16T21:45:02.686000",
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = set()
+
+    def setup(self):
+        super().setup()
+        self.connections.add(self.client_address)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(INQUIRY_RESPONSE).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def create_certificate(directory: str) -> tuple[str, str]:
+    cert_file = os.path.join(directory, "cert.pem")
+    key_file = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-days", "1", "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost",
+            "-keyout", key_file, "-out", cert_file,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert_file, key_file
+
+
+def start_server(cert_file: str, key_file: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("localhost", 0), StandInHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_unpooled(base_url: str, cert_file: str, calls: int) -> float:
+    payload = {"merchant": "zibal", "trackId": 1}
+    start = time.perf_counter()
+    for _ in range(calls):
+        requests.post(base_url + "inquiry", json=payload, verify=cert_file).json()
+    return time.perf_counter() - start
+
+
+def bench_pooled(base_url: str, cert_file: str, calls: int) -> float:
+    with ZibalIPGClient("zibal", base_url=base_url) as client:
+        # environment CA bundles would otherwise take precedence over the
+        # stand-in's certificate
+        client.session.trust_env = False
+        client.session.verify = cert_file
+        start = time.perf_counter()
+        for _ in range(calls):
+            client.inquiry_transaction(track_id=1)
+        return time.perf_counter() - start
+
+
+def report(name: str, elapsed: float, calls: int, connections: int) -> None:
+    print(
+        f"{name:<10} {calls / elapsed:>10.1f} calls/s "
+        f"{elapsed / calls * 1000:>8.3f} ms/call {connections:>6} connections"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_file, key_file = create_certificate(directory)
+        server = start_server(cert_file, key_file)
+        base_url = f"https://localhost:{server.server_address[1]}/v1/"
+        try:
+            StandInHandler.connections.clear()
+            elapsed = bench_unpooled(base_url, cert_file, args.calls)
+            report("unpooled", elapsed, args.calls, len(StandInHandler.connections))
+
+            StandInHandler.connections.clear()
+            elapsed = bench_pooled(base_url, cert_file, args.calls)
+            report("pooled", elapsed, args.calls, len(StandInHandler.connections))
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures the end to end throughput and tail latency of the client against
+the local fake gateway, going through the client's real network path.
+
+Each worker thread runs full payment flows: request a transaction, pay it
+through the payment link, verify it and inquire it.
+
+Usage:
+    python benchmarks/bench_end_to_end.py [--flows 500] [--threads 8]
+        [--latency 0.005] [--error-rate 0.0]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import RequestError
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.instrumentation import LatencyRecorder
+
+
+def run_flow(client: ZibalIPGClient, payment_session: requests.Session, gateway):
+    try:
+        track_id = client.request_transaction(
+            amount=25000, callback_url="https://localhost:8000/"
+        ).track_id
+        payment_session.get(
+            gateway.payment_base_url + str(track_id), allow_redirects=False
+        )
+        client.verify_transaction(track_id)
+        client.inquiry_transaction(track_id)
+        return True
+    except RequestError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flows", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    recorder = LatencyRecorder()
+    with FakeZibalGateway(latency=args.latency, error_rate=args.error_rate) as gateway:
+        with ZibalIPGClient(
+            "zibal", base_url=gateway.base_url, pool_maxsize=args.threads
+        ) as client, requests.Session() as payment_session:
+            client.add_hook(recorder)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: run_flow(client, payment_session, gateway),
+                        range(args.flows),
+                    )
+                )
+            elapsed = time.perf_counter() - start
+
+    calls = args.flows * 3
+    print(
+        f"{args.flows} flows ({calls} client calls) in {elapsed:.2f}s: "
+        f"{calls / elapsed:,.0f} calls/s, {results.count(False)} failed flows"
+    )
+    for endpoint in ("request", "verify", "inquiry"):
+        percentiles = recorder.percentiles(endpoint)
+        print(
+            f"{endpoint:<8} "
+            + " ".join(
+                f"p{percent}={value * 1000:.2f}ms"
+                for percent, value in percentiles.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
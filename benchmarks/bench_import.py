@@ -0,0 +1,55 @@
+"""
+Measures the cold import time of the client modules in fresh interpreters
+using `python -X importtime`, and lists the slowest imported modules.
+
+Usage:
+    python benchmarks/bench_import.py [--module zibal.client] [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """
+    Import the module in a fresh interpreter and return the `(name, self,
+    cumulative)` import times of every imported module in microseconds.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    ).stderr
+    times = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(self_time), int(cumulative)))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="zibal.client")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: dict((n, c) for n, _, c in times)[args.module])
+    cumulative = {name: total for name, _, total in best}
+    zibal_self = sum(self_time for name, self_time, _ in best if name.startswith("zibal"))
+    print(f"import {args.module}: {cumulative[args.module] / 1000:.1f} ms (best of {args.runs})")
+    print(f"self time of zibal modules: {zibal_self / 1000:.1f} ms\n")
+    print(f"{'module':<50} {'self ms':>8}")
+    for name, self_time, _ in sorted(best, key=lambda item: -item[1])[: args.top]:
+        print(f"{name:<50} {self_time / 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares the per-response CPU cost of the strict decoding (`response.json()`
+and full pydantic validation) against the trusted decoding mode (`orjson`
+when installed and construct-style models without validation).
+
+Usage:
+    python benchmarks/bench_trusted_decode.py [--number 20000]
+"""
+
+import argparse
+import json
+import timeit
+
+import requests
+
+from zibal.client import ZibalIPGClient, json_loads
+from zibal.models.schemas import TransactionInquiryResponse
+
+INQUIRY_RESPONSE = {
+    "message": "success",
+    "result": 100,
+    "refNumber": 1234567890,
+    "paidAt": "2024-08-16T21:47:16.541000",
+    "verifiedAt": "2024-08-16T21:47:50.629000",
+    "status": 1,
+    "amount": 25000,
+    "orderId": "12",
+    "description": "Order 12",
+    "cardNumber": "603788******6713",
+    "multiplexingInfos": [],
+    "wage": 0,
+    "shaparakFee": 1200,
+    "createdAt": "2024-08-16T21:45:02.686000",
+}
+
+
+def make_response() -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(INQUIRY_RESPONSE).encode()
+    response.encoding = "utf-8"
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    response = make_response()
+    print(f"JSON decoder for trusted mode: {json_loads.__module__}")
+    results = {}
+    for name, trusted_decode in (("strict", False), ("trusted", True)):
+        client = ZibalIPGClient("zibal", trusted_decode=trusted_decode)
+
+        def decode():
+            response_data = client._handle_response("inquiry", {}, response)
+            return client._build_result(response_data, TransactionInquiryResponse)
+
+        elapsed = min(timeit.repeat(decode, number=args.number, repeat=5))
+        results[name] = elapsed / args.number
+        print(f"{name:<8} {results[name] * 1e6:>8.2f} us/response")
+    print(f"saving   {1 - results['trusted'] / results['strict']:>8.1%} per response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark suite of the client's hot paths, with baselines for catching
+performance regressions locally.
+
+Each benchmark reports its throughput in ops/sec and the peak memory
+allocated by a single op (measured using tracemalloc).
+
+Usage:
+    # record a baseline on this machine
+    python benchmarks/suite.py --save
+
+    # compare against the baseline, exits with status 1 on a regression
+    python benchmarks/suite.py --check [--tolerance 0.25]
+
+    # only run the benchmarks whose name contains the given string
+    python benchmarks/suite.py -k round_trip
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Callable
+
+from zibal.client import ZibalIPGClient
+from zibal.models.schemas import (
+    TransactionInquiryResponse,
+    TransactionRequireRequest,
+    TransactionVerifyResponse,
+)
+from zibal.transport import FakeTransport
+from zibal.utils import convert_to_snake_case
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), ".baseline.json")
+
+REQUIRE_RESPONSE = {"message": "success", "result": 100, "trackId": 3714061657}
+VERIFY_RESPONSE = {
+    "message": "success",
+    "result": 100,
+    "refNumber": None,
+    "paidAt": "2024-08-16T21:47:16.541000",
+    "status": 1,
+    "amount": 25000,
+    "orderId": "",
+    "description": "",
+    "cardNumber": None,
+    "multiplexingInfos": [],
+}
+INQUIRY_RESPONSE = {
+    **VERIFY_RESPONSE,
+    "verifiedAt": "2024-08-16T21:47:50.629000",
+    "wage": 0,
+    "shaparakFee": 1200,
+    "createdAt": "2024-08-16T21:45:02.686000",
+}
+
+
+def fake_client() -> ZibalIPGClient:
+    transport = FakeTransport(
+        {"request": REQUIRE_RESPONSE, "verify": VERIFY_RESPONSE}
+    )
+    return ZibalIPGClient("zibal", transport=transport)
+
+
+def benchmarks() -> dict[str, Callable[[], object]]:
+    request_model = TransactionRequireRequest(
+        merchant="zibal",
+        amount=25000,
+        callback_url="https://somecallbackurl.com",
+        order_id="12",
+    )
+    client = fake_client()
+    return {
+        "require_request_model": lambda: TransactionRequireRequest(
+            merchant="zibal",
+            amount=25000,
+            callback_url="https://somecallbackurl.com",
+            order_id="12",
+        ),
+        "model_dump_to_camel": lambda: request_model.model_dump_to_camel(
+            exclude_none=True, mode="json"
+        ),
+        "verify_from_camel_case": lambda: TransactionVerifyResponse.from_camel_case(
+            VERIFY_RESPONSE
+        ),
+        "inquiry_from_camel_case": lambda: TransactionInquiryResponse.from_camel_case(
+            INQUIRY_RESPONSE
+        ),
+        "convert_to_snake_case": lambda: convert_to_snake_case("multiplexingInfos"),
+        "request_round_trip": lambda: client.request_transaction(
+            amount=25000, callback_url="https://somecallbackurl.com"
+        ),
+        "verify_round_trip": lambda: client.verify_transaction(track_id=3714061657),
+    }
+
+
+def measure(func: Callable[[], object], min_time: float) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=5, number=number))
+
+    func()  # warm up any lazily built state before tracing
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops_per_sec": number / best, "peak_alloc_bytes": peak}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:,.0f} ops/s is slower than the "
+                f"baseline {base['ops_per_sec']:,.0f} ops/s"
+            )
+        if result["peak_alloc_bytes"] > base["peak_alloc_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {result['peak_alloc_bytes']:,} bytes allocated is more "
+                f"than the baseline {base['peak_alloc_bytes']:,} bytes"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--save", action="store_true", help="save the results as baseline")
+    parser.add_argument("--check", action="store_true", help="compare against baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("-k", dest="keyword", default="")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.check:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {}
+    print(f"{'benchmark':<26} {'ops/s':>12} {'peak alloc':>12} {'vs baseline':>12}")
+    for name, func in benchmarks().items():
+        if args.keyword not in name:
+            continue
+        result = results[name] = measure(func, args.min_time)
+        change = ""
+        if name in baseline:
+            ratio = result["ops_per_sec"] / baseline[name]["ops_per_sec"] - 1
+            change = f"{ratio:+.1%}"
+        print(
+            f"{name:<26} {result['ops_per_sec']:>12,.0f} "
+            f"{result['peak_alloc_bytes']:>10,} B {change:>12}"
+        )
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.check:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n" + "\n".join(regressions))
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,30 @@
-__version__ = '0.1.2'
\ No newline at end of file
+__version__ = '0.1.2'
+
+# The public classes are importable from the package itself, but are only
+# imported on first access, so importing a single module stays fast.
+_LAZY_IMPORTS = {
+    "ZibalIPGClient": "zibal.client",
+    "AsyncZibalIPGClient": "zibal.async_client",
+    "ZibalClientPool": "zibal.client_pool",
+    "InquiryCache": "zibal.cache",
+    "RetryPolicy": "zibal.resilience",
+    "CircuitBreaker": "zibal.resilience",
+    "RateLimiter": "zibal.ratelimit",
+}
+
+__all__ = ["__version__", *_LAZY_IMPORTS]
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(__all__)
@@ -0,0 +1,280 @@
+import asyncio
+from collections import deque
+from logging import Logger
+from typing import AsyncIterator, Callable, Iterable, Optional, Union
+
+from pydantic import HttpUrl
+
+from zibal.cache import InquiryCache
+from zibal.client import BULK_CAPTURED_ERRORS, BaseZibalIPGClient, ZibalEndPoints
+from zibal.configs import IPG_BASE_URL
+from zibal.models.schemas import (
+    FailedResultDetail,
+    TransactionInquiryResponse,
+    TransactionRequireResponse,
+    TransactionVerifyResponse,
+)
+from zibal.templates import JSON_HEADERS, EncodedRequestData, RequestTemplate
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+class AsyncZibalIPGClient(BaseZibalIPGClient):
+    """
+    The asyncio twin of `ZibalIPGClient`, with the same methods and return
+    types, but all of the network related methods are coroutines.
+
+    Requires the optional `httpx` dependency, which can be installed using
+    `pip install zibal-client[async]`.
+
+    All of the calls share a pooled `httpx.AsyncClient`, where
+    `max_connections` is the maximum number of concurrent connections and
+    `max_keepalive_connections` is the number of idle connections kept alive
+    for reuse. The client should be used as an async context manager, or
+    `aclose` should be awaited explicitly to release the pooled connections.
+    """
+
+    def __init__(
+        self,
+        merchant: str,
+        raise_on_invalid_result: bool = False,
+        request_timeout: int = 7,
+        logger: Optional[Logger] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        base_url: str = IPG_BASE_URL,
+        inquiry_cache: Optional[InquiryCache] = None,
+        log_sample_rate: float = 1.0,
+        trusted_decode: bool = False,
+    ):
+        if httpx is None:
+            raise ImportError(
+                "httpx is required for AsyncZibalIPGClient, install it using "
+                "`pip install zibal-client[async]`"
+            )
+        super().__init__(
+            merchant=merchant,
+            raise_on_invalid_result=raise_on_invalid_result,
+            request_timeout=request_timeout,
+            logger=logger,
+            base_url=base_url,
+            inquiry_cache=inquiry_cache,
+            log_sample_rate=log_sample_rate,
+            trusted_decode=trusted_decode,
+        )
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=request_timeout,
+        )
+
+    async def aclose(self) -> None:
+        """Close the session and release all of the pooled connections."""
+        await self.session.aclose()
+
+    async def __aenter__(self) -> "AsyncZibalIPGClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _call_captured(self, func: Callable, track_id: int):
+        try:
+            return await func(track_id)
+        except BULK_CAPTURED_ERRORS as err:
+            return err
+
+    async def _run_many(
+        self,
+        func: Callable,
+        track_ids: Iterable[int],
+        max_concurrency: int,
+        ordered: bool,
+    ) -> AsyncIterator[tuple]:
+        """
+        Await `func` for each of the track ids with at most `max_concurrency`
+        calls in flight and yield `(track_id, result)` pairs. If `ordered` is
+        True, the results are yielded in the same order as `track_ids`,
+        otherwise they are yielded as they complete.
+        """
+        pending: deque[tuple[int, asyncio.Task]] = deque()
+        track_ids = iter(track_ids)
+        try:
+            while True:
+                for track_id in track_ids:
+                    task = asyncio.ensure_future(self._call_captured(func, track_id))
+                    pending.append((track_id, task))
+                    if len(pending) >= max_concurrency:
+                        break
+                if not pending:
+                    return
+                if ordered:
+                    track_id, task = pending.popleft()
+                    yield track_id, await task
+                    continue
+                await asyncio.wait(
+                    [task for _, task in pending], return_when=asyncio.FIRST_COMPLETED
+                )
+                for item in [item for item in pending if item[1].done()]:
+                    pending.remove(item)
+                    yield item[0], item[1].result()
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def _process_request(self, endpoint: ZibalEndPoints, data: dict) -> dict:
+        url = self.base_url + endpoint
+        try:
+            if isinstance(data, EncodedRequestData):
+                response = await self.session.post(
+                    url=url, content=data.body, headers=JSON_HEADERS
+                )
+            else:
+                response = await self.session.post(url=url, json=data)
+        except httpx.HTTPError as err:
+            raise self._handle_request_exception(endpoint, data, err)
+        return self._handle_response(endpoint, data, response)
+
+    async def check_service_status(self) -> bool:
+        """
+        Check to see if the service is up and running, will log errors if
+        there are any errors.
+        """
+        try:
+            response = await self.session.head(self.base_url)
+            if response.status_code != 200:
+                response_content = str(response.content)
+                self.logger.warning(
+                    "Unexpected response status code on service check:"
+                    f"{response.status_code} content: {response_content}"
+                )
+                return False
+
+        except httpx.HTTPError as err:
+            self.logger.warning(
+                f"A network request error has occured on service check: {err}"
+            )
+            return False
+
+        return True
+
+    async def request_transaction(
+        self,
+        amount: int,
+        callback_url: HttpUrl,
+        description: Optional[str] = None,
+        order_id: Optional[str] = None,
+        mobile: Optional[str] = None,
+        allowed_cards: Optional[list[str]] = None,
+        ledger_id: Optional[str] = None,
+    ) -> Union[TransactionRequireResponse, FailedResultDetail]:
+        """
+        Send a request to Zibal's IPG to initiate a new payment transaction.
+        """
+        request_data = self._build_require_data(
+            amount=amount,
+            callback_url=callback_url,
+            description=description,
+            order_id=order_id,
+            mobile=mobile,
+            allowed_cards=allowed_cards,
+            ledger_id=ledger_id,
+        )
+        response_data = await self._process_request(
+            ZibalEndPoints.REQUEST, request_data
+        )
+        return self._build_result(response_data, TransactionRequireResponse)
+
+    async def request_transaction_from_template(
+        self,
+        template: RequestTemplate,
+        amount: int,
+        order_id: Optional[str] = None,
+        mobile: Optional[str] = None,
+    ) -> Union[TransactionRequireResponse, FailedResultDetail]:
+        """
+        Same as `request_transaction`, but the fixed fields are taken from the
+        template, and only the per order fields are validated and encoded.
+        """
+        request_data = template.build(amount, order_id=order_id, mobile=mobile)
+        response_data = await self._process_request(
+            ZibalEndPoints.REQUEST, request_data
+        )
+        return self._build_result(response_data, TransactionRequireResponse)
+
+    async def verify_transaction(
+        self, track_id: int
+    ) -> Union[TransactionVerifyResponse, FailedResultDetail]:
+        """
+        Sends a HTTP request for verifying an already started transaction,
+        which will mark the end of the transaction.
+        """
+        request_data = self._build_verify_data(track_id)
+        response_data = await self._process_request(
+            ZibalEndPoints.VERIFY, data=request_data
+        )
+        result = self._build_result(response_data, TransactionVerifyResponse)
+        self._invalidate_cached_inquiry(track_id, result)
+        return result
+
+    async def inquiry_transaction(
+        self, track_id: int
+    ) -> Union[TransactionInquiryResponse, FailedResultDetail]:
+        """
+        Sends a HTTP request to retrieve the given transaction info.
+        """
+        cached_result = self._get_cached_inquiry(track_id)
+        if cached_result is not None:
+            return cached_result
+        request_data = self._build_inquiry_data(track_id)
+        response_data = await self._process_request(
+            ZibalEndPoints.INQUIRY, request_data
+        )
+        result = self._build_result(response_data, TransactionInquiryResponse)
+        self._cache_inquiry(track_id, result)
+        return result
+
+    def verify_many(
+        self,
+        track_ids: Iterable[int],
+        max_concurrency: int = 10,
+        ordered: bool = True,
+    ) -> AsyncIterator[
+        tuple[int, Union[TransactionVerifyResponse, FailedResultDetail, Exception]]
+    ]:
+        """
+        Verify the given transactions with at most `max_concurrency` calls in
+        flight, yielding `(track_id, result)` pairs as an async iterator.
+
+        Errors of a single item such as a `RequestError` are captured and
+        yielded as its result, so one bad item never aborts the batch.
+        If `ordered` is False, results are yielded as soon as they complete.
+        """
+        return self._run_many(
+            self.verify_transaction, track_ids, max_concurrency, ordered
+        )
+
+    def inquiry_many(
+        self,
+        track_ids: Iterable[int],
+        max_concurrency: int = 10,
+        ordered: bool = True,
+    ) -> AsyncIterator[
+        tuple[int, Union[TransactionInquiryResponse, FailedResultDetail, Exception]]
+    ]:
+        """
+        Inquiry the given transactions with at most `max_concurrency` calls in
+        flight, yielding `(track_id, result)` pairs as an async iterator.
+
+        Errors of a single item such as a `RequestError` are captured and
+        yielded as its result, so one bad item never aborts the batch.
+        If `ordered` is False, results are yielded as soon as they complete.
+        """
+        return self._run_many(
+            self.inquiry_transaction, track_ids, max_concurrency, ordered
+        )
@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional
+
+from zibal.models.schemas import TransactionInquiryResponse
+
+# Transactions in these states can still change, so they are only cached
+# briefly (i.e. 'Waiting for payment', 'Internal Error' and 'Paid and unverified').
+TRANSIENT_STATUS_CODES = frozenset({-1, -2, 2})
+
+DEFAULT_TERMINAL_TTL = 3600.0
+DEFAULT_TRANSIENT_TTL = 5.0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class InquiryCache:
+    """
+    A thread-safe in-memory LRU cache for inquiry responses, keyed by
+    `(merchant, track_id)`.
+
+    The time to live of each entry depends on the `status` of the cached
+    response; transactions in a terminal state (such as 'Paid and verified'
+    or 'Cancelled by user') are kept for `terminal_ttl` seconds, while the
+    ones which can still change state are kept for `transient_ttl` seconds.
+    `status_ttls` can be used to override the TTL of specific status codes.
+
+    Once the cache holds `max_size` entries, the least recently used entry
+    is evicted.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        terminal_ttl: float = DEFAULT_TERMINAL_TTL,
+        transient_ttl: float = DEFAULT_TRANSIENT_TTL,
+        status_ttls: Optional[dict[int, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.terminal_ttl = terminal_ttl
+        self.transient_ttl = transient_ttl
+        self.status_ttls = status_ttls or {}
+        self.stats = CacheStats()
+        self._clock = clock
+        # maps (merchant, track_id) keys to (expires_at, response) entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, response: TransactionInquiryResponse) -> float:
+        """Returns the time to live of the given response based on its status."""
+        if response.status in self.status_ttls:
+            return self.status_ttls[response.status]
+        if response.status is None or response.status in TRANSIENT_STATUS_CODES:
+            return self.transient_ttl
+        return self.terminal_ttl
+
+    def get(self, merchant: str, track_id: int) -> Optional[TransactionInquiryResponse]:
+        key = (merchant, track_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, response = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return response
+
+    def set(
+        self, merchant: str, track_id: int, response: TransactionInquiryResponse
+    ) -> None:
+        ttl = self.ttl_for(response)
+        if ttl <= 0:
+            return
+        key = (merchant, track_id)
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, merchant: str, track_id: int) -> None:
+        with self._lock:
+            self._entries.pop((merchant, track_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,384 @@
+"""
+Handling of the callback requests, which Zibal's IPG redirects the users to
+once they are done with the payment, without making the users wait for the
+verify request.
+
+The query parameters of the callback are validated and the verify is queued
+for a pool of background threads, so the callback can be answered right
+away; the page the user is redirected to can then poll the status endpoint
+(optionally waiting for the verify to complete) for the final result:
+
+    verifier = CallbackVerifier(client).start()
+
+    # a WSGI app, e.g. mounted by a WSGI server or a framework
+    app = CallbackWSGIApp(verifier, redirect_url="/orders/{order_id}")
+
+    # or an ASGI app
+    app = CallbackASGIApp(verifier, redirect_url="/orders/{order_id}")
+
+    GET /callback?success=1&trackId=...&orderId=...&status=2
+        -> 302 to redirect_url (or 202 with the state if not set)
+    GET /status?trackId=...[&wait=10]
+        -> 200 with the state and the result of the verify
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+from typing import Callable, Iterable, Optional, Union
+from urllib.parse import parse_qs, quote
+
+from pydantic import ValidationError
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import ResultError
+from zibal.models.schemas import (
+    FailedResultDetail,
+    TransactionCallbackQueryParams,
+    TransactionVerifyResponse,
+    get_failed_result_detail,
+)
+
+PENDING = "pending"
+VERIFIED = "verified"
+FAILED = "failed"
+ERROR = "error"
+
+# Verifying an already verified transaction results in 201, which is still
+# reported as verified, e.g. if the callback was verified by another handler.
+ALREADY_VERIFIED_RESULT = 201
+
+
+class CallbackQueueFull(Exception):
+    """Used when a verify can't be queued, since the queue of the verifier is full."""
+
+    pass
+
+
+@dataclass
+class CallbackState:
+    track_id: int
+    order_id: str
+    state: str = PENDING
+    result: Optional[Union[TransactionVerifyResponse, FailedResultDetail]] = None
+    error: Optional[str] = None
+    updated_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        result = None
+        if self.result is not None:
+            result = self.result.model_dump(by_alias=True, mode="json")
+        return {
+            "trackId": self.track_id,
+            "orderId": self.order_id,
+            "state": self.state,
+            "result": result,
+            "error": self.error,
+        }
+
+
+class CallbackVerifier:
+    """
+    Verifies the transactions of the callbacks on `workers` background
+    threads using the client.
+
+    At most `max_queue` verifies wait in the queue; once it's full, `submit`
+    raises a `CallbackQueueFull` instead of blocking, so the callers can
+    shed the load (e.g. answer with a 503 status code). Callbacks of a
+    track id which is already queued or verified are deduplicated, and the
+    states of the last `max_states` callbacks are kept for polling.
+    """
+
+    def __init__(
+        self,
+        client: ZibalIPGClient,
+        workers: int = 4,
+        max_queue: int = 1000,
+        max_states: int = 10000,
+    ):
+        self.client = client
+        self.workers = workers
+        self.max_states = max_states
+        self._queue: Queue = Queue(maxsize=max_queue)
+        self._states: OrderedDict[int, CallbackState] = OrderedDict()
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def submit(self, params: TransactionCallbackQueryParams) -> CallbackState:
+        """
+        Queue the verify of the callback's transaction if it's paid, and
+        return the state of the callback.
+        """
+        with self._condition:
+            state = self._states.get(params.track_id)
+            if state is not None and state.state != ERROR:
+                return state
+            state = CallbackState(
+                params.track_id, params.order_id, updated_at=time.monotonic()
+            )
+            if params.success != 1:
+                state.state = FAILED
+                self._store(state)
+                return state
+            try:
+                self._queue.put_nowait(state)
+            except Full:
+                raise CallbackQueueFull(
+                    f"Can't queue the verify of {params.track_id}, the queue is full"
+                ) from None
+            self._store(state)
+            return state
+
+    def get(self, track_id: int) -> Optional[CallbackState]:
+        with self._condition:
+            return self._states.get(track_id)
+
+    def wait(self, track_id: int, timeout: Optional[float] = None) -> Optional[CallbackState]:
+        """Wait until the callback's verify is done, and return its state."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._states.get(track_id) is None
+                or self._states[track_id].state != PENDING,
+                timeout,
+            )
+            return self._states.get(track_id)
+
+    def start(self) -> "CallbackVerifier":
+        if not self._threads:
+            self._stopped.clear()
+            self._threads = [
+                threading.Thread(
+                    target=self._run, name=f"zibal-callback-verifier-{index}", daemon=True
+                )
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def stop(self, drain: bool = True) -> None:
+        """Stop the workers, after verifying the queued callbacks if `drain`."""
+        if drain:
+            self._queue.join()
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _store(self, state: CallbackState) -> None:
+        self._states[state.track_id] = state
+        self._states.move_to_end(state.track_id)
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                state = self._queue.get(timeout=0.1)
+            except Empty:
+                continue
+            try:
+                self._verify(state)
+            finally:
+                self._queue.task_done()
+
+    def _verify(self, state: CallbackState) -> None:
+        error = None
+        try:
+            result = self.client.verify_transaction(state.track_id)
+        except ResultError as err:
+            # raised instead of returned if `raise_on_invalid_result` is set
+            result = None
+            if err.result_code is not None:
+                result = get_failed_result_detail(err.result_code)
+            new_state = VERIFIED if err.result_code == ALREADY_VERIFIED_RESULT else FAILED
+        except Exception as err:
+            new_state, result, error = ERROR, None, f"{type(err).__name__}: {err}"
+        else:
+            if isinstance(result, TransactionVerifyResponse) or (
+                result.result_code == ALREADY_VERIFIED_RESULT
+            ):
+                new_state = VERIFIED
+            else:
+                new_state = FAILED
+        with self._condition:
+            state.state = new_state
+            state.result = result
+            state.error = error
+            state.updated_at = time.monotonic()
+            self._condition.notify_all()
+
+
+Response = tuple[int, list[tuple[str, str]], bytes]
+
+
+class _CallbackApp:
+    """The request handling shared by the WSGI and ASGI apps."""
+
+    def __init__(
+        self,
+        verifier: CallbackVerifier,
+        redirect_url: Optional[str] = None,
+        callback_path: str = "/callback",
+        status_path: str = "/status",
+        max_wait: float = 30.0,
+        retry_after: int = 1,
+    ):
+        self.verifier = verifier
+        self.redirect_url = redirect_url
+        self.callback_path = callback_path
+        self.status_path = status_path
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+
+    def handle_callback(self, query: str) -> Response:
+        try:
+            params = TransactionCallbackQueryParams.from_query(
+                parse_qs(query, keep_blank_values=True)
+            )
+        except ValidationError as err:
+            return _json_response(
+                400,
+                {
+                    "message": "invalid callback",
+                    "errors": err.errors(include_url=False, include_context=False),
+                },
+            )
+        try:
+            state = self.verifier.submit(params)
+        except CallbackQueueFull as err:
+            return _json_response(
+                503, {"message": str(err)}, [("Retry-After", str(self.retry_after))]
+            )
+        if self.redirect_url is not None:
+            # the order id comes from the query string, so it's quoted to
+            # keep it from injecting headers or changing the redirect target
+            location = self.redirect_url.format(
+                track_id=params.track_id, order_id=quote(params.order_id, safe="")
+            )
+            return 302, [("Location", location), ("Content-Length", "0")], b""
+        return _json_response(202, state.to_dict())
+
+    def parse_status_query(self, query: str) -> Union[Response, tuple[int, float]]:
+        values = parse_qs(query)
+        try:
+            track_id = int(values["trackId"][-1])
+            wait = min(float(values.get("wait", ["0"])[-1]), self.max_wait)
+        except (KeyError, ValueError):
+            return _json_response(400, {"message": "invalid trackId or wait"})
+        return track_id, wait
+
+    def status_response(self, state: Optional[CallbackState]) -> Response:
+        if state is None:
+            return _json_response(404, {"message": "unknown trackId"})
+        return _json_response(200, state.to_dict())
+
+    def route(self, method: str, path: str) -> Optional[Callable]:
+        if method not in ("GET", "HEAD"):
+            return None
+        if path == self.callback_path:
+            return self.handle_callback
+        if path == self.status_path:
+            return self.parse_status_query
+        return None
+
+
+def _json_response(
+    status: int, data: dict, headers: Iterable[tuple[str, str]] = ()
+) -> Response:
+    body = json.dumps(data).encode()
+    return (
+        status,
+        [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            *headers,
+        ],
+        body,
+    )
+
+
+_NOT_FOUND = _json_response(404, {"message": "not found"})
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    302: "Found",
+    400: "Bad Request",
+    404: "Not Found",
+    503: "Service Unavailable",
+}
+
+
+class CallbackWSGIApp(_CallbackApp):
+    """
+    A WSGI app handling the callbacks and the status requests. A status
+    request with `wait` blocks the worker of the WSGI server until the
+    verify completes or `wait` seconds pass.
+    """
+
+    def __call__(self, environ: dict, start_response: Callable) -> list[bytes]:
+        handler = self.route(environ["REQUEST_METHOD"], environ.get("PATH_INFO", ""))
+        query = environ.get("QUERY_STRING", "")
+        if handler is None:
+            response = _NOT_FOUND
+        elif handler == self.handle_callback:
+            response = self.handle_callback(query)
+        else:
+            response = self.parse_status_query(query)
+            if len(response) == 2:
+                track_id, wait = response
+                if wait > 0:
+                    state = self.verifier.wait(track_id, wait)
+                else:
+                    state = self.verifier.get(track_id)
+                response = self.status_response(state)
+        status, headers, body = response
+        start_response(f"{status} {_REASONS[status]}", headers)
+        return [body]
+
+
+class CallbackASGIApp(_CallbackApp):
+    """
+    An ASGI app handling the callbacks and the status requests. A status
+    request with `wait` is answered once the verify completes or `wait`
+    seconds pass, without blocking the event loop.
+    """
+
+    poll_interval = 0.05
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            return
+        handler = self.route(scope["method"], scope["path"])
+        query = scope.get("query_string", b"").decode()
+        if handler is None:
+            response = _NOT_FOUND
+        elif handler == self.handle_callback:
+            response = self.handle_callback(query)
+        else:
+            response = self.parse_status_query(query)
+            if len(response) == 2:
+                track_id, wait = response
+                response = self.status_response(await self._wait(track_id, wait))
+        status, headers, body = response
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _wait(self, track_id: int, wait: float) -> Optional[CallbackState]:
+        deadline = time.monotonic() + wait
+        state = self.verifier.get(track_id)
+        while state is not None and state.state == PENDING and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            state = self.verifier.get(track_id)
+        return state
@@ -1,26 +1,68 @@
+import json
 import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from enum import Enum
+from functools import partial
 from logging import Logger
-from typing import Optional, Union
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Type,
+    Union,
+)
 
-import requests
-from pydantic import HttpUrl
-from requests.exceptions import RequestException
+from pydantic import HttpUrl, ValidationError
 
+from zibal.cache import InquiryCache
 from zibal.configs import IPG_BASE_URL, PAYMENT_BASE_URL
-from zibal.exceptions import RequestError, ResultError
+from zibal.exceptions import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    InvalidRequestDataError,
+    MerchantError,
+    RequestError,
+    ResultError,
+    ServiceUnavailableError,
+    TransactionStateError,
+)
+from zibal.health import HealthProber
+from zibal.instrumentation import CallHook, CallTimings, PhaseTimer
 from zibal.models.schemas import (
     FailedResultDetail,
+    TransactionBase,
     TransactionInquiryRequest,
     TransactionInquiryResponse,
     TransactionRequireRequest,
     TransactionRequireResponse,
     TransactionVerifyRequest,
     TransactionVerifyResponse,
+    get_failed_result_detail,
 )
-from zibal.response_codes import (
-    RESULT_CODES,
-)
+from zibal.ratelimit import RateLimiter
+from zibal.resilience import CircuitBreaker, RetryPolicy
+from zibal.singleflight import SingleFlight
+from zibal.templates import EncodedRequestData, RequestTemplate
+from zibal.transport import HTTPTransport, Transport
+
+if TYPE_CHECKING:
+    import requests
+
+    from zibal.journal import VerifyJournal
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:  # pragma: no cover
+    json_loads = json.loads
 
 
 class ZibalEndPoints(str, Enum):
@@ -29,16 +71,67 @@ class ZibalEndPoints(str, Enum):
     INQUIRY = "inquiry"
 
 
-class ZibalIPGClient:
+# Endpoints which are safe to be retried; a repeated verify request is
+# answered with the 201 'already verified' result code.
+IDEMPOTENT_ENDPOINTS = frozenset({ZibalEndPoints.VERIFY, ZibalEndPoints.INQUIRY})
+
+# Fields of the request data which are never written to the logs.
+REDACTED_FIELDS = frozenset({"merchant", "mobile", "nationalCode", "allowedCards"})
+
+
+def redact(data: dict) -> dict:
+    """Returns a copy of the request data with the sensitive fields masked."""
+    return {
+        key: "***" if key in REDACTED_FIELDS else value for key, value in data.items()
+    }
+
+
+# The exception raised for each failed result code, so the callers can
+# handle each family of failures by type instead of comparing messages.
+RESULT_ERRORS: Mapping[int, Type[ResultError]] = MappingProxyType(
+    {
+        102: MerchantError,
+        103: MerchantError,
+        104: MerchantError,
+        105: InvalidRequestDataError,
+        106: InvalidRequestDataError,
+        113: InvalidRequestDataError,
+        201: TransactionStateError,
+        202: TransactionStateError,
+        203: TransactionStateError,
+    }
+)
+
+# Exceptions which are captured per item in bulk operations, instead of
+# aborting the whole batch.
+BULK_CAPTURED_ERRORS = (RequestError, ResultError, ValidationError)
+
+# The logger of the clients created without one. Its NullHandler is added
+# once here, since adding it on each initialization piles up handlers.
+_default_logger = logging.getLogger(__name__)
+_default_logger.addHandler(logging.NullHandler())
+
+
+class BaseZibalIPGClient:
     """
-    For testing IPG API endpoints, sandbox mode can be enabled by setting
-    `merchant` to `zibal` when initializing the class.
+    Holds the request building and the response handling logic which is
+    shared between the sync and the async IPG clients. Subclasses are only
+    responsible for the network layer.
 
-    If `raise_on_invalid_result` flag is set to True , when calling transaction
-    related methods and the `result` code in the body of response is not 100,
-    a `ResultError` exception will be raised.
+    An `InquiryCache` instance can be passed as `inquiry_cache` for caching
+    inquiry responses; the cached entry of a transaction is invalidated once
+    it is verified through the client.
 
-    A `logger` instance can be passed for logging network requests.
+    Requests are logged with the structured `endpoint`, `track_id`, `result`
+    and `elapsed` fields passed as `extra` to the logger; the redacted
+    request data is also attached as `request_data` when DEBUG is enabled.
+    Log records are only built when their level is enabled, and only a
+    `log_sample_rate` fraction of the successful requests are logged.
+
+    If `trusted_decode` is set to True, the response bodies are parsed using
+    `orjson` (when it is installed) and the response models are constructed
+    without validation. It should only be enabled when the responses are
+    trusted, or validated by another layer.
     """
 
     def __init__(
@@ -47,36 +140,92 @@ class ZibalIPGClient:
         raise_on_invalid_result: bool = False,
         request_timeout: int = 7,
         logger: Optional[Logger] = None,
+        base_url: str = IPG_BASE_URL,
+        inquiry_cache: Optional[InquiryCache] = None,
+        log_sample_rate: float = 1.0,
+        trusted_decode: bool = False,
     ):
-        if logger is None:
-            self.logger = logging.getLogger(__name__)
-            self.logger.addHandler(logging.NullHandler())
-        else:
-            self.logger = logger
+        self.logger = _default_logger if logger is None else logger
         self.merchant = merchant
         self.raise_on_invalid_result = raise_on_invalid_result
         self.request_timeout = request_timeout
+        self.base_url = base_url
+        self.inquiry_cache = inquiry_cache
+        self.log_sample_rate = log_sample_rate
+        self.trusted_decode = trusted_decode
 
-    def _process_request(self, endpoint: ZibalEndPoints, data: dict) -> dict:
-        url = IPG_BASE_URL + endpoint
-        try:
-            response = requests.post(url=url, json=data, timeout=self.request_timeout)
-        except RequestException as err:
-            self.logger.error(f"A network request error has occured: {err}")
-            raise RequestError(f"A network request error has occured: {err}")
+    def _log_fields(
+        self, endpoint: ZibalEndPoints, data: dict, **fields
+    ) -> dict:
+        fields["endpoint"] = endpoint.value
+        fields.setdefault("track_id", data.get("trackId"))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            fields["request_data"] = redact(data)
+        return fields
 
+    def _handle_response(self, endpoint: ZibalEndPoints, data: dict, response) -> dict:
+        """
+        Check the HTTP status code of the response and return its JSON body.
+        `response` can be either a `requests` or a `httpx` response.
+        """
         if response.status_code != 200:
-            response_content = str(response.content)
-            self.logger.error(
-                f"Unexpected response status code: {response.status_code} content: {response_content}"
+            message = (
+                f"Unexpected response status code: {response.status_code} "
+                f"content: {response.content!s}"
             )
-            raise RequestError(
-                f"Unexpected response status code: {response.status_code} content: {response_content}"
+            if self.logger.isEnabledFor(logging.ERROR):
+                self.logger.error(
+                    message,
+                    extra=self._log_fields(
+                        endpoint, data, status_code=response.status_code
+                    ),
+                )
+            raise RequestError(message, status_code=response.status_code)
+
+        try:
+            if self.trusted_decode:
+                response_data = json_loads(response.content)
+            else:
+                response_data = response.json()
+        except ValueError as err:
+            # orjson's, json's and requests' decode errors are all ValueErrors
+            message = f"Undecodable response content: {response.content!s}"
+            if self.logger.isEnabledFor(logging.ERROR):
+                self.logger.error(message, extra=self._log_fields(endpoint, data))
+            raise RequestError(message) from err
+        if self.logger.isEnabledFor(logging.INFO) and (
+            self.log_sample_rate >= 1 or random.random() < self.log_sample_rate
+        ):
+            elapsed = getattr(response, "elapsed", None)
+            if elapsed is not None:
+                elapsed = elapsed.total_seconds()
+            fields = self._log_fields(
+                endpoint,
+                data,
+                track_id=data.get("trackId", response_data.get("trackId")),
+                result=response_data.get("result"),
+                elapsed=elapsed,
             )
-        self.logger.info(
-            f"A successful HTTP request has been made to: {url} with data: {data}"
-        )
-        return response.json()
+            self.logger.info(
+                "Zibal IPG request endpoint=%s track_id=%s result=%s elapsed=%s",
+                fields["endpoint"],
+                fields["track_id"],
+                fields["result"],
+                fields["elapsed"],
+                extra=fields,
+            )
+        return response_data
+
+    def _handle_request_exception(
+        self, endpoint: ZibalEndPoints, data: dict, err: Exception
+    ) -> RequestError:
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error(
+                "A network request error has occured: %s",
+                err,
+                extra=self._log_fields(endpoint, data),
+            )
+        return RequestError(f"A network request error has occured: {err}")
 
     def _validate_response(self, response_data: dict) -> Optional[FailedResultDetail]:
         """
@@ -84,23 +233,511 @@ class ZibalIPGClient:
         any result codes other than 100 means the request was non-successful.
         """
         result_code = response_data.get("result", -100)
-        if result_code != 100:
-            if self.raise_on_invalid_result:
-                result_message = RESULT_CODES.get(result_code, "Unknown result code")
-                raise ResultError(result_message)
-            return FailedResultDetail(
-                result_code=result_code,
-                result_meaning=RESULT_CODES[result_code],
+        if result_code == 100:
+            return None
+        result_detail = get_failed_result_detail(result_code)
+        if self.raise_on_invalid_result:
+            error_type = RESULT_ERRORS.get(result_code, ResultError)
+            raise error_type(result_detail.result_meaning, result_code=result_code)
+        return result_detail
+
+    def _build_result(
+        self, response_data: dict, response_model: Type[TransactionBase]
+    ) -> Union[TransactionBase, FailedResultDetail]:
+        result_error = self._validate_response(response_data)
+        if result_error:
+            return result_error
+        if self.trusted_decode:
+            return response_model.construct_from_camel_case(response_data)
+        return response_model.from_camel_case(response_data)
+
+    def _build_require_data(
+        self,
+        amount: int,
+        callback_url: HttpUrl,
+        description: Optional[str] = None,
+        order_id: Optional[str] = None,
+        mobile: Optional[str] = None,
+        allowed_cards: Optional[list[str]] = None,
+        ledger_id: Optional[str] = None,
+    ) -> dict:
+        request_model = TransactionRequireRequest(
+            merchant=self.merchant,
+            callback_url=callback_url,
+            amount=amount,
+            description=description,
+            order_id=order_id,
+            mobile=mobile,
+            allowed_cards=allowed_cards,
+            ledger_id=ledger_id,
+        )
+        return request_model.model_dump_to_camel(exclude_none=True, mode="json")
+
+    def create_request_template(
+        self,
+        callback_url: HttpUrl,
+        description: Optional[str] = None,
+        allowed_cards: Optional[list[str]] = None,
+        ledger_id: Optional[str] = None,
+    ) -> RequestTemplate:
+        """
+        Validate and encode the fields which are the same for every order
+        once, for initiating transactions using `request_transaction_from_template`.
+        `description` can be a pattern formatted with the per order fields,
+        e.g. "Payment of order {order_id}".
+        """
+        return RequestTemplate(
+            merchant=self.merchant,
+            callback_url=callback_url,
+            description=description,
+            allowed_cards=allowed_cards,
+            ledger_id=ledger_id,
+        )
+
+    def _build_verify_data(self, track_id: int) -> dict:
+        request_model = TransactionVerifyRequest(
+            merchant=self.merchant, track_id=track_id
+        )
+        return request_model.model_dump_to_camel(exclude_none=True)
+
+    def _build_inquiry_data(self, track_id: int) -> dict:
+        inquiry_model = TransactionInquiryRequest(
+            merchant=self.merchant, track_id=track_id
+        )
+        return inquiry_model.model_dump_to_camel(exclude_none=True)
+
+    def _get_cached_inquiry(
+        self, track_id: int
+    ) -> Optional[TransactionInquiryResponse]:
+        if self.inquiry_cache is None:
+            return None
+        return self.inquiry_cache.get(self.merchant, track_id)
+
+    def _cache_inquiry(
+        self,
+        track_id: int,
+        result: Union[TransactionInquiryResponse, FailedResultDetail],
+    ) -> None:
+        if self.inquiry_cache is not None and isinstance(
+            result, TransactionInquiryResponse
+        ):
+            self.inquiry_cache.set(self.merchant, track_id, result)
+
+    def _invalidate_cached_inquiry(
+        self,
+        track_id: int,
+        result: Union[TransactionVerifyResponse, FailedResultDetail],
+    ) -> None:
+        # 'already verified' also means that the cached state is outdated
+        if self.inquiry_cache is not None and (
+            isinstance(result, TransactionVerifyResponse)
+            or result.result_code == 201
+        ):
+            self.inquiry_cache.invalidate(self.merchant, track_id)
+
+    @staticmethod
+    def _call_captured(func: Callable, track_id: int):
+        try:
+            return func(track_id)
+        except BULK_CAPTURED_ERRORS as err:
+            return err
+
+    @staticmethod
+    def create_payment_link(track_id: int) -> str:
+        """Constructs the payment link using track_id"""
+        return PAYMENT_BASE_URL + str(track_id)
+
+
+class ZibalIPGClient(BaseZibalIPGClient):
+    """
+    For testing IPG API endpoints, sandbox mode can be enabled by setting
+    `merchant` to `zibal` when initializing the class.
+
+    If `raise_on_invalid_result` flag is set to True , when calling transaction
+    related methods and the `result` code in the body of response is not 100,
+    a `ResultError` exception will be raised.
+
+    A `logger` instance can be passed for logging network requests.
+
+    All of the network requests made by the client share a single persistent
+    session, so the TCP and TLS connections to the IPG are kept alive and
+    reused between calls. `pool_connections` is the number of host pools to
+    cache and `pool_maxsize` is the maximum number of connections kept alive
+    per host. When `pool_block` is set to True, threads will wait for a free
+    connection instead of opening a throwaway one once the pool is exhausted.
+    The client can be used as a context manager, or `close` can be called
+    explicitly to release the pooled connections.
+
+    The requests are sent through a `Transport`, which is an `HTTPTransport`
+    using the pooled session by default. A `FakeTransport` answering the
+    requests in-process, or a `RecordReplayTransport` can be passed as
+    `transport` instead (see `zibal.transport`).
+
+    If `single_flight` is set to True, concurrent verify or inquiry calls for
+    the same track id share a single in-flight request, and all of the
+    callers receive its result.
+
+    A `RetryPolicy` can be passed for retrying the failed network requests of
+    the idempotent endpoints (inquiry and verify) with jittered exponential
+    backoff. If a retried verify is answered with 201 'already verified', an
+    earlier attempt has reached the IPG, so the transaction is inquired and
+    returned as a successful verify response.
+
+    `deadline` bounds the total duration of a call in seconds, including
+    its retries and backoff delays, while `request_timeout` bounds each
+    attempt. Once the deadline is reached a `DeadlineExceededError` is raised.
+
+    A shared `CircuitBreaker` can be passed, which rejects the requests with
+    a `CircuitOpenError` during its cool-down period after repeated failures.
+
+    A `RateLimiter` can be passed (and shared between threads and clients)
+    for pacing the outgoing requests per endpoint. Waiting for the rate
+    limiter counts towards the deadline of the call.
+
+    If `health_check_interval` is set, the health of the IPG is probed on a
+    background thread every `health_check_interval` seconds (see
+    `zibal.health.HealthProber`), and `check_service_status` returns the
+    cached verdict. If `fail_fast_when_unhealthy` is also set to True,
+    `request_transaction` raises a `ServiceUnavailableError` without sending
+    a request while the IPG is considered unhealthy.
+
+    Hooks can be registered using `add_hook`, which are called with the
+    `CallTimings` of each phase of every transaction related call (see
+    `zibal.instrumentation`). Timings are only measured while at least one
+    hook is registered.
+
+    If a `VerifyJournal` is passed as `verify_journal`, the intent and the
+    outcome of each verify call are durably recorded, and after a crash the
+    verifies left without an outcome can be sent again using
+    `replay_verify_journal`.
+    """
+
+    def __init__(
+        self,
+        merchant: str,
+        raise_on_invalid_result: bool = False,
+        request_timeout: int = 7,
+        logger: Optional[Logger] = None,
+        pool_connections: int = 1,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        base_url: str = IPG_BASE_URL,
+        inquiry_cache: Optional[InquiryCache] = None,
+        log_sample_rate: float = 1.0,
+        trusted_decode: bool = False,
+        single_flight: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        deadline: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        health_check_interval: Optional[float] = None,
+        fail_fast_when_unhealthy: bool = False,
+        verify_journal: Optional["VerifyJournal"] = None,
+        transport: Optional[Transport] = None,
+    ):
+        super().__init__(
+            merchant=merchant,
+            raise_on_invalid_result=raise_on_invalid_result,
+            request_timeout=request_timeout,
+            logger=logger,
+            base_url=base_url,
+            inquiry_cache=inquiry_cache,
+            log_sample_rate=log_sample_rate,
+            trusted_decode=trusted_decode,
+        )
+        self._single_flight = SingleFlight() if single_flight else None
+        self.retry_policy = retry_policy
+        self.deadline = deadline
+        self.circuit_breaker = circuit_breaker
+        self.rate_limiter = rate_limiter
+        self._hooks: list[CallHook] = []
+        self.fail_fast_when_unhealthy = fail_fast_when_unhealthy
+        self.verify_journal = verify_journal
+        if transport is None:
+            transport = HTTPTransport(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
             )
-        return None
+        self.transport = transport
+        self.health_prober: Optional[HealthProber] = None
+        if health_check_interval is not None:
+            self.health_prober = HealthProber(
+                self._probe_service, interval=health_check_interval
+            ).start()
+
+    @property
+    def session(self) -> "requests.Session":
+        """The session of the default `HTTPTransport`."""
+        return self.transport.session
+
+    def close(self) -> None:
+        """Close the transport and release all of the pooled connections."""
+        if self.health_prober is not None:
+            self.health_prober.stop()
+        self.transport.close()
+
+    def __enter__(self) -> "ZibalIPGClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add_hook(self, hook: CallHook) -> None:
+        """Register a callable to be called with the timings of every call."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: CallHook) -> None:
+        self._hooks.remove(hook)
+
+    def _emit_timings(self, timings: CallTimings) -> None:
+        for hook in self._hooks:
+            try:
+                hook(timings)
+            except Exception as err:
+                self.logger.warning("Timing hook %r has failed: %s", hook, err)
+
+    def _call(
+        self,
+        endpoint: ZibalEndPoints,
+        build_data: Callable[[], dict],
+        response_model: Type[TransactionBase],
+    ) -> Union[TransactionBase, FailedResultDetail]:
+        """Build the request data, send it and build the result of the call."""
+        if not self._hooks:
+            response_data = self._process_request(endpoint, build_data())
+            return self._build_result(response_data, response_model)
+
+        timer = PhaseTimer(endpoint)
+        try:
+            request_data = build_data()
+            timer.mark("build")
+            response_data = self._process_request(endpoint, request_data, timer)
+            timer.timings.result = response_data.get("result")
+            result = self._build_result(response_data, response_model)
+            timer.mark("model")
+            return result
+        except BaseException as err:
+            timer.timings.error = err
+            raise
+        finally:
+            self._emit_timings(timer.timings)
+
+    def _run_many(
+        self,
+        func: Callable,
+        track_ids: Iterable[int],
+        max_workers: int,
+        ordered: bool,
+    ) -> Iterator[tuple]:
+        """
+        Call `func` for each of the track ids using a pool of `max_workers`
+        threads and yield `(track_id, result)` pairs. The track ids are
+        consumed lazily, so at most `max_workers` times two calls are queued
+        at once. If `ordered` is True, the results are yielded in the same
+        order as `track_ids`, otherwise they are yielded as they complete.
+        """
+        window = max_workers * 2
+        pending: deque[tuple[int, Future]] = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for track_id in track_ids:
+                future = executor.submit(self._call_captured, func, track_id)
+                pending.append((track_id, future))
+                if len(pending) >= window:
+                    yield from self._drain(pending, ordered, until=window - 1)
+            yield from self._drain(pending, ordered, until=0)
+
+    @staticmethod
+    def _drain(
+        pending: "deque[tuple[int, Future]]", ordered: bool, until: int
+    ) -> Iterator[tuple]:
+        while len(pending) > until:
+            if ordered:
+                track_id, future = pending.popleft()
+                yield track_id, future.result()
+                continue
+            done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            for item in [item for item in pending if item[1] in done]:
+                pending.remove(item)
+                yield item[0], item[1].result()
+
+    def _process_request(
+        self,
+        endpoint: ZibalEndPoints,
+        data: dict,
+        timer: Optional[PhaseTimer] = None,
+    ) -> dict:
+        """
+        Send the request, retrying it according to the retry policy if the
+        endpoint is idempotent, without exceeding the deadline of the call.
+        """
+        deadline_at = None
+        if self.deadline is not None:
+            deadline_at = time.monotonic() + self.deadline
+        max_attempts = 1
+        if self.retry_policy is not None and endpoint in IDEMPOTENT_ENDPOINTS:
+            max_attempts = self.retry_policy.max_attempts
+
+        attempt = 1
+        while True:
+            try:
+                response_data = self._send_request(endpoint, data, deadline_at, timer)
+                break
+            except (DeadlineExceededError, CircuitOpenError):
+                # an open circuit rejects the requests until its cool-down
+                # ends, so retrying it would only wait out the backoff
+                raise
+            except RequestError as err:
+                if attempt >= max_attempts or not self._is_retryable(err):
+                    raise
+                delay = self.retry_policy.backoff(attempt)
+                if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                    raise DeadlineExceededError(
+                        f"Deadline of {self.deadline}s exceeded after {attempt} attempts: {err}"
+                    ) from err
+                self.logger.warning(
+                    "Retrying request to %s in %.3fs (attempt %s of %s failed)",
+                    endpoint.value,
+                    delay,
+                    attempt,
+                    max_attempts,
+                    extra=self._log_fields(endpoint, data, attempt=attempt),
+                )
+                time.sleep(delay)
+                if timer is not None:
+                    timer.mark("backoff")
+                attempt += 1
+
+        if (
+            endpoint == ZibalEndPoints.VERIFY
+            and attempt > 1
+            and response_data.get("result") == 201
+        ):
+            # the transaction is verified either way, so if the inquiry
+            # fails the 201 response is returned instead
+            try:
+                inquiry_data = self._send_request(
+                    ZibalEndPoints.INQUIRY, data, deadline_at, timer
+                )
+            except RequestError as err:
+                self.logger.warning(
+                    "Inquiry after an already verified retry has failed: %s",
+                    err,
+                    extra=self._log_fields(endpoint, data),
+                )
+            else:
+                if inquiry_data.get("result") == 100:
+                    response_data = inquiry_data
+        return response_data
+
+    def _is_retryable(self, err: RequestError) -> bool:
+        # errors without a status code are network errors
+        return (
+            err.status_code is None
+            or err.status_code in self.retry_policy.retry_on_status
+        )
+
+    def _send_request(
+        self,
+        endpoint: ZibalEndPoints,
+        data: dict,
+        deadline_at: Optional[float],
+        timer: Optional[PhaseTimer] = None,
+    ) -> dict:
+        timeout = self.request_timeout
+        if deadline_at is not None:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f"Deadline of {self.deadline}s exceeded")
+            timeout = min(timeout, remaining)
+        if self.rate_limiter is not None:
+            self._wait_for_rate_limiter(endpoint, deadline_at)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request()
+
+        url = self.base_url + endpoint
+        try:
+            if timer is None:
+                body = data.body if isinstance(data, EncodedRequestData) else None
+                response = self.transport.post(url, data, timeout, body=body)
+                response_data = self._handle_response(endpoint, data, response)
+            else:
+                response_data = self._send_timed_request(
+                    endpoint, data, timeout, timer
+                )
+        except self.transport.network_errors as err:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            raise self._handle_request_exception(endpoint, data, err)
+        except RequestError as err:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            if self.rate_limiter is not None and err.status_code == 429:
+                self.rate_limiter.record_limited(endpoint.value)
+            raise
+        except BaseException:
+            # the outcome of every attempt has to be recorded, otherwise a
+            # failed half-open trial would keep the circuit half open forever
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            raise
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_success(endpoint.value)
+        return response_data
+
+    def _wait_for_rate_limiter(
+        self, endpoint: ZibalEndPoints, deadline_at: Optional[float]
+    ) -> None:
+        timeout = None
+        if deadline_at is not None:
+            timeout = deadline_at - time.monotonic()
+        if self.rate_limiter.acquire(endpoint.value, timeout) is None:
+            raise DeadlineExceededError(
+                f"Deadline of {self.deadline}s exceeded while waiting for the rate limiter"
+            )
+
+    def _send_timed_request(
+        self,
+        endpoint: ZibalEndPoints,
+        data: dict,
+        timeout: float,
+        timer: PhaseTimer,
+    ) -> dict:
+        """
+        Same as sending the request with the `json` argument, but each phase
+        is carried out separately so it can be timed.
+        """
+        if isinstance(data, EncodedRequestData):
+            body = data.body
+        else:
+            body = json.dumps(data, allow_nan=False).encode()
+        timer.mark("encode")
+        # streaming returns the response as soon as its headers are received
+        response = self.transport.post(
+            self.base_url + endpoint, data, timeout, body=body, stream=True
+        )
+        timer.mark("send")
+        response.content
+        timer.mark("receive")
+        response_data = self._handle_response(endpoint, data, response)
+        timer.mark("decode")
+        return response_data
 
     def check_service_status(self) -> bool:
         """
         Check to see if the service is up and running, will log errors if
-        there are any errors.
+        there are any errors. If the health prober is enabled, its cached
+        verdict is returned without sending a request.
         """
+        if self.health_prober is not None:
+            return self.health_prober.healthy
+        return self._probe_service()
+
+    def _probe_service(self) -> bool:
         try:
-            response = requests.head(IPG_BASE_URL, timeout=self.request_timeout)
+            response = self.transport.head(self.base_url, self.request_timeout)
             if response.status_code != 200:
                 response_content = str(response.content)
                 self.logger.warning(
@@ -109,7 +746,7 @@ class ZibalIPGClient:
                 )
                 return False
 
-        except RequestException as err:
+        except self.transport.network_errors as err:
             self.logger.warning(
                 f"A network request error has occured on service check: {err}"
             )
@@ -130,22 +767,43 @@ class ZibalIPGClient:
         """
         Send a request to Zibal's IPG to initiate a new payment transaction.
         """
-        request_model = TransactionRequireRequest(
-            merchant=self.merchant,
-            callback_url=callback_url,
+        self._check_healthy()
+        build_data = partial(
+            self._build_require_data,
             amount=amount,
+            callback_url=callback_url,
             description=description,
             order_id=order_id,
             mobile=mobile,
             allowed_cards=allowed_cards,
             ledger_id=ledger_id,
         )
-        request_data = request_model.model_dump_to_camel(exclude_none=True, mode="json")
-        response_data = self._process_request(ZibalEndPoints.REQUEST, request_data)
-        result_error = self._validate_response(response_data)
-        if result_error:
-            return result_error
-        return TransactionRequireResponse.from_camel_case(response_data)
+        return self._call(ZibalEndPoints.REQUEST, build_data, TransactionRequireResponse)
+
+    def request_transaction_from_template(
+        self,
+        template: RequestTemplate,
+        amount: int,
+        order_id: Optional[str] = None,
+        mobile: Optional[str] = None,
+    ) -> Union[TransactionRequireResponse, FailedResultDetail]:
+        """
+        Same as `request_transaction`, but the fixed fields are taken from the
+        template, and only the per order fields are validated and encoded.
+        """
+        self._check_healthy()
+        build_data = partial(template.build, amount, order_id=order_id, mobile=mobile)
+        return self._call(ZibalEndPoints.REQUEST, build_data, TransactionRequireResponse)
+
+    def _check_healthy(self) -> None:
+        if (
+            self.fail_fast_when_unhealthy
+            and self.health_prober is not None
+            and not self.health_prober.healthy
+        ):
+            raise ServiceUnavailableError(
+                "Zibal's IPG is considered unhealthy by the health prober"
+            )
 
     def verify_transaction(
         self, track_id: int
@@ -154,15 +812,62 @@ class ZibalIPGClient:
         Sends a HTTP request for verifying an already started transaction,
         which will mark the end of the transaction.
         """
-        request_model = TransactionVerifyRequest(
-            merchant=self.merchant, track_id=track_id
-        )
-        request_data = request_model.model_dump_to_camel(exclude_none=True)
-        response_data = self._process_request(ZibalEndPoints.VERIFY, data=request_data)
-        result_error = self._validate_response(response_data)
-        if result_error:
-            return result_error
-        return TransactionVerifyResponse.from_camel_case(response_data)
+        if self._single_flight is not None:
+            return self._single_flight.do(
+                (ZibalEndPoints.VERIFY, track_id), self._verify_transaction, track_id
+            )
+        return self._verify_transaction(track_id)
+
+    def _verify_transaction(
+        self, track_id: int
+    ) -> Union[TransactionVerifyResponse, FailedResultDetail]:
+        if self.verify_journal is None:
+            result = self._call(
+                ZibalEndPoints.VERIFY,
+                partial(self._build_verify_data, track_id),
+                TransactionVerifyResponse,
+            )
+            self._invalidate_cached_inquiry(track_id, result)
+            return result
+
+        # The request data is validated before the intent is recorded, so an
+        # invalid track id is never left unfinished. Network errors leave the
+        # verify unfinished, since it is unknown whether the request has
+        # reached the IPG.
+        data = self._build_verify_data(track_id)
+        track_id = data["trackId"]
+        self.verify_journal.record_intent(self.merchant, track_id)
+        try:
+            result = self._call(
+                ZibalEndPoints.VERIFY, lambda: data, TransactionVerifyResponse
+            )
+        except ResultError as err:
+            self.verify_journal.record_outcome(self.merchant, track_id, err.result_code)
+            raise
+        if isinstance(result, TransactionVerifyResponse):
+            self.verify_journal.record_outcome(
+                self.merchant, track_id, result.result, result.status
+            )
+        else:
+            self.verify_journal.record_outcome(
+                self.merchant, track_id, result.result_code
+            )
+        self._invalidate_cached_inquiry(track_id, result)
+        return result
+
+    def replay_verify_journal(
+        self, max_workers: int = 10, ordered: bool = True
+    ) -> Iterator[
+        tuple[int, Union[TransactionVerifyResponse, FailedResultDetail, Exception]]
+    ]:
+        """
+        Verify the transactions of the merchant left unfinished in the verify
+        journal (e.g. by a crash), the same as `verify_many`.
+        """
+        if self.verify_journal is None:
+            raise ValueError("The client has no verify journal")
+        track_ids = self.verify_journal.unfinished(self.merchant)
+        return self.verify_many(track_ids, max_workers=max_workers, ordered=ordered)
 
     def inquiry_transaction(
         self, track_id: int
@@ -170,17 +875,52 @@ class ZibalIPGClient:
         """
         Sends a HTTP request to retrieve the given transaction info.
         """
-        inquiry_model = TransactionInquiryRequest(
-            merchant=self.merchant, track_id=track_id
+        cached_result = self._get_cached_inquiry(track_id)
+        if cached_result is not None:
+            return cached_result
+        if self._single_flight is not None:
+            return self._single_flight.do(
+                (ZibalEndPoints.INQUIRY, track_id), self._inquiry_transaction, track_id
+            )
+        return self._inquiry_transaction(track_id)
+
+    def _inquiry_transaction(
+        self, track_id: int
+    ) -> Union[TransactionInquiryResponse, FailedResultDetail]:
+        result = self._call(
+            ZibalEndPoints.INQUIRY,
+            partial(self._build_inquiry_data, track_id),
+            TransactionInquiryResponse,
         )
-        request_data = inquiry_model.model_dump_to_camel(exclude_none=True)
-        response_data = self._process_request(ZibalEndPoints.INQUIRY, request_data)
-        result_error = self._validate_response(response_data)
-        if result_error:
-            return result_error
-        return TransactionInquiryResponse.from_camel_case(response_data)
+        self._cache_inquiry(track_id, result)
+        return result
 
-    @staticmethod
-    def create_payment_link(track_id: int) -> str:
-        """Constructs the payment link using track_id"""
-        return PAYMENT_BASE_URL + str(track_id)
+    def verify_many(
+        self, track_ids: Iterable[int], max_workers: int = 10, ordered: bool = True
+    ) -> Iterator[
+        tuple[int, Union[TransactionVerifyResponse, FailedResultDetail, Exception]]
+    ]:
+        """
+        Verify the given transactions concurrently using at most `max_workers`
+        threads, yielding `(track_id, result)` pairs.
+
+        Errors of a single item such as a `RequestError` are captured and
+        yielded as its result, so one bad item never aborts the batch.
+        If `ordered` is False, results are yielded as soon as they complete.
+        """
+        return self._run_many(self.verify_transaction, track_ids, max_workers, ordered)
+
+    def inquiry_many(
+        self, track_ids: Iterable[int], max_workers: int = 10, ordered: bool = True
+    ) -> Iterator[
+        tuple[int, Union[TransactionInquiryResponse, FailedResultDetail, Exception]]
+    ]:
+        """
+        Inquiry the given transactions concurrently using at most
+        `max_workers` threads, yielding `(track_id, result)` pairs.
+
+        Errors of a single item such as a `RequestError` are captured and
+        yielded as its result, so one bad item never aborts the batch.
+        If `ordered` is False, results are yielded as soon as they complete.
+        """
+        return self._run_many(self.inquiry_transaction, track_ids, max_workers, ordered)
@@ -0,0 +1,146 @@
+"""
+A pool of per-merchant clients, for services processing the payments of
+many merchants.
+
+The clients handed out by the pool are lightweight views sharing a single
+transport (and its connection pool), rate limiter, circuit breaker, inquiry
+cache, health prober and timing hooks, and only differ in their merchant:
+
+    pool = ZibalClientPool(rate_limiter=RateLimiter(...), idle_timeout=600)
+    pool.add_hook(LatencyRecorder())
+
+    client = pool.get(merchant)
+    client.verify_transaction(track_id)
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Optional
+
+from zibal.cache import CacheStats
+from zibal.client import ZibalIPGClient
+from zibal.instrumentation import CallHook
+from zibal.singleflight import SingleFlight
+
+
+class MerchantClient(ZibalIPGClient):
+    """
+    A client of a single merchant handed out by a `ZibalClientPool`. Its
+    resources are owned by the pool, so closing it does nothing, and the
+    hooks added to it are added to all of the clients of the pool.
+    """
+
+    last_used: float = 0.0
+
+    def close(self) -> None:
+        pass
+
+
+class ZibalClientPool:
+    """
+    Hands out a `MerchantClient` per merchant. The keyword arguments are
+    the ones of `ZibalIPGClient`, which are used for creating the shared
+    resources once.
+
+    The clients are kept for reuse, so getting the client of a recently
+    used merchant is a dict lookup. Clients which are not used for
+    `idle_timeout` seconds are evicted on the next miss or by calling
+    `evict_idle`; once the pool holds `max_size` clients, the least
+    recently used client is evicted.
+
+    Each client has its own single flight group (if `single_flight` is set),
+    since results of different merchants must not be shared.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        idle_timeout: Optional[float] = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+        **client_kwargs,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.stats = CacheStats()
+        self._clock = clock
+        # The prototype holding the shared resources, whose attributes are
+        # copied to each of the clients.
+        self._shared = ZibalIPGClient("", **client_kwargs)
+        self._clients: OrderedDict[str, MerchantClient] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @property
+    def transport(self):
+        return self._shared.transport
+
+    def get(self, merchant: str) -> MerchantClient:
+        now = self._clock()
+        with self._lock:
+            client = self._clients.get(merchant)
+            if client is not None:
+                self.stats.hits += 1
+                self._clients.move_to_end(merchant)
+                client.last_used = now
+                return client
+            self.stats.misses += 1
+            self._evict_idle(now)
+            client = self._new_client(merchant)
+            client.last_used = now
+            self._clients[merchant] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.stats.evictions += 1
+            return client
+
+    def evict_idle(self) -> int:
+        """Evict the clients which are idle for `idle_timeout`, and return their number."""
+        with self._lock:
+            return self._evict_idle(self._clock())
+
+    def add_hook(self, hook: CallHook) -> None:
+        """Register a hook called with the timings of the calls of every merchant."""
+        self._shared.add_hook(hook)
+
+    def remove_hook(self, hook: CallHook) -> None:
+        self._shared.remove_hook(hook)
+
+    def close(self) -> None:
+        """Close the shared transport and forget all of the clients."""
+        with self._lock:
+            self._clients.clear()
+        self._shared.close()
+
+    def __enter__(self) -> "ZibalClientPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _new_client(self, merchant: str) -> MerchantClient:
+        # Skip the initialization, and share the prototype's attributes
+        # (including its list of hooks) instead of creating new resources.
+        client = MerchantClient.__new__(MerchantClient)
+        client.__dict__.update(self._shared.__dict__)
+        client.merchant = merchant
+        if self._shared._single_flight is not None:
+            client._single_flight = SingleFlight()
+        return client
+
+    def _evict_idle(self, now: float) -> int:
+        if self.idle_timeout is None:
+            return 0
+        evicted = 0
+        # the clients are kept in the order they were used, so the idle
+        # ones are at the start
+        while self._clients:
+            merchant, client = next(iter(self._clients.items()))
+            if now - client.last_used < self.idle_timeout:
+                break
+            del self._clients[merchant]
+            evicted += 1
+        self.stats.evictions += evicted
+        return evicted
@@ -1,6 +1,29 @@
+from typing import Optional
+
+
 class RequestError(Exception):
     """Used for errors related to requests, such as unexpected status codes, timeouts and etc."""
 
+    def __init__(self, message: str = "", status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(RequestError):
+    """Used when a request is rejected without being sent, since the circuit breaker is open."""
+
+    pass
+
+
+class DeadlineExceededError(RequestError):
+    """Used when the deadline of a call is reached before a successful response is received."""
+
+    pass
+
+
+class ServiceUnavailableError(RequestError):
+    """Used when a request is not sent, since the service is considered to be unhealthy."""
+
     pass
 
 
@@ -13,4 +36,24 @@ class TranscationError(Exception):
 class ResultError(Exception):
     """Used for result codes which are not successfull (i.e. result code is not 100)"""
 
+    def __init__(self, message: str = "", result_code: Optional[int] = None):
+        super().__init__(message)
+        self.result_code = result_code
+
+
+class MerchantError(ResultError):
+    """Used for result codes related to the merchant (i.e. 102, 103 and 104)"""
+
+    pass
+
+
+class InvalidRequestDataError(ResultError):
+    """Used for result codes related to invalid request data (i.e. 105, 106 and 113)"""
+
+    pass
+
+
+class TransactionStateError(ResultError):
+    """Used for result codes related to the state of a transaction (i.e. 201, 202 and 203)"""
+
     pass
@@ -0,0 +1,389 @@
+"""
+A local stand-in of Zibal's IPG for load and latency testing of the clients
+on a single machine, only depending on the standard library.
+
+It implements the `/v1/request`, `/v1/verify`, `/v1/inquiry` and
+`/start/{trackId}` endpoints with the same payloads and transaction state
+transitions as the real IPG:
+
+    request -> status -1 'Waiting for payment'
+    /start/{trackId} -> status 2 'Paid and unverified' (or 3 'Cancelled by
+        user' with `?status=3`), then redirects to the callbackUrl
+    verify -> status 1 'Paid and verified', repeated verifies result in 201
+        and verifying an unpaid transaction results in 202
+
+Latency, error rate and rate limiting are configurable:
+
+    with FakeZibalGateway(latency=0.02, error_rate=0.01) as gateway:
+        client = ZibalIPGClient("zibal", base_url=gateway.base_url)
+
+It can also be run as a standalone server:
+
+    python -m zibal.fake_gateway --port 8000 --latency 0.02
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from zibal.response_codes import RESULT_CODES, STATUS_CODES
+
+MIN_AMOUNT = 1000
+MAX_AMOUNT = 2000000000
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+@dataclass
+class FakeTransaction:
+    track_id: int
+    merchant: str
+    amount: int
+    callback_url: str
+    description: str = ""
+    order_id: str = ""
+    status: int = -1
+    created_at: str = field(default_factory=_now)
+    paid_at: Optional[str] = None
+    verified_at: Optional[str] = None
+    card_number: Optional[str] = None
+    ref_number: Optional[int] = None
+    wage: int = 0
+    shaparak_fee: int = 1200
+
+
+class FakeGatewayState:
+    """The thread-safe transactions store of the fake gateway."""
+
+    def __init__(self, merchants: Iterable[str] = ("zibal",)):
+        self.merchants = set(merchants)
+        self.transactions: dict[int, FakeTransaction] = {}
+        self._track_ids = itertools.count(3714061657)
+        self._lock = threading.Lock()
+
+    def request(self, data: dict) -> dict:
+        merchant = data.get("merchant")
+        amount = data.get("amount")
+        callback_url = data.get("callbackUrl", "")
+        if merchant not in self.merchants:
+            return self._failed(102)
+        if not isinstance(amount, int) or amount < MIN_AMOUNT:
+            return self._failed(105)
+        if amount > MAX_AMOUNT:
+            return self._failed(113)
+        if not callback_url.startswith(("http://", "https://")):
+            return self._failed(106)
+
+        with self._lock:
+            track_id = next(self._track_ids)
+            self.transactions[track_id] = FakeTransaction(
+                track_id=track_id,
+                merchant=merchant,
+                amount=amount,
+                callback_url=callback_url,
+                description=data.get("description", ""),
+                order_id=data.get("orderId", ""),
+            )
+        return {"message": "success", "result": 100, "trackId": track_id}
+
+    def pay(self, track_id: int, status: int = 2) -> Optional[FakeTransaction]:
+        """Simulates the user completing (or cancelling) the payment."""
+        with self._lock:
+            transaction = self.transactions.get(track_id)
+            if transaction is None or transaction.status != -1:
+                return transaction
+            transaction.status = status
+            if status == 2:
+                transaction.paid_at = _now()
+                transaction.card_number = "603788******6713"
+                transaction.ref_number = random.randint(10**9, 10**10 - 1)
+            return transaction
+
+    def verify(self, data: dict) -> dict:
+        with self._lock:
+            transaction = self._get(data)
+            if transaction is None:
+                return self._failed(203)
+            if transaction.status == 1:
+                return self._failed(201)
+            if transaction.status != 2:
+                return self._failed(202)
+            transaction.status = 1
+            transaction.verified_at = _now()
+            return {
+                "message": "success",
+                "result": 100,
+                "refNumber": transaction.ref_number,
+                "paidAt": transaction.paid_at,
+                "status": transaction.status,
+                "amount": transaction.amount,
+                "orderId": transaction.order_id,
+                "description": transaction.description,
+                "cardNumber": transaction.card_number,
+                "multiplexingInfos": [],
+            }
+
+    def inquiry(self, data: dict) -> dict:
+        with self._lock:
+            transaction = self._get(data)
+            if transaction is None:
+                return self._failed(203)
+            return {
+                "message": "success",
+                "result": 100,
+                "refNumber": transaction.ref_number,
+                "paidAt": transaction.paid_at or transaction.created_at,
+                "verifiedAt": transaction.verified_at or transaction.created_at,
+                "status": transaction.status,
+                "amount": transaction.amount,
+                "orderId": transaction.order_id,
+                "description": transaction.description,
+                "cardNumber": transaction.card_number,
+                "multiplexingInfos": [],
+                "wage": transaction.wage,
+                "shaparakFee": transaction.shaparak_fee,
+                "createdAt": transaction.created_at,
+            }
+
+    def _get(self, data: dict) -> Optional[FakeTransaction]:
+        transaction = self.transactions.get(data.get("trackId"))
+        if transaction is None or transaction.merchant != data.get("merchant"):
+            return None
+        return transaction
+
+    @staticmethod
+    def _failed(result_code: int) -> dict:
+        return {"message": RESULT_CODES[result_code], "result": result_code}
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_FakeGatewayServer"
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._admit():
+            return
+        handlers = {
+            "/v1/request": self.server.state.request,
+            "/v1/verify": self.server.state.verify,
+            "/v1/inquiry": self.server.state.inquiry,
+        }
+        handler = handlers.get(self.path)
+        if handler is None:
+            self._send_json(404, {"message": "not found"})
+            return
+        try:
+            data = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"message": "invalid json"})
+            return
+        self._send_json(200, handler(data))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith("/start/"):
+            self._send_json(404, {"message": "not found"})
+            return
+        if not self._admit():
+            return
+        try:
+            track_id = int(url.path[len("/start/"):])
+        except ValueError:
+            track_id = None
+        query = parse_qs(url.query)
+        status = 3 if query.get("status") == ["3"] else 2
+        transaction = self.server.state.pay(track_id, status)
+        if transaction is None:
+            self._send_json(404, {"message": RESULT_CODES[203]})
+            return
+
+        # The user is redirected to the callbackUrl with the query parameters
+        # of TransactionCallbackQueryParams
+        callback_query = urlencode(
+            {
+                "success": int(transaction.status in (1, 2)),
+                "trackId": transaction.track_id,
+                "orderId": transaction.order_id,
+                "status": transaction.status,
+            }
+        )
+        separator = "&" if "?" in transaction.callback_url else "?"
+        self.send_response(302)
+        self.send_header("Location", transaction.callback_url + separator + callback_query)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _admit(self) -> bool:
+        """Applies the configured latency, rate limit and error rate."""
+        server = self.server
+        if server.latency or server.latency_jitter:
+            time.sleep(server.latency + random.uniform(0, server.latency_jitter))
+        if server.rate_limiter is not None and not server.rate_limiter.acquire():
+            self._send_json(429, {"message": STATUS_CODES[7]})
+            return False
+        if server.error_rate and random.random() < server.error_rate:
+            self._send_json(random.choice((500, 502, 503)), {"message": "error"})
+            return False
+        return True
+
+    def _send_json(self, status_code: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeGatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    state: FakeGatewayState
+    latency: float
+    latency_jitter: float
+    error_rate: float
+    rate_limiter: Optional[_TokenBucket]
+
+
+class FakeZibalGateway:
+    """
+    Runs the fake gateway on a background thread.
+
+    `latency` is the fixed delay in seconds added to each request, plus a
+    random delay up to `latency_jitter` seconds. A `error_rate` fraction of
+    the requests are answered with a 5xx status code. If `rate_limit` is set,
+    requests exceeding `rate_limit` requests per second (with bursts up to
+    `rate_burst` requests) are answered with a 429 status code.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: Optional[float] = None,
+        rate_burst: int = 10,
+        merchants: Iterable[str] = ("zibal",),
+    ):
+        self.state = FakeGatewayState(merchants)
+        self.server = _FakeGatewayServer((host, port), FakeGatewayHandler)
+        self.server.state = self.state
+        self.server.latency = latency
+        self.server.latency_jitter = latency_jitter
+        self.server.error_rate = error_rate
+        self.server.rate_limiter = (
+            _TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        )
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def base_url(self) -> str:
+        """Should be passed as the `base_url` of the clients."""
+        return self.url + "v1/"
+
+    @property
+    def payment_base_url(self) -> str:
+        return self.url + "start/"
+
+    def start(self) -> "FakeZibalGateway":
+        self._thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeZibalGateway":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Zibal IPG locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--rate-burst", type=int, default=10)
+    parser.add_argument("--merchant", action="append", dest="merchants")
+    args = parser.parse_args()
+
+    gateway = FakeZibalGateway(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        rate_burst=args.rate_burst,
+        merchants=args.merchants or ("zibal",),
+    )
+    print(f"Fake Zibal IPG is listening on {gateway.base_url}")
+    try:
+        gateway.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import Callable, Optional
+
+
+class HealthProber:
+    """
+    Probes the health of the IPG on a background thread every `interval`
+    seconds, keeping the outcome and latency of the last `window` probes.
+
+    The service is considered healthy while the success rate of the window
+    is at least `min_success_rate`; the verdict is computed once per probe,
+    so reading `healthy` is O(1). Until the first probe completes, the
+    service is assumed to be healthy.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], bool],
+        interval: float = 5.0,
+        window: int = 20,
+        min_success_rate: float = 0.5,
+    ):
+        self.probe = probe
+        self.interval = interval
+        self.min_success_rate = min_success_rate
+        self.healthy = True
+        self.last_probed_at: Optional[float] = None
+        self._results: deque[tuple[bool, float]] = deque(maxlen=window)
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        with self._lock:
+            if not self._results:
+                return None
+            return sum(ok for ok, _ in self._results) / len(self._results)
+
+    @property
+    def latencies(self) -> list[float]:
+        """The latencies of the probes in the window, in seconds."""
+        with self._lock:
+            return [latency for _, latency in self._results]
+
+    def probe_once(self) -> bool:
+        start = time.monotonic()
+        try:
+            ok = bool(self.probe())
+        except Exception:
+            ok = False
+        latency = time.monotonic() - start
+        with self._lock:
+            self._results.append((ok, latency))
+            success_rate = sum(ok for ok, _ in self._results) / len(self._results)
+            self.healthy = success_rate >= self.min_success_rate
+            self.last_probed_at = time.monotonic()
+        return ok
+
+    def start(self) -> "HealthProber":
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = Thread(
+                target=self._run, name="zibal-health-prober", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self.probe_once()
+            self._stopped.wait(self.interval)
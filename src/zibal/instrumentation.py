@@ -0,0 +1,115 @@
+import math
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional, Sequence
+
+# The phases of a client call, in the order they take place:
+#   build   - building and validating the request model
+#   encode  - serializing the request data to JSON
+#   send    - connecting (if no pooled connection is available), sending the
+#             request and waiting for the server until the response headers
+#             are received
+#   receive - reading the response body
+#   decode  - parsing the JSON response body
+#   model   - constructing the response model
+#   backoff - waiting between the retries of the call
+PHASES = ("build", "encode", "send", "receive", "decode", "model", "backoff")
+
+
+@dataclass
+class CallTimings:
+    """
+    The timings of each phase of a client call in seconds, measured using a
+    monotonic clock. A phase repeated by retries is reported as its sum.
+    """
+
+    endpoint: str
+    result: Optional[int] = None
+    error: Optional[BaseException] = None
+    build: float = 0.0
+    encode: float = 0.0
+    send: float = 0.0
+    receive: float = 0.0
+    decode: float = 0.0
+    model: float = 0.0
+    backoff: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return sum(getattr(self, phase) for phase in PHASES)
+
+
+CallHook = Callable[[CallTimings], None]
+
+
+class PhaseTimer:
+    """Attributes the time elapsed since the previous mark to the given phase."""
+
+    __slots__ = ("timings", "_last")
+
+    def __init__(self, endpoint: str):
+        self.timings = CallTimings(endpoint=endpoint)
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        setattr(self.timings, phase, getattr(self.timings, phase) + now - self._last)
+        self._last = now
+
+
+class LatencyRecorder:
+    """
+    A call hook which keeps the last `window` timings of every endpoint and
+    phase in memory, for computing latency percentiles in-process:
+
+        recorder = LatencyRecorder()
+        client.add_hook(recorder)
+        ...
+        recorder.percentiles("verify", "send")  # {50: ..., 95: ..., 99: ...}
+    """
+
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self._samples: defaultdict = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = Lock()
+
+    def __call__(self, timings: CallTimings) -> None:
+        endpoint = getattr(timings.endpoint, "value", timings.endpoint)
+        with self._lock:
+            for phase in PHASES:
+                self._samples[endpoint, phase].append(getattr(timings, phase))
+            self._samples[endpoint, "total"].append(timings.total)
+
+    def percentiles(
+        self,
+        endpoint: str,
+        phase: str = "total",
+        percents: Sequence[float] = (50, 95, 99),
+    ) -> dict[float, float]:
+        """
+        Returns the nearest-rank percentiles of the recorded timings of the
+        given endpoint and phase, or an empty dict if nothing is recorded.
+        """
+        endpoint = getattr(endpoint, "value", endpoint)
+        with self._lock:
+            samples = sorted(self._samples.get((endpoint, phase), ()))
+        if not samples:
+            return {}
+        return {
+            percent: samples[max(math.ceil(percent / 100 * len(samples)) - 1, 0)]
+            for percent in percents
+        }
+
+    def summary(self, percents: Sequence[float] = (50, 95, 99)) -> dict:
+        """Returns the percentiles of every recorded endpoint and phase."""
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: self.percentiles(key[0], key[1], percents) for key in sorted(keys)
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
@@ -0,0 +1,247 @@
+import sqlite3
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import Callable, Optional
+
+PENDING = "pending"
+DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verify_journal (
+    merchant TEXT NOT NULL,
+    track_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    result INTEGER,
+    status INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (merchant, track_id)
+)
+"""
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    merchant: str
+    track_id: int
+    state: str
+    result: Optional[int]
+    status: Optional[int]
+    updated_at: float
+
+
+@dataclass
+class JournalStats:
+    writes: int = 0
+    commits: int = 0
+
+
+class VerifyJournal:
+    """
+    A write-ahead journal of verify calls kept in a local sqlite database,
+    for finding out which transactions were left unverified after a crash.
+
+    The intent of each verify is recorded before its request is sent, and
+    its outcome once a response is received; after a restart, `unfinished`
+    returns the transactions whose verify has no recorded outcome:
+
+        journal = VerifyJournal("verify-journal.db")
+        client = ZibalIPGClient(merchant, verify_journal=journal)
+        for track_id, result in client.replay_verify_journal():
+            ...
+
+    Every write returns once it is durable. The writes are executed by a
+    single writer thread which commits all of the writes queued by
+    concurrent callers in a single transaction (group commit), so a single
+    fsync is shared by all of them. `commit_delay` is the seconds the writer
+    waits for more writes before committing a batch of up to `max_batch`
+    writes, trading latency for fewer fsyncs.
+    """
+
+    def __init__(self, path: str, commit_delay: float = 0.0, max_batch: int = 512):
+        self.path = path
+        self.commit_delay = commit_delay
+        self.max_batch = max_batch
+        self.stats = JournalStats()
+        self._queue: Queue = Queue()
+        self._closed = False
+        # set once the writer thread exits, guarded by the lock so no write
+        # is queued after the pending writes were failed
+        self._stopped = False
+        self._lock = Lock()
+        ready: Future = Future()
+        self._thread = Thread(
+            target=self._run, args=(ready,), name="zibal-verify-journal", daemon=True
+        )
+        self._thread.start()
+        ready.result()
+
+    def record_intent(self, merchant: str, track_id: int) -> None:
+        now = time.time()
+        self._submit(
+            lambda connection: connection.execute(
+                "INSERT INTO verify_journal VALUES (?, ?, ?, NULL, NULL, ?) "
+                "ON CONFLICT (merchant, track_id) DO UPDATE SET state = ?, "
+                "result = NULL, status = NULL, updated_at = ?",
+                (merchant, track_id, PENDING, now, PENDING, now),
+            )
+        )
+
+    def record_outcome(
+        self,
+        merchant: str,
+        track_id: int,
+        result: Optional[int],
+        status: Optional[int] = None,
+    ) -> None:
+        self._submit(
+            lambda connection: connection.execute(
+                "UPDATE verify_journal SET state = ?, result = ?, status = ?, "
+                "updated_at = ? WHERE merchant = ? AND track_id = ?",
+                (DONE, result, status, time.time(), merchant, track_id),
+            )
+        )
+
+    def unfinished(self, merchant: Optional[str] = None) -> list[int]:
+        """Returns the track ids whose verify has no recorded outcome."""
+        query = "SELECT track_id FROM verify_journal WHERE state = ?"
+        params: tuple = (PENDING,)
+        if merchant is not None:
+            query += " AND merchant = ?"
+            params += (merchant,)
+        query += " ORDER BY updated_at"
+        rows = self._submit(
+            lambda connection: connection.execute(query, params).fetchall()
+        )
+        return [track_id for (track_id,) in rows]
+
+    def get(self, merchant: str, track_id: int) -> Optional[JournalEntry]:
+        row = self._submit(
+            lambda connection: connection.execute(
+                "SELECT * FROM verify_journal WHERE merchant = ? AND track_id = ?",
+                (merchant, track_id),
+            ).fetchone()
+        )
+        return JournalEntry(*row) if row is not None else None
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def __enter__(self) -> "VerifyJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _submit(self, operation: Callable[[sqlite3.Connection], object]):
+        """Queue the operation for the writer thread and wait for its commit."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The verify journal is closed")
+            if self._stopped:
+                raise RuntimeError("The writer thread of the verify journal has stopped")
+            self._queue.put((operation, future))
+        return future.result()
+
+    def _run(self, ready: Future) -> None:
+        try:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.execute(_SCHEMA)
+        except Exception as err:
+            ready.set_exception(err)
+            return
+        ready.set_result(None)
+
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                try:
+                    self._commit(connection, batch)
+                except BaseException:
+                    self._fail(batch)
+                    raise
+        finally:
+            connection.close()
+            with self._lock:
+                self._stopped = True
+            self._fail(self._drain_queue())
+
+    def _drain_queue(self) -> list:
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                return batch
+            if item is not None:
+                batch.append(item)
+
+    @staticmethod
+    def _fail(batch: list) -> None:
+        """Fail the writes which weren't resolved once the writer thread exits."""
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(
+                    RuntimeError("The writer thread of the verify journal has stopped")
+                )
+
+    def _next_batch(self) -> Optional[list]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.commit_delay
+        while len(batch) < self.max_batch:
+            try:
+                timeout = deadline - time.monotonic()
+                if timeout > 0:
+                    item = self._queue.get(timeout=timeout)
+                else:
+                    item = self._queue.get_nowait()
+            except Empty:
+                break
+            if item is None:
+                # commit the batch before stopping
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _commit(self, connection: sqlite3.Connection, batch: list) -> None:
+        results = []
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for operation, _ in batch:
+                # any error of a single write (e.g. an OverflowError for an
+                # integer sqlite can't store) only fails its own future
+                try:
+                    results.append((operation(connection), None))
+                except Exception as err:
+                    results.append((None, err))
+            connection.execute("COMMIT")
+        except Exception as err:
+            try:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+            finally:
+                for _, future in batch:
+                    future.set_exception(err)
+            return
+
+        self.stats.writes += len(batch)
+        self.stats.commits += 1
+        for (_, future), (result, err) in zip(batch, results):
+            if err is not None:
+                future.set_exception(err)
+            else:
+                future.set_result(result)
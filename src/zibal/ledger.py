@@ -0,0 +1,235 @@
+"""
+A compact in-memory ledger of transactions, keeping each field of the
+responses in a typed `array` column instead of keeping the response models.
+
+    ledger = TransactionLedger()
+    ledger.extend(client.inquiry_many(track_ids))
+    ledger.sum("shaparak_fee", by="status")   # {1: 2400, 2: 1200}
+    ledger.window(start, end).count(by="wage")
+    ledger.save("ledger.bin")
+
+The aggregates run over whole columns using builtins implemented in C
+(`bytes.translate` for building masks of the code columns, then
+`itertools.compress` and `sum`), without a Python level loop per row. Time
+windows bisect a sorted index of the timestamp column, which is built once
+using a C level sort and reused until rows are added.
+"""
+
+import math
+import operator
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import compress
+from typing import Iterable, Optional, Union
+
+from zibal.models.schemas import TransactionInquiryResponse, TransactionVerifyResponse
+
+# Column names and their array type codes, in the order they are stored.
+COLUMNS = {
+    "track_id": "q",
+    "amount": "q",
+    "shaparak_fee": "q",
+    "status": "b",
+    "wage": "b",
+    "created_at": "d",
+    "paid_at": "d",
+    "verified_at": "d",
+}
+TIMESTAMP_COLUMNS = ("created_at", "paid_at", "verified_at")
+GROUP_COLUMNS = ("status", "wage")
+# Stored instead of a missing status or wage code.
+MISSING_CODE = -128
+
+_MAGIC = b"ZLDG"
+_VERSION = 1
+# magic, version, byte order ('<' or '>'), number of rows
+_HEADER = struct.Struct("<4sHcQ")
+
+TransactionResponse = Union[TransactionInquiryResponse, TransactionVerifyResponse]
+Timestamp = Union[datetime, float]
+
+
+def parse_timestamp(value: Optional[str]) -> float:
+    """
+    Parse an `IsoDate` string to seconds since the epoch, or NaN if missing.
+    Naive timestamps are stored as if they were in UTC.
+    """
+    if not value:
+        return math.nan
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _mask_table(raw_key: bytes) -> bytes:
+    """
+    A `bytes.translate` table mapping the byte of a code to 1 and any other
+    byte to 0, for building the mask of a code column in a single C call.
+    """
+    table = bytearray(256)
+    table[raw_key[0]] = 1
+    return bytes(table)
+
+
+def _to_seconds(value: Timestamp) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class TransactionLedger:
+    """
+    An append-only columnar store of inquiry and verify responses. Rows are
+    added using `add` or `extend`, and the columns can be read as arrays
+    using `column`.
+    """
+
+    def __init__(self):
+        self._columns = {name: array(code) for name, code in COLUMNS.items()}
+        # maps the timestamp columns to their (length, rows, sorted values)
+        # index, which is rebuilt once the length of the column changes
+        self._indexes: dict[str, tuple[int, array, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self._columns["track_id"])
+
+    def column(self, name: str) -> array:
+        return self._columns[name]
+
+    def add(self, track_id: int, response: TransactionResponse) -> None:
+        columns = self._columns
+        columns["track_id"].append(track_id)
+        columns["amount"].append(response.amount)
+        columns["shaparak_fee"].append(getattr(response, "shaparak_fee", 0) or 0)
+        status = response.status
+        columns["status"].append(MISSING_CODE if status is None else status)
+        wage = getattr(response, "wage", None)
+        columns["wage"].append(MISSING_CODE if wage is None else wage)
+        for name in TIMESTAMP_COLUMNS:
+            columns[name].append(parse_timestamp(getattr(response, name, None)))
+
+    def extend(self, results: Iterable[tuple[int, object]]) -> int:
+        """
+        Add the `(track_id, result)` pairs (e.g. of `inquiry_many`), skipping
+        the failed results, and return the number of added rows.
+        """
+        added = 0
+        for track_id, result in results:
+            if isinstance(result, (TransactionInquiryResponse, TransactionVerifyResponse)):
+                self.add(track_id, result)
+                added += 1
+        return added
+
+    def count(self, by: Optional[str] = None) -> Union[int, dict[int, int]]:
+        """Count the rows, or the rows of each status or wage code."""
+        if by is None:
+            return len(self)
+        raw_keys = self._group_column(by).tobytes()
+        return {
+            key: raw_keys.count(raw_key)
+            for key, raw_key in self._group_keys(raw_keys)
+        }
+
+    def sum(
+        self, name: str, by: Optional[str] = None
+    ) -> Union[int, float, dict[int, Union[int, float]]]:
+        """Sum the column, or sum it per status or wage code."""
+        values = self._columns[name]
+        if by is None:
+            return sum(values)
+        raw_keys = self._group_column(by).tobytes()
+        return {
+            key: sum(compress(values, raw_keys.translate(_mask_table(raw_key))))
+            for key, raw_key in self._group_keys(raw_keys)
+        }
+
+    def window(
+        self,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+        column: str = "paid_at",
+    ) -> "TransactionLedger":
+        """
+        Return a new ledger of the rows whose `column` timestamp is in the
+        range `[start, end)`. Rows without the timestamp are excluded.
+        """
+        if column not in TIMESTAMP_COLUMNS:
+            raise ValueError(f"{column} is not a timestamp column")
+        low = -math.inf if start is None else _to_seconds(start)
+        high = math.inf if end is None else _to_seconds(end)
+        rows, values = self._sorted_index(column)
+        # the selected rows are sorted back, to keep the order they were added
+        return self._take(sorted(rows[bisect_left(values, low):bisect_left(values, high)]))
+
+    def where(self, by: str, code: int) -> "TransactionLedger":
+        """Return a new ledger of the rows with the given status or wage code."""
+        raw_keys = self._group_column(by).tobytes()
+        raw_key = array("b", [code]).tobytes()
+        return self._select(raw_keys.translate(_mask_table(raw_key)))
+
+    def save(self, path: str) -> None:
+        """Write the ledger to a binary file, readable using `load`."""
+        byteorder = b"<" if sys.byteorder == "little" else b">"
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, byteorder, len(self)))
+            for name in COLUMNS:
+                self._columns[name].tofile(file)
+
+    @classmethod
+    def load(cls, path: str) -> "TransactionLedger":
+        ledger = cls()
+        with open(path, "rb") as file:
+            magic, version, byteorder, rows = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{path} is not a transaction ledger file")
+            swap = byteorder != (b"<" if sys.byteorder == "little" else b">")
+            for name in COLUMNS:
+                column = ledger._columns[name]
+                column.fromfile(file, rows)
+                if swap:
+                    column.byteswap()
+        return ledger
+
+    def _sorted_index(self, column: str) -> tuple[array, array]:
+        """
+        Returns the rows with the timestamp, sorted by the timestamp, and
+        their sorted timestamps. Rows without the timestamp (NaN, which is
+        the only value not equal to itself) are left out.
+        """
+        values = self._columns[column]
+        index = self._indexes.get(column)
+        if index is None or index[0] != len(values):
+            present = compress(range(len(values)), map(operator.eq, values, values))
+            rows = array("q", sorted(present, key=values.__getitem__))
+            index = len(values), rows, array("d", map(values.__getitem__, rows))
+            self._indexes[column] = index
+        return index[1], index[2]
+
+    def _group_column(self, by: str) -> array:
+        if by not in GROUP_COLUMNS:
+            raise ValueError(f"Can only group by one of {GROUP_COLUMNS}")
+        return self._columns[by]
+
+    @staticmethod
+    def _group_keys(raw_keys: bytes) -> list[tuple[int, bytes]]:
+        """Returns the sorted distinct codes of a group column, with their byte."""
+        codes = array("b", bytes(sorted(set(raw_keys))))
+        return sorted((code, array("b", [code]).tobytes()) for code in codes)
+
+    def _select(self, mask: Iterable) -> "TransactionLedger":
+        ledger = TransactionLedger()
+        for name, column in self._columns.items():
+            ledger._columns[name] = array(column.typecode, compress(column, mask))
+        return ledger
+
+    def _take(self, rows: Iterable[int]) -> "TransactionLedger":
+        ledger = TransactionLedger()
+        for name, column in self._columns.items():
+            ledger._columns[name] = array(column.typecode, map(column.__getitem__, rows))
+        return ledger
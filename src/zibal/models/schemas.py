@@ -1,9 +1,9 @@
-from typing import List, Literal, Optional, Type, TypeVar
+from typing import List, Literal, Mapping, Optional, Sequence, Type, TypeVar, Union
 
-from pydantic import BaseModel, ConfigDict, HttpUrl, field_validator
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, HttpUrl, field_validator
 
-from zibal.response_codes import STATUS_CODES, WAGE_CODES
-from zibal.utils import to_camel_case_dict, to_snake_case_dict
+from zibal.response_codes import RESULT_CODES, STATUS_CODES, WAGE_CODES
+from zibal.utils import convert_to_camel_case
 
 # All of the data models with the word 'Request' ending in their name are
 # the data structures used in body of HTTP requests, while the data models
@@ -17,21 +17,99 @@ WageCode = Literal[0, 1, 2]
 IsoDate = str  # e.g. '2024-08-11T16:06:44.731255'
 T = TypeVar("T", bound="TransactionBase")
 
+# Zibal returns the multiplexing info list under 'multiplexingInfos', which
+# doesn't follow the camel case form of the field name.
+MultiplexingInfo = Field(
+    default=[],
+    alias="multiplexingInfos",
+    validation_alias=AliasChoices(
+        "multiplexingInfos", "multiplexingInfo", "multiplexing_info"
+    ),
+)
+
+
+def check_amount_range(amount: int) -> int:
+    if not (2000000000 > amount > 1500):
+        raise ValueError(
+            "Amount must be in the range (2,000,000,000, 1,500)"
+        )
+    return amount
+
 
 class TransactionBase(BaseModel):
+    # The camel case alias of each field is generated once when the model
+    # class is created, so converting from and to camel case keys doesn't
+    # need any string processing per call. Building the validators is
+    # deferred until a model is first used, to keep importing fast.
+    model_config = ConfigDict(
+        alias_generator=convert_to_camel_case, populate_by_name=True, defer_build=True
+    )
+
     def model_dump_to_camel(self, **kwargs) -> dict:
         """
-        Same as model_dump method, but convert the snake case keys into camel
-        case keys. Pass any passed kwargs to model_dump.
+        Same as model_dump method, but with camel case keys. Pass any passed
+        kwargs to model_dump.
         """
-        data = self.model_dump(**kwargs)
-        return to_camel_case_dict(data)
+        return self.model_dump(by_alias=True, **kwargs)
+
+    @classmethod
+    def _prepare_data(cls, data: dict) -> dict:
+        """Hook for adding derived fields to the received data."""
+        return data
 
     @classmethod
     def from_camel_case(cls: Type[T], data: dict) -> T:
-        """Initialize an instance by converting the dict camel case keys to snake case keys."""
-        data = to_snake_case_dict(data)
-        return cls(**data)
+        """Initialize an instance from a dict with camel case keys."""
+        return cls.model_validate(cls._prepare_data(data))
+
+    @classmethod
+    def _trusted_fields(cls) -> tuple:
+        """
+        Returns `(name, keys, field_info)` of each field, where keys are the
+        accepted keys of the field in received data. Built once per class.
+        """
+        fields = _TRUSTED_FIELDS.get(cls)
+        if fields is None:
+            fields = []
+            for name, field in cls.model_fields.items():
+                if isinstance(field.validation_alias, AliasChoices):
+                    keys = tuple(field.validation_alias.choices)
+                else:
+                    keys = (field.validation_alias or field.alias or name, name)
+                fields.append((name, tuple(dict.fromkeys(keys)), field))
+            fields = _TRUSTED_FIELDS[cls] = tuple(fields)
+        return fields
+
+    @classmethod
+    def construct_from_camel_case(cls: Type[T], data: dict) -> T:
+        """
+        Same as from_camel_case, but the instance is constructed without
+        validation, so it should only be used for trusted data.
+        """
+        data = cls._prepare_data(data)
+        values = {}
+        fields_set = set()
+        for name, keys, field in cls._trusted_fields():
+            for key in keys:
+                if key in data:
+                    values[name] = data[key]
+                    fields_set.add(name)
+                    break
+            else:
+                if field.is_required():
+                    continue
+                values[name] = field.get_default(call_default_factory=True)
+        # The same attributes model_construct sets, without its per call
+        # alias resolution, which makes it slower than validating the data.
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, "__dict__", values)
+        object.__setattr__(instance, "__pydantic_fields_set__", fields_set)
+        object.__setattr__(instance, "__pydantic_extra__", None)
+        object.__setattr__(instance, "__pydantic_private__", None)
+        return instance
+
+
+_TRUSTED_FIELDS: dict = {}
 
 
 class TransactionRequireRequest(TransactionBase):
@@ -51,20 +129,59 @@ class TransactionRequireRequest(TransactionBase):
 
     @field_validator("amount")
     def in_correct_range(cls, amount):
-        if not (2000000000 > amount > 1500):
-            raise ValueError(
-                "Amount must be in the range (2,000,000,000, 1,500)"
-            )
-        return amount
+        return check_amount_range(amount)
+
+
+class TransactionRequireOrder(TransactionBase):
+    """
+    The fields of TransactionRequireRequest which differ per order, validated
+    on their own when a request template is used.
+    """
+
+    model_config = ConfigDict(strict=True)
+
+    amount: int
+    order_id: Optional[str] = None
+    mobile: Optional[str] = None
+
+    @field_validator("amount")
+    def in_correct_range(cls, amount):
+        return check_amount_range(amount)
 
 
 class FailedResultDetail(BaseModel):
     """Used for result codes where the code is not 100 (i.e. not success)"""
 
+    model_config = ConfigDict(frozen=True, defer_build=True)
+
     result_code: int
     result_meaning: str
 
 
+UNKNOWN_RESULT_MEANING = "Unknown result code"
+
+# Failed results are immutable, so a single instance of each known result
+# code is shared by all of the failed responses, created on first use.
+_FAILED_RESULT_DETAILS: dict[int, FailedResultDetail] = {}
+
+
+def get_failed_result_detail(result_code: int) -> FailedResultDetail:
+    """
+    Returns the shared detail of a known result code, or a new detail with
+    `UNKNOWN_RESULT_MEANING` as its meaning for an unknown result code.
+    """
+    detail = _FAILED_RESULT_DETAILS.get(result_code)
+    if detail is not None:
+        return detail
+    result_meaning = RESULT_CODES.get(result_code)
+    if result_meaning is None:
+        return FailedResultDetail(
+            result_code=result_code, result_meaning=UNKNOWN_RESULT_MEANING
+        )
+    detail = FailedResultDetail(result_code=result_code, result_meaning=result_meaning)
+    return _FAILED_RESULT_DETAILS.setdefault(result_code, detail)
+
+
 class TransactionRequireResponse(TransactionBase):
     track_id: int
     result: ResultCode
@@ -86,6 +203,27 @@ class TransactionCallbackQueryParams(TransactionBase):
     order_id: str
     status: StatusCode
 
+    @classmethod
+    def from_query(
+        cls, query: Mapping[str, Union[str, Sequence[str]]]
+    ) -> "TransactionCallbackQueryParams":
+        """
+        Initialize an instance from the parsed query string of the callback
+        (e.g. the result of `urllib.parse.parse_qs` with `keep_blank_values`,
+        since `orderId` is blank for transactions without an order id), where
+        all of the values are strings.
+        """
+        data = {}
+        for key, value in query.items():
+            if not isinstance(value, str):
+                value = value[-1] if value else ""
+            data[key] = value
+        for key in ("success", "trackId", "status"):
+            value = data.get(key)
+            if isinstance(value, str) and value.lstrip("-").isdigit():
+                data[key] = int(value)
+        return cls.model_validate(data)
+
 
 class TransactionVerifyRequest(TransactionBase):
     """Transactions that need to be verified by the app"""
@@ -107,16 +245,14 @@ class TransactionVerifyResponse(TransactionBase):
     order_id: Optional[str] = None  # if successful
     result: ResultCode
     message: str
-    multiplexing_info: List[str] = []
+    multiplexing_info: List[str] = MultiplexingInfo
 
     @classmethod
-    def from_camel_case(cls: Type[T], data: dict) -> T:
+    def _prepare_data(cls, data: dict) -> dict:
         status = data.get("status")
         if status is not None:
-            data["status_meaning"] = STATUS_CODES.get(
-                status, "Unknown status"
-            )
-        return super().from_camel_case(data)
+            data = {**data, "statusMeaning": STATUS_CODES.get(status, "Unknown status")}
+        return data
 
 
 class TransactionInquiryRequest(TransactionBase):
@@ -144,15 +280,16 @@ class TransactionInquiryResponse(TransactionBase):
     shaparak_fee: int
     result: ResultCode
     message: str
-    multiplexing_info: List[str] = []
+    multiplexing_info: List[str] = MultiplexingInfo
 
     @classmethod
-    def from_camel_case(cls: Type[T], data: dict) -> T:
+    def _prepare_data(cls, data: dict) -> dict:
         status = data.get("status")
         wage = data.get("wage")
         if status is not None and wage is not None:
-            data["status_meaning"] = STATUS_CODES.get(
-                status, "Unknown status"
-            )
-            data["wage_meaning"] = WAGE_CODES.get(wage, "Unknown wage")
-        return super().from_camel_case(data)
+            data = {
+                **data,
+                "statusMeaning": STATUS_CODES.get(status, "Unknown status"),
+                "wageMeaning": WAGE_CODES.get(wage, "Unknown wage"),
+            }
+        return data
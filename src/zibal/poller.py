@@ -0,0 +1,336 @@
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from typing import Callable, Optional, Union
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import ResultError
+from zibal.models.schemas import (
+    FailedResultDetail,
+    TransactionInquiryResponse,
+    TransactionVerifyResponse,
+)
+
+# Statuses of transactions which are still waiting for the user to pay.
+WAITING_STATUS_CODES = frozenset({-1, -2})
+PAID_UNVERIFIED_STATUS = 2
+VERIFIED_STATUS = 1
+
+# Result codes after which the transaction can't be verified or inquired.
+ALREADY_VERIFIED_RESULT = 201
+INVALID_TRACK_ID_RESULT = 203
+
+
+@dataclass
+class PendingTransaction:
+    track_id: int
+    added_at: float
+    due_at: float
+    polls: int = 0
+    errors: int = 0
+    last_status: Optional[int] = None
+
+
+@dataclass
+class PollEvent:
+    """
+    Emitted once a pending transaction is done, with one of the outcomes:
+        verified - the transaction is paid and verified
+        failed   - the transaction reached a final status other than verified
+                   (e.g. 'Cancelled by user'), or its track id is invalid
+        expired  - the transaction is still pending after `max_age` seconds
+    """
+
+    track_id: int
+    outcome: str
+    status: Optional[int] = None
+    result: Optional[
+        Union[TransactionInquiryResponse, TransactionVerifyResponse, FailedResultDetail]
+    ] = None
+
+
+PollCallback = Callable[[PollEvent], None]
+
+
+class TransactionPoller:
+    """
+    Polls the pending transactions until they are verified, failed or
+    expired, and verifies the ones which are paid but not verified yet.
+
+    The transactions are kept in a priority queue ordered by their next poll
+    time. On each tick, up to `batch_size` due transactions are inquired
+    (and verified, if paid) using at most `max_concurrency` threads:
+
+        poller = TransactionPoller(client, on_complete=handle_event)
+        poller.add(track_id)
+        poller.start()
+
+    The poll interval adapts to each transaction; paid transactions are
+    polled every `min_interval` seconds, while the ones waiting for payment
+    are polled less often as they age (`age * age_factor` seconds, between
+    `min_interval` and `max_interval`). Failed calls are retried with an
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        client: ZibalIPGClient,
+        on_complete: Optional[PollCallback] = None,
+        max_concurrency: int = 10,
+        batch_size: int = 100,
+        min_interval: float = 5.0,
+        max_interval: float = 300.0,
+        age_factor: float = 0.25,
+        max_age: float = 86400.0,
+        tick_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_factor = age_factor
+        self.max_age = max_age
+        self.tick_interval = tick_interval
+        self._callbacks: list[PollCallback] = []
+        if on_complete is not None:
+            self._callbacks.append(on_complete)
+        self._clock = clock
+        self._pending: dict[int, PendingTransaction] = {}
+        # heap of (due_at, sequence, track_id) entries, entries of removed or
+        # rescheduled transactions are skipped when popped
+        self._queue: list[tuple[float, int, int]] = []
+        self._sequence = itertools.count()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self._pending
+
+    def add_callback(self, callback: PollCallback) -> None:
+        self._callbacks.append(callback)
+
+    def add(self, track_id: int, delay: float = 0.0) -> None:
+        """Start polling the transaction after `delay` seconds."""
+        now = self._clock()
+        with self._lock:
+            if track_id in self._pending:
+                return
+            item = PendingTransaction(track_id, added_at=now, due_at=now + delay)
+            self._pending[track_id] = item
+            self._push(item)
+
+    def discard(self, track_id: int) -> None:
+        """Stop polling the transaction, e.g. once its callback is received."""
+        with self._lock:
+            self._pending.pop(track_id, None)
+
+    def next_due_at(self) -> Optional[float]:
+        with self._lock:
+            self._drop_stale()
+            return self._queue[0][0] if self._queue else None
+
+    def tick(self) -> list[PollEvent]:
+        """Poll the due transactions once and return the emitted events."""
+        batch = self._pop_due()
+        if not batch:
+            return []
+
+        events: list[PollEvent] = []
+        try:
+            self._poll(batch, events)
+        except BaseException:
+            # the batch was taken off the queue, so the items which weren't
+            # handled before the failure are rescheduled as failed polls
+            with self._lock:
+                unhandled = [
+                    item
+                    for item in batch
+                    if item.due_at == math.inf and self._pending.get(item.track_id) is item
+                ]
+            for item in unhandled:
+                item.errors += 1
+                event = self._reschedule(item)
+                if event is not None:
+                    events.append(event)
+            raise
+        finally:
+            for event in events:
+                self._emit(event)
+        return events
+
+    def _poll(self, batch: list[PendingTransaction], events: list[PollEvent]) -> None:
+        paid = []
+        inquiries = self.client.inquiry_many(
+            [item.track_id for item in batch],
+            max_workers=self.max_concurrency,
+            ordered=False,
+        )
+        items = {item.track_id: item for item in batch}
+        for track_id, result in inquiries:
+            item = items[track_id]
+            item.polls += 1
+            if isinstance(result, TransactionInquiryResponse):
+                item.errors = 0
+                item.last_status = result.status
+                if result.status == PAID_UNVERIFIED_STATUS:
+                    paid.append(item)
+                    continue
+            event = self._handle_inquiry(item, result)
+            if event is not None:
+                events.append(event)
+
+        if paid:
+            verifies = self.client.verify_many(
+                [item.track_id for item in paid],
+                max_workers=self.max_concurrency,
+                ordered=False,
+            )
+            for track_id, result in verifies:
+                event = self._handle_verify(items[track_id], result)
+                if event is not None:
+                    events.append(event)
+
+    def run_until_empty(self, timeout: Optional[float] = None) -> None:
+        """Tick until no transaction is pending, or `timeout` seconds pass."""
+        started_at = time.monotonic()
+        while self._pending and not self._stopped.is_set():
+            self.tick()
+            if timeout is not None and time.monotonic() - started_at >= timeout:
+                return
+            self._stopped.wait(self._sleep_time())
+
+    def start(self) -> "TransactionPoller":
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = Thread(
+                target=self._run, name="zibal-transaction-poller", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.tick()
+            except Exception:
+                self.client.logger.exception("Poller tick failed")
+            self._stopped.wait(self._sleep_time())
+
+    def _sleep_time(self) -> float:
+        due_at = self.next_due_at()
+        if due_at is None:
+            return self.tick_interval
+        return min(max(due_at - self._clock(), 0.0), self.tick_interval)
+
+    def _handle_inquiry(self, item: PendingTransaction, result) -> Optional[PollEvent]:
+        if isinstance(result, TransactionInquiryResponse):
+            if result.status == VERIFIED_STATUS:
+                return self._complete(item, "verified", result)
+            if result.status not in WAITING_STATUS_CODES:
+                return self._complete(item, "failed", result)
+            return self._reschedule(item)
+        if self._result_code(result) == INVALID_TRACK_ID_RESULT:
+            return self._complete(item, "failed", self._detail(result))
+        item.errors += 1
+        return self._reschedule(item)
+
+    def _handle_verify(self, item: PendingTransaction, result) -> Optional[PollEvent]:
+        if isinstance(result, TransactionVerifyResponse):
+            item.last_status = result.status
+            return self._complete(item, "verified", result)
+        if self._result_code(result) == ALREADY_VERIFIED_RESULT:
+            item.last_status = VERIFIED_STATUS
+            return self._complete(item, "verified", self._detail(result))
+        if self._result_code(result) == INVALID_TRACK_ID_RESULT:
+            return self._complete(item, "failed", self._detail(result))
+        item.errors += 1
+        return self._reschedule(item)
+
+    @staticmethod
+    def _result_code(result) -> Optional[int]:
+        if isinstance(result, FailedResultDetail):
+            return result.result_code
+        if isinstance(result, ResultError):
+            return result.result_code
+        return None
+
+    @staticmethod
+    def _detail(result) -> Optional[FailedResultDetail]:
+        return result if isinstance(result, FailedResultDetail) else None
+
+    def _complete(self, item: PendingTransaction, outcome: str, result) -> PollEvent:
+        with self._lock:
+            # the transaction could be discarded and added again meanwhile
+            if self._pending.get(item.track_id) is item:
+                del self._pending[item.track_id]
+        return PollEvent(item.track_id, outcome, item.last_status, result)
+
+    def _reschedule(self, item: PendingTransaction) -> Optional[PollEvent]:
+        now = self._clock()
+        if now - item.added_at >= self.max_age:
+            return self._complete(item, "expired", None)
+        item.due_at = now + self.next_interval(item, now)
+        with self._lock:
+            if self._pending.get(item.track_id) is item:
+                self._push(item)
+        return None
+
+    def next_interval(self, item: PendingTransaction, now: float) -> float:
+        """Returns the seconds to wait before polling the transaction again."""
+        if item.errors:
+            interval = self.min_interval * 2 ** (item.errors - 1)
+        elif item.last_status == PAID_UNVERIFIED_STATUS:
+            interval = self.min_interval
+        else:
+            interval = (now - item.added_at) * self.age_factor
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _push(self, item: PendingTransaction) -> None:
+        heapq.heappush(self._queue, (item.due_at, next(self._sequence), item.track_id))
+
+    def _drop_stale(self) -> None:
+        while self._queue and not self._is_current(self._queue[0]):
+            heapq.heappop(self._queue)
+
+    def _is_current(self, entry: tuple[float, int, int]) -> bool:
+        item = self._pending.get(entry[2])
+        return item is not None and item.due_at == entry[0]
+
+    def _pop_due(self) -> list[PendingTransaction]:
+        now = self._clock()
+        batch = []
+        with self._lock:
+            while self._queue and len(batch) < self.batch_size:
+                self._drop_stale()
+                if not self._queue or self._queue[0][0] > now:
+                    break
+                _, _, track_id = heapq.heappop(self._queue)
+                item = self._pending[track_id]
+                # not scheduled again until it is rescheduled after the poll
+                item.due_at = math.inf
+                batch.append(item)
+        return batch
+
+    def _emit(self, event: PollEvent) -> None:
+        for callback in self._callbacks:
+            try:
+                callback(event)
+            except Exception:
+                self.client.logger.exception(
+                    "Poller callback failed for track_id=%s", event.track_id
+                )
@@ -0,0 +1,234 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+class TokenBucket:
+    """
+    A thread-safe token bucket, refilled with `rate` tokens per second up to
+    `burst` tokens.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._clock = clock
+        self._lock = Lock()
+        self._tokens = self.burst
+        self._updated_at = clock()
+        self._rate = rate
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        """Yields the mutable state of the bucket, while holding its lock."""
+        with self._lock:
+            state = {
+                "tokens": self._tokens,
+                "updated_at": self._updated_at,
+                "rate": self._rate,
+            }
+            yield state
+            self._tokens = state["tokens"]
+            self._updated_at = state["updated_at"]
+            self._rate = state["rate"]
+
+    @property
+    def rate(self) -> float:
+        with self._state() as state:
+            return state["rate"]
+
+    def set_rate(self, rate: float) -> None:
+        with self._state() as state:
+            self._refill(state)
+            state["rate"] = rate
+
+    def _refill(self, state: dict) -> None:
+        now = self._clock()
+        elapsed = max(now - state["updated_at"], 0)
+        state["tokens"] = min(self.burst, state["tokens"] + elapsed * state["rate"])
+        state["updated_at"] = now
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available and return zero, otherwise return
+        the seconds to wait until a token becomes available.
+        """
+        with self._state() as state:
+            self._refill(state)
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0.0
+            return (1 - state["tokens"]) / state["rate"]
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Block until a token is taken and return the seconds waited for it,
+        or return None if no token can be taken within `timeout` seconds.
+        """
+        start = time.monotonic()
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                return None
+            time.sleep(wait)
+            waited = time.monotonic() - start
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    A token bucket whose state is kept in a file and guarded by an exclusive
+    file lock, so it can be shared by worker processes on the same machine.
+    Only available on platforms supporting `fcntl`.
+    """
+
+    def __init__(self, path: str, rate: float, burst: Optional[float] = None):
+        if fcntl is None:
+            raise RuntimeError("FileTokenBucket requires a platform with fcntl")
+        self.path = path
+        super().__init__(rate=rate, burst=burst, clock=time.time)
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        with self._lock, open(self.path, "a+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                content = file.read()
+                state = json.loads(content) if content else {
+                    "tokens": self.burst,
+                    "updated_at": self._clock(),
+                    "rate": self._rate,
+                }
+                yield state
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+@dataclass
+class RateLimitStats:
+    acquired: int = 0
+    delayed: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    limited: int = 0
+    rate: float = 0.0
+
+
+class RateLimiter:
+    """
+    Paces the outgoing requests of the clients using a token bucket per
+    endpoint, and can be shared between threads and clients.
+
+    Each endpoint is limited to `rate` requests per second with bursts of up
+    to `burst` requests, unless a specific rate is given in
+    `endpoint_rates`. If `shared_dir` is given, the buckets are kept in files
+    in that directory, so all of the processes using the same directory share
+    the limits.
+
+    The rate adapts to the responses (additive increase, multiplicative
+    decrease); when a request is throttled (a 429 status code) the rate of
+    the endpoint is multiplied by `decrease_factor`, and every successful
+    request raises it by `increase_step` until the configured rate is
+    reached again. The limit related `status` codes of the responses (7 and
+    8) are not used as a throttling signal, since on inquiry and verify they
+    are the stored state of the transaction (e.g. a payer who has exceeded
+    a card limit earlier), not the outcome of the request itself.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: Optional[float] = None,
+        endpoint_rates: Optional[dict[str, float]] = None,
+        shared_dir: Optional[str] = None,
+        decrease_factor: float = 0.5,
+        increase_step: Optional[float] = None,
+        min_rate: float = 0.1,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.endpoint_rates = endpoint_rates or {}
+        self.shared_dir = shared_dir
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_rate = min_rate
+        self.stats: dict[str, RateLimitStats] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = Lock()
+
+    def configured_rate(self, endpoint: str) -> float:
+        return self.endpoint_rates.get(endpoint, self.rate)
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self._buckets.get(endpoint)
+        if bucket is not None:
+            return bucket
+        with self._lock:
+            if endpoint not in self._buckets:
+                rate = self.configured_rate(endpoint)
+                if self.shared_dir is None:
+                    bucket = TokenBucket(rate, self.burst)
+                else:
+                    path = os.path.join(self.shared_dir, f"zibal-{endpoint}.bucket")
+                    bucket = FileTokenBucket(path, rate, self.burst)
+                self._buckets[endpoint] = bucket
+                self.stats[endpoint] = RateLimitStats(rate=rate)
+            return self._buckets[endpoint]
+
+    def acquire(self, endpoint: str, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Wait for the rate limit of the endpoint and return the seconds waited,
+        or return None if the request can't be made within `timeout` seconds.
+        """
+        waited = self.bucket(endpoint).acquire(timeout)
+        with self._lock:
+            stats = self.stats[endpoint]
+            if waited is None:
+                stats.rejected += 1
+                return None
+            stats.acquired += 1
+            if waited > 0:
+                stats.delayed += 1
+                stats.total_wait += waited
+                stats.max_wait = max(stats.max_wait, waited)
+        return waited
+
+    def record_limited(self, endpoint: str) -> None:
+        bucket = self.bucket(endpoint)
+        rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+        bucket.set_rate(rate)
+        with self._lock:
+            self.stats[endpoint].limited += 1
+            self.stats[endpoint].rate = rate
+
+    def record_success(self, endpoint: str) -> None:
+        bucket = self.bucket(endpoint)
+        configured_rate = self.configured_rate(endpoint)
+        rate = bucket.rate
+        if rate >= configured_rate:
+            return
+        step = self.increase_step or configured_rate * 0.05
+        rate = min(configured_rate, rate + step)
+        bucket.set_rate(rate)
+        with self._lock:
+            self.stats[endpoint].rate = rate
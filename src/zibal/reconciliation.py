@@ -0,0 +1,216 @@
+"""
+Streaming reconciliation of transactions against the expected records of
+the merchant, such as an end-of-day report of the orders.
+
+The expected records are read lazily, inquired with bounded concurrency and
+compared one at a time, so the memory used stays the same regardless of the
+number of records:
+
+    reconciler = Reconciler(client, max_workers=20)
+    for mismatch in reconciler.reconcile(read_csv("orders.csv")):
+        report.write(mismatch)
+    print(reconciler.totals.summary())
+"""
+
+import csv
+import json
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional, Union
+
+from zibal.client import ZibalIPGClient
+from zibal.models.schemas import TransactionInquiryResponse
+from zibal.response_codes import WAGE_CODES
+
+# The fields compared with the expected records.
+COMPARED_FIELDS = ("amount", "status", "ref_number", "order_id")
+_INT_FIELDS = frozenset({"track_id", "amount", "status", "ref_number"})
+# The accepted (camel case) keys of the fields in CSV and JSON lines files.
+_FIELD_KEYS = {
+    "trackId": "track_id",
+    "amount": "amount",
+    "status": "status",
+    "refNumber": "ref_number",
+    "orderId": "order_id",
+}
+PAID_AND_VERIFIED = 1
+
+
+@dataclass(frozen=True)
+class ExpectedRecord:
+    """
+    The expected state of a transaction; fields left as None are not
+    compared.
+    """
+
+    track_id: int
+    amount: Optional[int] = None
+    status: Optional[int] = None
+    ref_number: Optional[int] = None
+    order_id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExpectedRecord":
+        """Build a record from a dict with camel case or snake case keys."""
+        values = {}
+        for key, value in data.items():
+            name = _FIELD_KEYS.get(key, key)
+            if name not in _FIELD_KEYS.values() or value in (None, ""):
+                continue
+            values[name] = int(value) if name in _INT_FIELDS else str(value)
+        return cls(**values)
+
+
+@dataclass(frozen=True)
+class Mismatch:
+    """
+    A transaction whose state differs from its expected record, where
+    `differences` maps each differing field to `(expected, actual)`. If the
+    transaction couldn't be inquired, `error` describes the failure.
+    """
+
+    track_id: int
+    differences: dict[str, tuple[Any, Any]] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class WageTotals:
+    count: int = 0
+    amount: int = 0
+    shaparak_fee: int = 0
+
+
+@dataclass
+class ReconciliationTotals:
+    """
+    The running totals of a reconciliation. The amounts and fees are only
+    summed for the 'Paid and verified' transactions, grouped by their wage
+    code (see `WAGE_CODES`).
+    """
+
+    records: int = 0
+    matched: int = 0
+    mismatched: int = 0
+    failed: int = 0
+    amount: int = 0
+    shaparak_fee: int = 0
+    by_wage: dict[Optional[int], WageTotals] = field(
+        default_factory=lambda: defaultdict(WageTotals)
+    )
+
+    def add(self, response: TransactionInquiryResponse) -> None:
+        if response.status != PAID_AND_VERIFIED:
+            return
+        self.amount += response.amount
+        self.shaparak_fee += response.shaparak_fee
+        wage_totals = self.by_wage[response.wage]
+        wage_totals.count += 1
+        wage_totals.amount += response.amount
+        wage_totals.shaparak_fee += response.shaparak_fee
+
+    def summary(self) -> dict:
+        return {
+            "records": self.records,
+            "matched": self.matched,
+            "mismatched": self.mismatched,
+            "failed": self.failed,
+            "amount": self.amount,
+            "shaparak_fee": self.shaparak_fee,
+            "by_wage": {
+                WAGE_CODES.get(wage, "Unknown wage"): vars(totals)
+                for wage, totals in self.by_wage.items()
+            },
+        }
+
+
+def read_csv(path: str, **reader_kwargs) -> Iterator[ExpectedRecord]:
+    """Lazily read the expected records from a CSV file with a header row."""
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file, **reader_kwargs):
+            yield ExpectedRecord.from_dict(row)
+
+
+def read_jsonl(path: str) -> Iterator[ExpectedRecord]:
+    """Lazily read the expected records from a JSON lines file."""
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield ExpectedRecord.from_dict(json.loads(line))
+
+
+def compare(
+    record: ExpectedRecord, response: TransactionInquiryResponse
+) -> dict[str, tuple[Any, Any]]:
+    differences = {}
+    for name in COMPARED_FIELDS:
+        expected = getattr(record, name)
+        if expected is None:
+            continue
+        actual = getattr(response, name)
+        if expected != actual:
+            differences[name] = (expected, actual)
+    return differences
+
+
+class Reconciler:
+    """
+    Inquires the transactions of the expected records using the client with
+    at most `max_workers` concurrent requests, and yields the mismatches as
+    they are found while updating `totals`.
+
+    The records can be `ExpectedRecord` instances, dicts or plain track ids
+    (which are only inquired and totaled). The inquiry cache of the client
+    should be disabled, to keep the memory used flat.
+    """
+
+    def __init__(self, client: ZibalIPGClient, max_workers: int = 10):
+        self.client = client
+        self.max_workers = max_workers
+        self.totals = ReconciliationTotals()
+
+    def reconcile(
+        self, records: Iterable[Union[ExpectedRecord, dict, int]]
+    ) -> Iterator[Mismatch]:
+        # the records being inquired, only up to the window of inquiry_many
+        in_flight: dict[int, deque] = defaultdict(deque)
+
+        def track_ids() -> Iterator[int]:
+            for record in records:
+                if isinstance(record, dict):
+                    record = ExpectedRecord.from_dict(record)
+                elif not isinstance(record, ExpectedRecord):
+                    record = ExpectedRecord(track_id=int(record))
+                in_flight[record.track_id].append(record)
+                yield record.track_id
+
+        results = self.client.inquiry_many(
+            track_ids(), max_workers=self.max_workers, ordered=False
+        )
+        for track_id, result in results:
+            pending = in_flight[track_id]
+            record = pending.popleft()
+            if not pending:
+                del in_flight[track_id]
+            mismatch = self._check(record, result)
+            if mismatch is not None:
+                yield mismatch
+
+    def _check(self, record: ExpectedRecord, result) -> Optional[Mismatch]:
+        totals = self.totals
+        totals.records += 1
+        if not isinstance(result, TransactionInquiryResponse):
+            totals.failed += 1
+            if isinstance(result, Exception):
+                error = f"{type(result).__name__}: {result}"
+            else:
+                error = f"{result.result_code}: {result.result_meaning}"
+            return Mismatch(record.track_id, error=error)
+
+        totals.add(result)
+        differences = compare(record, result)
+        if differences:
+            totals.mismatched += 1
+            return Mismatch(record.track_id, differences)
+        totals.matched += 1
+        return None
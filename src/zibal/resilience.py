@@ -0,0 +1,115 @@
+import random
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from threading import Lock
+from typing import Callable, FrozenSet
+
+from zibal.exceptions import CircuitOpenError
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry policy for idempotent endpoints (i.e. inquiry and verify).
+
+    A failed attempt is retried up to `max_attempts` attempts in total, if it
+    failed due to a network error or one of the `retry_on_status` HTTP status
+    codes. The delay before the n-th retry is picked uniformly between zero
+    and `min(backoff_max, backoff_base * 2 ** (n - 1))` (i.e. full jitter),
+    so the retries of different callers don't pile up in sync.
+    """
+
+    max_attempts: int = 3
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    jitter: bool = True
+    retry_on_status: FrozenSet[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504})
+    )
+
+    def backoff(self, retry: int) -> float:
+        """Returns the delay in seconds before the given retry (starting from 1)."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (retry - 1))
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker for the network requests of a client.
+
+    After `failure_threshold` consecutive failed requests the circuit opens,
+    and any request is rejected with a `CircuitOpenError` without being sent
+    for `reset_timeout` seconds. Then the circuit becomes half open, letting
+    a single trial request through; the circuit closes again if it succeeds,
+    otherwise it opens for another `reset_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self._clock = clock
+        self._opened_at = 0.0
+        self._state = CircuitState.CLOSED
+        self._trial_in_flight = False
+        self._lock = Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and self._clock() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_request(self) -> None:
+        """Raises `CircuitOpenError` if the request should not be sent."""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return
+            if state == CircuitState.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            retry_after = self.reset_timeout - (self._clock() - self._opened_at)
+        raise CircuitOpenError(
+            f"Circuit breaker is {state.value}, requests are rejected for "
+            f"{max(retry_after, 0):.1f} more seconds"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self._state = CircuitState.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if (
+                self._state == CircuitState.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self._state = CircuitState.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
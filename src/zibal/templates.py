@@ -0,0 +1,85 @@
+import json
+from string import Formatter
+from typing import Optional
+
+from pydantic import HttpUrl
+
+from zibal.models.schemas import TransactionRequireOrder, TransactionRequireRequest
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# A valid amount used for validating the fixed fields of a template.
+_PLACEHOLDER_AMOUNT = 10000
+
+
+class EncodedRequestData(dict):
+    """The request data along with its already encoded JSON body."""
+
+    __slots__ = ("body",)
+
+    def __init__(self, data: dict, body: bytes):
+        super().__init__(data)
+        self.body = body
+
+
+class RequestTemplate:
+    """
+    The pre-validated fields of the require requests which are the same for
+    every order, such as the callback url, with their JSON encoded once.
+
+    Only the per order fields (`amount`, `order_id` and `mobile`) are
+    validated on each call. `description` can be a pattern formatted with
+    the per order fields, e.g. "Payment of order {order_id}".
+
+    Templates are created using `create_request_template` of the clients:
+
+        template = client.create_request_template(callback_url=CALLBACK_URL)
+        client.request_transaction_from_template(template, amount=25000, order_id="12")
+    """
+
+    def __init__(
+        self,
+        merchant: str,
+        callback_url: HttpUrl,
+        description: Optional[str] = None,
+        allowed_cards: Optional[list[str]] = None,
+        ledger_id: Optional[str] = None,
+    ):
+        self.description_pattern = None
+        if description is not None and any(
+            field is not None for _, field, _, _ in Formatter().parse(description)
+        ):
+            self.description_pattern = description
+            description = None
+
+        request_model = TransactionRequireRequest(
+            merchant=merchant,
+            amount=_PLACEHOLDER_AMOUNT,
+            callback_url=callback_url,
+            description=description,
+            allowed_cards=allowed_cards,
+            ledger_id=ledger_id,
+        )
+        self.fixed_data = request_model.model_dump_to_camel(
+            exclude_none=True, exclude={"amount"}, mode="json"
+        )
+        # the encoded fixed fields without the closing brace, so the per order
+        # fields can be appended to it
+        self._body_prefix = json.dumps(self.fixed_data, separators=(",", ":"))[:-1]
+
+    def build(
+        self,
+        amount: int,
+        order_id: Optional[str] = None,
+        mobile: Optional[str] = None,
+    ) -> EncodedRequestData:
+        """Validate the per order fields and return the request data."""
+        order_data = TransactionRequireOrder(
+            amount=amount, order_id=order_id, mobile=mobile
+        ).model_dump_to_camel(exclude_none=True)
+        if self.description_pattern is not None:
+            order_data["description"] = self.description_pattern.format(
+                amount=amount, order_id=order_id or "", mobile=mobile or ""
+            )
+        body = self._body_prefix + "," + json.dumps(order_data, separators=(",", ":"))[1:]
+        return EncodedRequestData({**self.fixed_data, **order_data}, body.encode())
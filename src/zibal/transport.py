@@ -0,0 +1,259 @@
+"""
+The transports `ZibalIPGClient` sends its requests through:
+
+    HTTPTransport         - the default, a pooled keep-alive `requests` session
+    FakeTransport         - answers the requests in-process without any
+                            networking, for tests and benchmarks
+    RecordReplayTransport - records the exchanges of another transport to a
+                            file, and replays them without any networking
+
+    client = ZibalIPGClient("zibal", transport=FakeTransport())
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Callable, Optional, Union
+from urllib.parse import urlsplit
+
+from zibal.templates import JSON_HEADERS
+
+
+class TransportResponse:
+    """The minimal response returned by the in-process transports."""
+
+    __slots__ = ("status_code", "content", "elapsed")
+
+    def __init__(
+        self,
+        status_code: int,
+        content: bytes,
+        elapsed: Optional[timedelta] = None,
+    ):
+        self.status_code = status_code
+        self.content = content
+        self.elapsed = elapsed
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Transport(ABC):
+    """
+    The interface of the transports. The returned responses should have the
+    `status_code`, `content` and `elapsed` attributes and a `json` method,
+    the same as `requests` responses. Failures to exchange a request should
+    be raised as one of `network_errors`, which are reported by the client
+    as a `RequestError`.
+    """
+
+    network_errors: tuple[type[BaseException], ...] = ()
+
+    @abstractmethod
+    def post(
+        self,
+        url: str,
+        data: dict,
+        timeout: float,
+        body: Optional[bytes] = None,
+        stream: bool = False,
+    ):
+        """
+        Send `data` as the JSON body of a POST request, or `body` if it is
+        already encoded. If `stream` is True, the body of the response may
+        be read after the response is returned.
+        """
+
+    @abstractmethod
+    def head(self, url: str, timeout: float):
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class HTTPTransport(Transport):
+    """
+    Sends the requests using a keep-alive `requests` session backed by a
+    thread-safe connection pool (see `ZibalIPGClient` for the parameters).
+    Retries are disabled on the adapter level, so a failed request is
+    reported to the caller exactly once.
+    """
+
+    def __init__(
+        self, pool_connections: int = 1, pool_maxsize: int = 10, pool_block: bool = False
+    ):
+        # requests is imported once the first transport is created, since
+        # it's slow to import
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Connection"] = "keep-alive"
+        self.network_errors = (requests.exceptions.RequestException,)
+
+    def post(self, url, data, timeout, body=None, stream=False):
+        if body is None:
+            return self.session.post(url=url, json=data, timeout=timeout)
+        kwargs = {"stream": True} if stream else {}
+        return self.session.post(
+            url=url, data=body, headers=JSON_HEADERS, timeout=timeout, **kwargs
+        )
+
+    def head(self, url, timeout):
+        return self.session.head(url, timeout=timeout)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+FakeResponse = Union[dict, TransportResponse, Callable[[dict], Union[dict, TransportResponse]]]
+
+
+class FakeTransport(Transport):
+    """
+    Answers the requests in-process. `responses` maps the endpoints
+    ('request', 'verify' and 'inquiry') to their response, which can be a
+    JSON payload, a `TransportResponse` (e.g. for unexpected status codes) or
+    a callable called with the request data returning either of them.
+
+    If `responses` isn't given, the requests are answered by a
+    `FakeGatewayState`, with the same state transitions as the IPG (see
+    `zibal.fake_gateway`), which is available as `state`.
+    """
+
+    def __init__(self, responses: Optional[dict[str, FakeResponse]] = None):
+        self.state = None
+        if responses is None:
+            from zibal.fake_gateway import FakeGatewayState
+
+            self.state = FakeGatewayState()
+            responses = {
+                "request": self.state.request,
+                "verify": self.state.verify,
+                "inquiry": self.state.inquiry,
+            }
+        self.responses = responses
+        self.calls: defaultdict[str, int] = defaultdict(int)
+
+    def post(self, url, data, timeout, body=None, stream=False):
+        endpoint = url.rstrip("/").rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        response = self.responses.get(endpoint)
+        if response is None:
+            return TransportResponse(404, b'{"message": "not found"}')
+        if callable(response):
+            response = response(json.loads(body) if body is not None else data)
+        if isinstance(response, TransportResponse):
+            return response
+        return TransportResponse(200, json.dumps(response).encode())
+
+    def head(self, url, timeout):
+        return TransportResponse(200, b"")
+
+
+class ReplayMissError(LookupError):
+    """Used when a replayed request was never recorded."""
+
+    pass
+
+
+class RecordReplayTransport(Transport):
+    """
+    In the "record" mode, the requests are sent through `transport` (an
+    `HTTPTransport` by default) and each exchange is appended to the JSON
+    lines file at `path`. In the "replay" mode, the recorded responses are
+    returned without any networking.
+
+    Exchanges are matched by their method, url path and request body, whose
+    `REDACTED_FIELDS` (e.g. the merchant) are masked both in the file and
+    when matching, so the recordings can be shared. If a request was
+    recorded more than once, the responses are replayed in the
+    recorded order, and the last one is repeated once they run out. A
+    request which was never recorded raises a `ReplayMissError`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        transport: Optional[Transport] = None,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode should be either 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        if mode == "record":
+            self.transport = transport or HTTPTransport()
+            self.network_errors = self.transport.network_errors
+            self._file = open(path, "a")
+            return
+        self.transport = None
+        self._file = None
+        self._exchanges: dict[tuple, deque] = defaultdict(deque)
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    exchange = json.loads(line)
+                    key = (exchange["method"], exchange["path"], exchange["request"])
+                    self._exchanges[key].append(exchange)
+
+    @staticmethod
+    def _key(method: str, url: str, data: Optional[dict]) -> tuple:
+        # imported here, since the client module imports this one
+        from zibal.client import redact
+
+        request = json.dumps(redact(data), sort_keys=True) if data is not None else None
+        return method, urlsplit(url).path, request
+
+    def post(self, url, data, timeout, body=None, stream=False):
+        if self.mode == "record":
+            response = self.transport.post(url, data, timeout, body=body, stream=stream)
+            self._record(self._key("POST", url, data), response)
+            return response
+        return self._replay(self._key("POST", url, data))
+
+    def head(self, url, timeout):
+        if self.mode == "record":
+            response = self.transport.head(url, timeout)
+            self._record(self._key("HEAD", url, None), response)
+            return response
+        return self._replay(self._key("HEAD", url, None))
+
+    def _record(self, key: tuple, response) -> None:
+        method, path, request = key
+        exchange = {
+            "method": method,
+            "path": path,
+            "request": request,
+            "status_code": response.status_code,
+            "response": response.content.decode(),
+        }
+        with self._lock:
+            self._file.write(json.dumps(exchange) + "\n")
+            self._file.flush()
+
+    def _replay(self, key: tuple) -> TransportResponse:
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise ReplayMissError(f"No recorded exchange for {key[0]} {key[1]} {key[2]}")
+            exchange = exchanges.popleft() if len(exchanges) > 1 else exchanges[0]
+        return TransportResponse(exchange["status_code"], exchange["response"].encode())
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+        if self._file is not None:
+            self._file.close()
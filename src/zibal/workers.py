@@ -0,0 +1,317 @@
+"""
+A pool of worker processes for verifying and inquiring transactions, for
+when a single process is bound by the CPU work of the calls (validating the
+models and encoding and decoding JSON) rather than the network.
+
+The jobs are sharded between the workers by their track id, so all of the
+jobs of a transaction are carried out by the same worker, in the order they
+were submitted. Each worker runs its own `ZibalIPGClient` with its own
+connection pool, and runs the jobs of different transactions concurrently
+using `threads` threads.
+
+    with WorkerPool("merchant", processes=4) as pool:
+        for track_id, result in pool.verify_many(track_ids):
+            ...
+        stats = pool.drain()
+"""
+
+import itertools
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from multiprocessing.reduction import ForkingPickler
+from typing import Iterable, Iterator, Optional
+
+from zibal.client import ZibalIPGClient
+
+VERIFY = "verify"
+INQUIRY = "inquiry"
+_OPERATIONS = {VERIFY: "verify_transaction", INQUIRY: "inquiry_transaction"}
+# How often the liveness of the workers is checked while waiting for results.
+_POLL_INTERVAL = 0.5
+
+
+class WorkerError(RuntimeError):
+    """Used when a worker process fails to start, or dies before it is drained."""
+
+    pass
+
+
+@dataclass
+class WorkerStats:
+    """The stats of a worker process, reported once it is drained."""
+
+    worker: int
+    pid: int
+    processed: int = 0
+    errors: int = 0
+    busy_time: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Jobs processed per second since the worker was started."""
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def shard_for(track_id: int, shards: int) -> int:
+    return hash(track_id) % shards
+
+
+def _put(results: multiprocessing.Queue, item) -> None:
+    """
+    Pickle the item in the calling thread, since the queue pickles it in a
+    background thread, where an error would only be printed and the item
+    would be lost.
+    """
+    try:
+        payload = ForkingPickler.dumps(item)
+    except Exception as err:
+        job_id, track_id, _ = item
+        error = WorkerError(f"The result of {track_id} can't be pickled: {err}")
+        payload = ForkingPickler.dumps((job_id, track_id, error))
+    results.put(bytes(payload))
+
+
+def _run_worker(
+    worker: int,
+    processes: int,
+    merchant: str,
+    client_kwargs: dict,
+    threads: int,
+    jobs: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+) -> None:
+    started_at = time.monotonic()
+    stats = WorkerStats(worker=worker, pid=multiprocessing.current_process().pid)
+    stats_lock = threading.Lock()
+    try:
+        client = ZibalIPGClient(merchant, **client_kwargs)
+    except Exception:
+        error = f"Worker {worker} has failed to start:\n{traceback.format_exc()}"
+        _put(results, WorkerError(error))
+        return
+
+    def run_jobs(thread_jobs: queue.Queue) -> None:
+        while True:
+            job = thread_jobs.get()
+            if job is None:
+                return
+            job_id, operation, track_id = job
+            call_started_at = time.monotonic()
+            try:
+                result = getattr(client, _OPERATIONS[operation])(track_id)
+                failed = False
+            except Exception as err:
+                result = err
+                failed = True
+            busy_time = time.monotonic() - call_started_at
+            with stats_lock:
+                stats.processed += 1
+                stats.errors += failed
+                stats.busy_time += busy_time
+            _put(results, (job_id, track_id, result))
+
+    # the jobs of a transaction are always run by the same thread, so they
+    # are carried out in order
+    thread_queues = [queue.Queue() for _ in range(threads)]
+    pool = [
+        threading.Thread(target=run_jobs, args=(thread_queue,), daemon=True)
+        for thread_queue in thread_queues
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            # the track ids of a worker share the same remainder of division
+            # by the number of processes, so it's divided out first
+            thread_queues[shard_for(job[2] // processes, threads)].put(job)
+    finally:
+        for thread_queue in thread_queues:
+            thread_queue.put(None)
+        for thread in pool:
+            thread.join()
+        client.close()
+        stats.elapsed = time.monotonic() - started_at
+        _put(results, stats)
+
+
+class WorkerPool:
+    """
+    Runs `processes` worker processes, each with its own `ZibalIPGClient`
+    created using `merchant` and `client_kwargs` (which should be picklable)
+    and `threads` threads.
+
+    Results are returned as `(track_id, result)` pairs, where the errors of
+    a job are returned as its result, the same as `ZibalIPGClient.verify_many`.
+    `drain` waits for the submitted jobs to complete, stops the workers and
+    returns their `WorkerStats`.
+
+    If a worker fails to start or dies (e.g. if it's killed), waiting for
+    the results raises a `WorkerError` instead of blocking forever.
+    """
+
+    def __init__(
+        self,
+        merchant: str,
+        processes: int = 4,
+        threads: int = 8,
+        client_kwargs: Optional[dict] = None,
+        start_method: Optional[str] = None,
+    ):
+        self.processes = processes
+        self.threads = threads
+        context = multiprocessing.get_context(start_method)
+        self._results = context.Queue()
+        self._jobs = [context.Queue() for _ in range(processes)]
+        self._job_ids = itertools.count()
+        self._pending = 0
+        self._draining = False
+        self._workers = [
+            context.Process(
+                target=_run_worker,
+                args=(
+                    worker,
+                    processes,
+                    merchant,
+                    client_kwargs or {},
+                    threads,
+                    self._jobs[worker],
+                    self._results,
+                ),
+                name=f"zibal-worker-{worker}",
+                daemon=True,
+            )
+            for worker in range(processes)
+        ]
+        for process in self._workers:
+            process.start()
+        self._stats: list[WorkerStats] = []
+
+    def submit(self, operation: str, track_id: int) -> int:
+        """Queue a verify or inquiry job, and return its job id."""
+        if operation not in _OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+        if self._draining:
+            raise RuntimeError("The worker pool is drained")
+        job_id = next(self._job_ids)
+        self._jobs[shard_for(track_id, self.processes)].put((job_id, operation, track_id))
+        self._pending += 1
+        return job_id
+
+    def results(self, timeout: Optional[float] = None) -> Iterator[tuple[int, int, object]]:
+        """
+        Yield `(job_id, track_id, result)` of the submitted jobs as they
+        complete, until none are pending. Raises `queue.Empty` if no result
+        is received within `timeout` seconds.
+        """
+        while self._pending:
+            item = self._get(timeout)
+            if isinstance(item, WorkerStats):
+                self._stats.append(item)
+                continue
+            self._pending -= 1
+            yield item
+
+    def verify_many(self, track_ids: Iterable[int]) -> Iterator[tuple[int, object]]:
+        """Verify the transactions, yielding `(track_id, result)` as completed."""
+        return self._run_many(VERIFY, track_ids)
+
+    def inquiry_many(self, track_ids: Iterable[int]) -> Iterator[tuple[int, object]]:
+        """Inquiry the transactions, yielding `(track_id, result)` as completed."""
+        return self._run_many(INQUIRY, track_ids)
+
+    def _run_many(
+        self, operation: str, track_ids: Iterable[int]
+    ) -> Iterator[tuple[int, object]]:
+        # at most two jobs per thread are queued at once
+        window = self.processes * self.threads * 2
+        for track_id in track_ids:
+            self.submit(operation, track_id)
+            while self._pending >= window:
+                _, done_track_id, result = next(self.results())
+                yield done_track_id, result
+        for _, done_track_id, result in self.results():
+            yield done_track_id, result
+
+    def drain(self, timeout: Optional[float] = None) -> list[WorkerStats]:
+        """
+        Stop accepting jobs, wait for the pending ones to complete (their
+        results are discarded if not consumed) and stop the workers.
+        """
+        if not self._draining:
+            self._draining = True
+            for jobs in self._jobs:
+                jobs.put(None)
+        try:
+            for _ in self.results(timeout):
+                pass
+            while len(self._stats) < self.processes:
+                self._stats.append(self._get(timeout))
+        except WorkerError:
+            self.terminate()
+            raise
+        for process in self._workers:
+            process.join(timeout)
+        return sorted(self._stats, key=lambda stats: stats.worker)
+
+    def _get(self, timeout: Optional[float]):
+        """
+        Get the next item of the results queue, checking that the workers
+        are alive while waiting.
+        """
+        deadline_at = None if timeout is None else time.monotonic() + timeout
+        suspected = set()
+        while True:
+            wait = _POLL_INTERVAL
+            if deadline_at is not None:
+                wait = max(min(wait, deadline_at - time.monotonic()), 0)
+            try:
+                item = pickle.loads(self._results.get(timeout=wait))
+            except queue.Empty:
+                if deadline_at is not None and time.monotonic() >= deadline_at:
+                    raise
+                suspected = self._check_workers(suspected)
+                continue
+            if isinstance(item, WorkerError):
+                raise item
+            return item
+
+    def _check_workers(self, suspected: set) -> set:
+        """
+        Raise a `WorkerError` if a worker which hasn't reported its stats is
+        dead. A worker is only reported once it is seen dead twice in a row,
+        since the items it has put before exiting may still be in transit.
+        """
+        reported = {stats.worker for stats in self._stats}
+        dead = {
+            worker
+            for worker, process in enumerate(self._workers)
+            if worker not in reported and not process.is_alive()
+        }
+        for worker in dead & suspected:
+            raise WorkerError(
+                f"Worker {worker} has died with exit code {self._workers[worker].exitcode}"
+            )
+        return dead
+
+    def terminate(self) -> None:
+        for process in self._workers:
+            process.terminate()
+            process.join()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.drain()
+        else:
+            self.terminate()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+
+# httpx is only installed with the "async" extra
+httpx = pytest.importorskip("httpx")
+
+from zibal.async_client import AsyncZibalIPGClient
+from zibal.client import ZibalEndPoints
+from zibal.configs import IPG_BASE_URL
+from zibal.exceptions import RequestError, ResultError
+from zibal.response_codes import RESULT_CODES, STATUS_CODES
+
+from .responses import (
+    ALREADY_VERIFIED_VERIFY_RESPONSE,
+    VALID_INQUIRY_RESPONSE,
+    VALID_REQUIRE_RESPONSE,
+    VALID_VERIFY_RESPONSE,
+)
+
+
+@pytest.fixture
+def mock_async_request(mocker):
+    def mock(return_data, status_code=200):
+        response = httpx.Response(
+            status_code, json=return_data, request=httpx.Request("POST", IPG_BASE_URL)
+        )
+        return mocker.patch(
+            "httpx.AsyncClient.post", new=mocker.AsyncMock(return_value=response)
+        )
+
+    return mock
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_valid_async_transaction_require(mock_async_request):
+    mock_post = mock_async_request(VALID_REQUIRE_RESPONSE)
+
+    async def call():
+        async with AsyncZibalIPGClient("zibal") as client:
+            return await client.request_transaction(
+                amount=25000, callback_url="https://localhost:8000/"
+            )
+
+    response_data_model = run(call())
+    mock_post.assert_awaited_once_with(
+        url=IPG_BASE_URL + ZibalEndPoints.REQUEST,
+        json={
+            "merchant": "zibal",
+            "amount": 25000,
+            "callbackUrl": "https://localhost:8000/",
+        },
+    )
+    assert response_data_model.track_id == VALID_REQUIRE_RESPONSE["trackId"]
+
+
+def test_valid_async_transaction_verify(mock_async_request):
+    mock_async_request(VALID_VERIFY_RESPONSE)
+
+    async def call():
+        async with AsyncZibalIPGClient("zibal") as client:
+            return await client.verify_transaction(track_id=12345)
+
+    response_data_model = run(call())
+    assert response_data_model.status == VALID_VERIFY_RESPONSE["status"]
+    assert response_data_model.amount == VALID_VERIFY_RESPONSE["amount"]
+
+
+def test_valid_async_transaction_inquiry(mock_async_request):
+    mock_async_request(VALID_INQUIRY_RESPONSE)
+
+    async def call():
+        async with AsyncZibalIPGClient("zibal") as client:
+            return await client.inquiry_transaction(track_id=12345)
+
+    response_data_model = run(call())
+    assert (
+        response_data_model.status_meaning
+        == STATUS_CODES[VALID_INQUIRY_RESPONSE["status"]]
+    )
+
+
+def test_async_transaction_verify_result_error(mock_async_request):
+    mock_async_request(ALREADY_VERIFIED_VERIFY_RESPONSE)
+
+    async def call(raise_on_invalid_result):
+        async with AsyncZibalIPGClient(
+            "zibal", raise_on_invalid_result=raise_on_invalid_result
+        ) as client:
+            return await client.verify_transaction(track_id=12345)
+
+    response_data_model = run(call(raise_on_invalid_result=False))
+    assert response_data_model.result_meaning == RESULT_CODES[201]
+    with pytest.raises(ResultError):
+        run(call(raise_on_invalid_result=True))
+
+
+def test_async_unexpected_status_code_raises_request_error(mock_async_request):
+    mock_async_request({}, status_code=502)
+
+    async def call():
+        async with AsyncZibalIPGClient("zibal") as client:
+            return await client.inquiry_transaction(track_id=12345)
+
+    with pytest.raises(RequestError):
+        run(call())
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_async_verify_many_captures_per_item_errors(mocker, ordered):
+    async def post(url, json):
+        track_id = json["trackId"]
+        if track_id == 2:
+            raise httpx.ConnectError("connection reset")
+        await asyncio.sleep(0.01 * (5 - track_id))
+        return httpx.Response(200, json=VALID_VERIFY_RESPONSE)
+
+    mocker.patch("httpx.AsyncClient.post", side_effect=post)
+
+    async def call():
+        async with AsyncZibalIPGClient("zibal") as client:
+            return [
+                item
+                async for item in client.verify_many(
+                    [1, 2, 3, 4], max_concurrency=2, ordered=ordered
+                )
+            ]
+
+    results = run(call())
+    if ordered:
+        assert [track_id for track_id, _ in results] == [1, 2, 3, 4]
+    results = dict(results)
+    assert isinstance(results[2], RequestError)
+    assert results[4].status == VALID_VERIFY_RESPONSE["status"]
+
+
+def test_async_request_transaction_from_template(mock_async_request):
+    mock_post = mock_async_request(VALID_REQUIRE_RESPONSE)
+
+    async def call():
+        async with AsyncZibalIPGClient("zibal") as client:
+            template = client.create_request_template(
+                callback_url="https://localhost:8000/"
+            )
+            return await client.request_transaction_from_template(
+                template, amount=25000
+            )
+
+    response_data_model = run(call())
+    assert response_data_model.track_id == VALID_REQUIRE_RESPONSE["trackId"]
+    kwargs = mock_post.call_args.kwargs
+    assert json.loads(kwargs["content"]) == {
+        "merchant": "zibal",
+        "callbackUrl": "https://localhost:8000/",
+        "amount": 25000,
+    }
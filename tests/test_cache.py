@@ -0,0 +1,70 @@
+import pytest
+
+from zibal.cache import InquiryCache
+from zibal.client import ZibalIPGClient
+from zibal.models.schemas import TransactionInquiryResponse
+
+from .responses import VALID_INQUIRY_RESPONSE, VALID_VERIFY_RESPONSE
+
+
+def inquiry_response(status: int) -> TransactionInquiryResponse:
+    return TransactionInquiryResponse.from_camel_case(
+        {**VALID_INQUIRY_RESPONSE, "status": status}
+    )
+
+
+@pytest.mark.parametrize(
+    "status, expected_ttl",
+    [(1, 600), (3, 600), (-1, 2), (2, 2)],
+)
+def test_ttl_depends_on_status(status, expected_ttl, clock):
+    cache = InquiryCache(terminal_ttl=600, transient_ttl=2, clock=clock)
+    cache.set("zibal", 1, inquiry_response(status))
+
+    clock.now = expected_ttl - 0.1
+    assert cache.get("zibal", 1) is not None
+    clock.now = expected_ttl
+    assert cache.get("zibal", 1) is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InquiryCache(max_size=2)
+    for track_id in (1, 2):
+        cache.set("zibal", track_id, inquiry_response(1))
+    cache.get("zibal", 1)
+    cache.set("zibal", 3, inquiry_response(1))
+
+    assert cache.get("zibal", 2) is None
+    assert cache.get("zibal", 1) is not None
+    assert cache.stats.evictions == 1
+    assert len(cache) == 2
+
+
+def test_entries_are_keyed_by_merchant():
+    cache = InquiryCache()
+    cache.set("zibal", 1, inquiry_response(1))
+    assert cache.get("another-merchant", 1) is None
+
+
+def test_client_caches_inquiry_until_verified(mocker):
+    def post(url, json, timeout):
+        response = mocker.MagicMock(status_code=200)
+        if url.endswith("verify"):
+            response.json.return_value = dict(VALID_VERIFY_RESPONSE)
+        else:
+            response.json.return_value = dict(VALID_INQUIRY_RESPONSE)
+        return response
+
+    mock_post = mocker.patch("requests.Session.post", side_effect=post)
+    cache = InquiryCache()
+    client = ZibalIPGClient("zibal", inquiry_cache=cache)
+
+    first = client.inquiry_transaction(track_id=1)
+    assert client.inquiry_transaction(track_id=1) is first
+    assert mock_post.call_count == 1
+
+    client.verify_transaction(track_id=1)
+    client.inquiry_transaction(track_id=1)
+    assert mock_post.call_count == 3
+    assert cache.stats.hits == 1
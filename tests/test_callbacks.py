@@ -0,0 +1,225 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from zibal.callbacks import (
+    ERROR,
+    FAILED,
+    PENDING,
+    VERIFIED,
+    CallbackASGIApp,
+    CallbackQueueFull,
+    CallbackVerifier,
+    CallbackWSGIApp,
+)
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import RequestError
+from zibal.models.schemas import TransactionCallbackQueryParams
+from zibal.transport import FakeTransport
+
+
+@pytest.fixture
+def transport():
+    return FakeTransport()
+
+
+@pytest.fixture
+def client(transport):
+    return ZibalIPGClient("zibal", transport=transport)
+
+
+@pytest.fixture
+def verifier(client):
+    verifier = CallbackVerifier(client, workers=2).start()
+    yield verifier
+    verifier.stop(drain=False)
+
+
+def paid_transaction(transport, status=2):
+    track_id = transport.state.request(
+        {"merchant": "zibal", "amount": 25000, "callbackUrl": "https://localhost/"}
+    )["trackId"]
+    transport.state.pay(track_id, status)
+    return track_id
+
+
+def callback_query(track_id, success=1, status=2):
+    return f"success={success}&trackId={track_id}&orderId=order-{track_id}&status={status}"
+
+
+def call_wsgi(app, path, query=""):
+    response = {}
+
+    def start_response(status, headers):
+        response["status"] = int(status.split()[0])
+        response["headers"] = dict(headers)
+
+    body = b"".join(
+        app({"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query}, start_response)
+    )
+    return response["status"], response["headers"], body
+
+
+def call_asgi(app, path, query=""):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode()}
+    asyncio.run(app(scope, receive, send))
+    start, body = messages
+    return start["status"], dict(start["headers"]), body["body"]
+
+
+def test_from_query():
+    params = TransactionCallbackQueryParams.from_query(
+        {"success": ["0", "1"], "trackId": ["15"], "orderId": "12", "status": "-1"}
+    )
+    assert (params.success, params.track_id, params.order_id, params.status) == (1, 15, "12", -1)
+
+
+def test_verifier_verifies_and_deduplicates(transport, verifier):
+    track_id = paid_transaction(transport)
+    params = TransactionCallbackQueryParams.from_query(
+        {"success": "1", "trackId": str(track_id), "orderId": "1", "status": "2"}
+    )
+    state = verifier.submit(params)
+    assert verifier.submit(params) is state
+
+    state = verifier.wait(track_id, timeout=5)
+    assert state.state == VERIFIED
+    assert state.result.status == 1
+    assert verifier.submit(params) is state
+    verifier.stop()
+    assert transport.calls["verify"] == 1
+
+
+def test_verifier_failed_callbacks_are_not_verified(transport, verifier):
+    track_id = paid_transaction(transport, status=3)
+    params = TransactionCallbackQueryParams.from_query(
+        {"success": "0", "trackId": str(track_id), "orderId": "1", "status": "3"}
+    )
+    assert verifier.submit(params).state == FAILED
+    assert transport.calls["verify"] == 0
+
+
+def test_verifier_queue_full_and_resubmit_after_error(client, mocker):
+    verifier = CallbackVerifier(client, max_queue=1)
+    first, second = (
+        TransactionCallbackQueryParams(success=1, track_id=track_id, order_id="1", status=2)
+        for track_id in (1, 2)
+    )
+    assert verifier.submit(first).state == PENDING
+    with pytest.raises(CallbackQueueFull):
+        verifier.submit(second)
+
+    mocker.patch.object(client, "verify_transaction", side_effect=RequestError("timeout"))
+    verifier.start()
+    state = verifier.wait(1, timeout=5)
+    assert state.state == ERROR
+    assert state.error == "RequestError: timeout"
+    # failed verifies can be retried by another callback
+    assert verifier.submit(first) is not state
+    verifier.stop()
+    assert verifier.get(2) is None
+
+
+def test_verifier_handles_raised_result_errors(transport):
+    client = ZibalIPGClient("zibal", transport=transport, raise_on_invalid_result=True)
+    verifier = CallbackVerifier(client).start()
+    verified, unpaid = paid_transaction(transport), paid_transaction(transport, status=3)
+    transport.state.verify({"merchant": "zibal", "trackId": verified})
+
+    for track_id in (verified, unpaid):
+        verifier.submit(
+            TransactionCallbackQueryParams(success=1, track_id=track_id, order_id="1", status=2)
+        )
+    verified_state = verifier.wait(verified, timeout=5)
+    unpaid_state = verifier.wait(unpaid, timeout=5)
+    verifier.stop()
+    assert (verified_state.state, verified_state.result.result_code) == (VERIFIED, 201)
+    assert unpaid_state.state == FAILED
+    assert unpaid_state.result.result_code == 202
+
+
+def test_verifier_keeps_the_last_states(client):
+    verifier = CallbackVerifier(client, max_states=2)
+    for track_id in (1, 2, 3):
+        verifier.submit(
+            TransactionCallbackQueryParams(success=0, track_id=track_id, order_id="1", status=3)
+        )
+    assert verifier.get(1) is None
+    assert verifier.get(3).state == FAILED
+
+
+def test_wsgi_app(transport, verifier):
+    app = CallbackWSGIApp(verifier, redirect_url="/orders/{order_id}")
+    track_id = paid_transaction(transport)
+
+    status, headers, body = call_wsgi(app, "/callback", callback_query(track_id))
+    assert status == 302
+    assert headers["Location"] == f"/orders/order-{track_id}"
+
+    status, _, body = call_wsgi(app, "/status", f"trackId={track_id}&wait=5")
+    assert status == 200
+    data = json.loads(body)
+    assert data["state"] == VERIFIED
+    assert data["result"]["status"] == 1
+    assert data["result"]["orderId"] == transport.state.transactions[track_id].order_id
+
+    assert call_wsgi(app, "/callback", "success=1&trackId=x")[0] == 400
+    assert call_wsgi(app, "/status", "trackId=1")[0] == 404
+    assert call_wsgi(app, "/status", "wait=1")[0] == 400
+    assert call_wsgi(app, "/other")[0] == 404
+
+
+def test_wsgi_app_quotes_the_redirect_order_id(transport, verifier):
+    app = CallbackWSGIApp(verifier, redirect_url="/orders/{order_id}")
+    query = "success=1&trackId=1&orderId=%2F%2Fevil.com%0D%0ASet-Cookie:%20a%3Fb&status=2"
+    status, headers, _ = call_wsgi(app, "/callback", query)
+    assert status == 302
+    assert headers["Location"] == "/orders/%2F%2Fevil.com%0D%0ASet-Cookie%3A%20a%3Fb"
+
+
+def test_wsgi_app_blank_order_id(transport, verifier):
+    app = CallbackWSGIApp(verifier)
+    track_id = paid_transaction(transport)
+
+    status, _, body = call_wsgi(
+        app, "/callback", f"success=1&trackId={track_id}&orderId=&status=2"
+    )
+    assert status == 202
+    assert json.loads(body)["orderId"] == ""
+    assert verifier.wait(track_id, timeout=5).state == VERIFIED
+
+
+def test_wsgi_app_queue_full(client):
+    app = CallbackWSGIApp(CallbackVerifier(client, max_queue=1), retry_after=3)
+    assert call_wsgi(app, "/callback", callback_query(1))[0] == 202
+    status, headers, _ = call_wsgi(app, "/callback", callback_query(2))
+    assert status == 503
+    assert headers["Retry-After"] == "3"
+
+
+def test_asgi_app(transport, client):
+    verifier = CallbackVerifier(client)
+    app = CallbackASGIApp(verifier)
+    track_id = paid_transaction(transport)
+
+    status, _, body = call_asgi(app, "/callback", callback_query(track_id))
+    assert status == 202
+    assert json.loads(body)["state"] == PENDING
+
+    # the status request waits for the verify, which starts meanwhile
+    threading.Timer(0.1, verifier.start).start()
+    status, headers, body = call_asgi(app, "/status", f"trackId={track_id}&wait=5")
+    verifier.stop()
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body)["state"] == VERIFIED
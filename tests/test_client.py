@@ -1,12 +1,22 @@
+import json
 import logging
+import threading
 
 import pytest
+import requests
 from pydantic import ValidationError
 
 from zibal.client import ZibalEndPoints, ZibalIPGClient
 from zibal.configs import IPG_BASE_URL
-from zibal.exceptions import ResultError
+from zibal.exceptions import (
+    MerchantError,
+    RequestError,
+    ResultError,
+    TransactionStateError,
+)
+from zibal.models.schemas import TransactionInquiryResponse
 from zibal.response_codes import RESULT_CODES, STATUS_CODES, WAGE_CODES
+from zibal.transport import FakeTransport, TransportResponse
 
 from .responses import (
     ALREADY_VERIFIED_VERIFY_RESPONSE,
@@ -24,7 +34,7 @@ def mock_request(mocker):
         mock_response = mocker.MagicMock()
         mock_response.json.return_value = return_data
         mock_response.status_code = 200
-        mocker.patch("requests.post", return_value=mock_response)
+        mocker.patch("requests.Session.post", return_value=mock_response)
 
     return mock
 
@@ -41,34 +51,32 @@ def logger_and_mock_logging(mocker):
 # --------------------------
 
 
-def test_valid_transaction_require(mocker, mock_request):
+def test_valid_transaction_require(caplog, mock_request):
     # Prepare the mock
     mock_request(VALID_REQUIRE_RESPONSE)
-    logger = logging.getLogger("zibal.client")
-    mock_logging = mocker.patch.object(logger, "info")
+    caplog.set_level(logging.DEBUG, logger="zibal.client")
 
     # Prepare the client and call the method
     request_data = {
         "amount": 25000,
         "callback_url": "https://localhost:8000/",
+        "mobile": "09123456789",
     }
-    client = ZibalIPGClient("zibal", logger=logger)
+    client = ZibalIPGClient("zibal")
     response_data_model = client.request_transaction(**request_data)
 
-    # Prepare the expected log data
-    expected_log_url = IPG_BASE_URL + ZibalEndPoints.REQUEST
-    expected_log_data = {
-        "merchant": "zibal",
+    # Logging assertion, the merchant and mobile should be redacted
+    [record] = caplog.records
+    assert record.endpoint == ZibalEndPoints.REQUEST.value
+    assert record.track_id == VALID_REQUIRE_RESPONSE["trackId"]
+    assert record.result == VALID_REQUIRE_RESPONSE["result"]
+    assert record.request_data == {
+        "merchant": "***",
         "amount": 25000,
         "callbackUrl": "https://localhost:8000/",
+        "mobile": "***",
     }
-    log_data = (
-        f"A successful HTTP request has been made to: {expected_log_url} "
-        f"with data: {expected_log_data}"
-    )
-
-    # Logging assertion
-    mock_logging.assert_called_once_with(log_data)
+    assert "09123456789" not in record.getMessage()
 
     # Response assertion
     assert response_data_model.track_id == VALID_REQUIRE_RESPONSE["trackId"]
@@ -99,25 +107,23 @@ def test_transaction_require_raises_validation_error(amount, callback_url):
 # --------------------------
 
 
-def test_valid_transaction_verify(mocker, mock_request):
+def test_valid_transaction_verify(caplog, mock_request):
     # Prepare the mock
     mock_request(VALID_VERIFY_RESPONSE)
-    logger = logging.getLogger("zibal.client")
-    mock_logging = mocker.patch.object(logger, "info")
+    caplog.set_level(logging.INFO, logger="zibal.client")
 
     # Prepare the client and call the method
     track_id = 12345
-    client = ZibalIPGClient("zibal", logger=logger)
+    client = ZibalIPGClient("zibal")
     response_data_model = client.verify_transaction(track_id=track_id)
 
-    # Prepare the expected log data
-    expected_url = IPG_BASE_URL + ZibalEndPoints.VERIFY
-    expected_log_data = {"merchant": "zibal", "trackId": track_id}
-    log_data = (
-        f"A successful HTTP request has been made to: {expected_url} "
-        f"with data: {expected_log_data}"
+    # Logging assertion
+    [record] = caplog.records
+    assert record.getMessage() == (
+        "Zibal IPG request endpoint=verify track_id=12345 result=100 elapsed="
+        f"{record.elapsed}"
     )
-    mock_logging.assert_called_once_with(log_data)
+    assert not hasattr(record, "request_data")  # only attached on DEBUG
 
     assert response_data_model.paid_at == VALID_VERIFY_RESPONSE["paidAt"]
     assert response_data_model.status == VALID_VERIFY_RESPONSE["status"]
@@ -178,6 +184,46 @@ def test_transaction_verify_returns_results_error(
     )
 
 
+def test_failed_results_are_shared(mock_request):
+    mock_request(FAILED_VERIFY_RESPONSE)
+
+    client = ZibalIPGClient("zibal")
+    first = client.verify_transaction(track_id=123456)
+    second = client.verify_transaction(track_id=654321)
+    assert first is second
+    with pytest.raises(ValidationError):
+        first.result_meaning = "changed"
+
+
+def test_unknown_result_code_falls_back(mock_request):
+    mock_request({"message": "unknown", "result": 999})
+
+    client = ZibalIPGClient("zibal")
+    response_data_model = client.verify_transaction(track_id=123456)
+    assert response_data_model.result_code == 999
+    assert response_data_model.result_meaning == "Unknown result code"
+
+    client = ZibalIPGClient("zibal", raise_on_invalid_result=True)
+    with pytest.raises(ResultError) as exc_info:
+        client.verify_transaction(track_id=123456)
+    assert type(exc_info.value) is ResultError
+    assert exc_info.value.result_code == 999
+
+
+@pytest.mark.parametrize(
+    "result_code, error_type",
+    [(102, MerchantError), (104, MerchantError), (201, TransactionStateError)],
+)
+def test_result_errors_are_typed(mock_request, result_code, error_type):
+    mock_request({"message": "failed", "result": result_code})
+
+    client = ZibalIPGClient("zibal", raise_on_invalid_result=True)
+    with pytest.raises(error_type) as exc_info:
+        client.verify_transaction(track_id=123456)
+    assert exc_info.value.result_code == result_code
+    assert str(exc_info.value) == RESULT_CODES[result_code]
+
+
 # --------------------------
 # Transaction Inquiry
 # --------------------------
@@ -192,16 +238,15 @@ def test_valid_transaction_inquiry(mocker, mock_request):
     # Prepare the client and call the method
     track_id = 12345
     client = ZibalIPGClient("zibal")
+    mocker.patch.object(logger, "isEnabledFor", return_value=True)
     response_data_model = client.inquiry_transaction(track_id=track_id)
 
-    # Prepare the expected log data and assert the log
-    expected_log_url = IPG_BASE_URL + ZibalEndPoints.INQUIRY
-    expected_log_data = {"merchant": "zibal", "trackId": track_id}
-    log_data = (
-        f"A successful HTTP request has been made to: {expected_log_url} "
-        f"with data: {expected_log_data}"
-    )
-    mock_logging.assert_called_once_with(log_data)
+    # Assert the structured log fields
+    mock_logging.assert_called_once()
+    log_fields = mock_logging.call_args.kwargs["extra"]
+    assert log_fields["endpoint"] == ZibalEndPoints.INQUIRY.value
+    assert log_fields["track_id"] == track_id
+    assert log_fields["result"] == VALID_INQUIRY_RESPONSE["result"]
 
     # Assert response data
     assert response_data_model.status == VALID_INQUIRY_RESPONSE["status"]
@@ -215,3 +260,201 @@ def test_valid_transaction_inquiry(mocker, mock_request):
         == STATUS_CODES[VALID_INQUIRY_RESPONSE["status"]]
     )
     assert response_data_model.message == VALID_INQUIRY_RESPONSE["message"]
+
+
+# --------------------------
+# Connection pooling
+# --------------------------
+
+
+def test_requests_share_pooled_session(mocker, mock_request):
+    mock_request(VALID_VERIFY_RESPONSE)
+    client = ZibalIPGClient("zibal", pool_maxsize=4)
+    client.verify_transaction(track_id=12345)
+    client.verify_transaction(track_id=67890)
+
+    adapter = client.session.get_adapter(IPG_BASE_URL)
+    assert adapter._pool_maxsize == 4
+    assert client.session.post.call_count == 2
+
+
+def test_client_context_manager_closes_session(mocker):
+    with ZibalIPGClient("zibal") as client:
+        mock_close = mocker.patch.object(client.session, "close")
+    mock_close.assert_called_once()
+
+
+# --------------------------
+# Bulk operations
+# --------------------------
+
+
+@pytest.fixture
+def mock_bulk_request(mocker):
+    """Responds to each track id based on the given mapping of track ids."""
+
+    def mock(responses_by_track_id):
+        def post(url, json, timeout):
+            response_data = responses_by_track_id[json["trackId"]]
+            if isinstance(response_data, Exception):
+                raise response_data
+            mock_response = mocker.MagicMock()
+            mock_response.json.return_value = dict(response_data)
+            mock_response.status_code = 200
+            return mock_response
+
+        mocker.patch("requests.Session.post", side_effect=post)
+
+    return mock
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_verify_many_captures_per_item_errors(mock_bulk_request, ordered):
+    mock_bulk_request(
+        {
+            1: VALID_VERIFY_RESPONSE,
+            2: requests.ConnectionError("connection reset"),
+            3: ALREADY_VERIFIED_VERIFY_RESPONSE,
+        }
+    )
+    client = ZibalIPGClient("zibal")
+    results = list(client.verify_many([1, 2, 3], max_workers=2, ordered=ordered))
+
+    if ordered:
+        assert [track_id for track_id, _ in results] == [1, 2, 3]
+    results = dict(results)
+    assert results[1].status == VALID_VERIFY_RESPONSE["status"]
+    assert isinstance(results[2], RequestError)
+    assert results[3].result_code == ALREADY_VERIFIED_VERIFY_RESPONSE["result"]
+
+
+def test_inquiry_many_preserves_input_order(mock_bulk_request):
+    track_ids = list(range(1, 50))
+    mock_bulk_request({track_id: VALID_INQUIRY_RESPONSE for track_id in track_ids})
+    client = ZibalIPGClient("zibal")
+    results = list(client.inquiry_many(track_ids, max_workers=4))
+
+    assert [track_id for track_id, _ in results] == track_ids
+    assert all(result.amount == VALID_INQUIRY_RESPONSE["amount"] for _, result in results)
+
+
+# --------------------------
+# Single-flight
+# --------------------------
+
+
+@pytest.mark.parametrize("single_flight, expected_calls", [(True, 1), (False, 8)])
+def test_concurrent_verifies_share_single_flight(
+    mocker, single_flight, expected_calls
+):
+    barrier = threading.Barrier(8)
+
+    def post(url, json, timeout):
+        # keep the first request in flight until all of the callers started
+        threading.Event().wait(0.1)
+        mock_response = mocker.MagicMock(status_code=200)
+        mock_response.json.return_value = dict(VALID_VERIFY_RESPONSE)
+        return mock_response
+
+    mock_post = mocker.patch("requests.Session.post", side_effect=post)
+    client = ZibalIPGClient("zibal", single_flight=single_flight)
+    results = []
+
+    def verify():
+        barrier.wait()
+        results.append(client.verify_transaction(track_id=12345))
+
+    threads = [threading.Thread(target=verify) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_post.call_count == expected_calls
+    assert len(results) == 8
+    assert all(result.status == VALID_VERIFY_RESPONSE["status"] for result in results)
+
+
+def test_single_flight_propagates_errors_to_all_callers(mocker):
+    mocker.patch(
+        "requests.Session.post", side_effect=requests.ConnectionError("reset")
+    )
+    client = ZibalIPGClient("zibal", single_flight=True)
+    with pytest.raises(RequestError):
+        client.inquiry_transaction(track_id=12345)
+    # the failed call should not be kept as in flight
+    with pytest.raises(RequestError):
+        client.inquiry_transaction(track_id=12345)
+
+
+# --------------------------
+# Logging
+# --------------------------
+
+
+def test_success_log_is_not_built_when_info_is_disabled(mocker, mock_request):
+    mock_request(VALID_VERIFY_RESPONSE)
+    logger = logging.getLogger("zibal.client")
+    logger.setLevel(logging.WARNING)
+    mock_logging = mocker.patch.object(logger, "info")
+    mock_redact = mocker.patch("zibal.client.redact")
+    try:
+        ZibalIPGClient("zibal").verify_transaction(track_id=12345)
+    finally:
+        logger.setLevel(logging.NOTSET)
+    mock_logging.assert_not_called()
+    mock_redact.assert_not_called()
+
+
+@pytest.mark.parametrize("sample_rate, expected_logs", [(0.0, 0), (1.0, 5)])
+def test_success_logs_are_sampled(caplog, mock_request, sample_rate, expected_logs):
+    mock_request(VALID_VERIFY_RESPONSE)
+    caplog.set_level(logging.INFO, logger="zibal.client")
+    client = ZibalIPGClient("zibal", log_sample_rate=sample_rate)
+    for _ in range(5):
+        client.verify_transaction(track_id=12345)
+    assert len(caplog.records) == expected_logs
+
+
+# --------------------------
+# Trusted decode
+# --------------------------
+
+
+def test_trusted_decode_skips_validation(mocker):
+    mock_response = mocker.MagicMock(status_code=200)
+    mock_response.content = json.dumps(VALID_INQUIRY_RESPONSE).encode()
+    mocker.patch("requests.Session.post", return_value=mock_response)
+    mock_validate = mocker.spy(TransactionInquiryResponse, "model_validate")
+
+    client = ZibalIPGClient("zibal", trusted_decode=True)
+    response_data_model = client.inquiry_transaction(track_id=12345)
+
+    mock_validate.assert_not_called()
+    mock_response.json.assert_not_called()
+    assert response_data_model.amount == VALID_INQUIRY_RESPONSE["amount"]
+    assert (
+        response_data_model.status_meaning
+        == STATUS_CODES[VALID_INQUIRY_RESPONSE["status"]]
+    )
+
+
+def test_trusted_decode_still_handles_failed_results(mocker):
+    mock_response = mocker.MagicMock(status_code=200)
+    mock_response.content = json.dumps(ALREADY_VERIFIED_VERIFY_RESPONSE).encode()
+    mocker.patch("requests.Session.post", return_value=mock_response)
+
+    client = ZibalIPGClient("zibal", trusted_decode=True)
+    response_data_model = client.verify_transaction(track_id=12345)
+    assert response_data_model.result_code == 201
+
+
+@pytest.mark.parametrize("trusted_decode", [False, True])
+def test_undecodable_response_raises_request_error(trusted_decode):
+    transport = FakeTransport({"inquiry": TransportResponse(200, b"<html>bad gateway</html>")})
+    client = ZibalIPGClient("zibal", transport=transport, trusted_decode=trusted_decode)
+
+    with pytest.raises(RequestError, match="Undecodable response"):
+        client.inquiry_transaction(track_id=12345)
+    [(track_id, result)] = client.inquiry_many([12345])
+    assert isinstance(result, RequestError)
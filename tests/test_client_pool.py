@@ -0,0 +1,72 @@
+import logging
+
+from zibal.client import ZibalIPGClient
+from zibal.client_pool import MerchantClient, ZibalClientPool
+from zibal.instrumentation import LatencyRecorder
+from zibal.ratelimit import RateLimiter
+from zibal.transport import FakeTransport
+
+
+def test_pool_shares_resources_between_merchants():
+    transport = FakeTransport()
+    transport.state.merchants.add("other")
+    rate_limiter = RateLimiter(rate=1000, burst=1000)
+    with ZibalClientPool(
+        transport=transport, rate_limiter=rate_limiter, single_flight=True
+    ) as pool:
+        recorder = LatencyRecorder()
+        pool.add_hook(recorder)
+        zibal, other = pool.get("zibal"), pool.get("other")
+
+        assert isinstance(zibal, MerchantClient)
+        assert (zibal.merchant, other.merchant) == ("zibal", "other")
+        assert zibal.transport is other.transport is transport
+        assert zibal.rate_limiter is other.rate_limiter is rate_limiter
+        assert zibal._single_flight is not other._single_flight
+
+        for client in (zibal, other):
+            track_id = client.request_transaction(
+                amount=25000, callback_url="https://localhost/"
+            ).track_id
+            assert transport.state.transactions[track_id].merchant == client.merchant
+        # the timings of both merchants are recorded by the shared hook
+        assert len(recorder._samples["request", "total"]) == 2
+        assert transport.calls["request"] == 2
+
+        # closing a client doesn't close the shared resources
+        with pool.get("zibal") as client:
+            assert client is zibal
+    assert len(pool) == 0
+
+
+def test_pool_evicts_idle_and_least_recently_used_clients(clock):
+    pool = ZibalClientPool(max_size=2, idle_timeout=10, clock=clock, transport=FakeTransport())
+    first = pool.get("first")
+    clock.now = 5
+    pool.get("second")
+    assert pool.get("first") is first
+
+    pool.get("third")
+    assert len(pool) == 2
+    assert pool.stats.evictions == 1
+    clock.now = 8
+    assert pool.get("first") is first
+
+    clock.now = 16
+    assert pool.evict_idle() == 1
+    assert pool.get("first") is first
+
+    # idle clients are also evicted on misses
+    clock.now = 30
+    pool.get("fourth")
+    assert len(pool) == 1
+    assert pool.get("first") is not first
+    assert (pool.stats.hits, pool.stats.misses, pool.stats.evictions) == (3, 5, 3)
+
+
+def test_clients_dont_add_handlers_to_the_default_logger():
+    logger = logging.getLogger("zibal.client")
+    handlers = len(logger.handlers)
+    for _ in range(3):
+        ZibalIPGClient("zibal", transport=FakeTransport())
+    assert len(logger.handlers) == handlers
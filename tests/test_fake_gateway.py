@@ -0,0 +1,94 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import RequestError
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.models.schemas import TransactionCallbackQueryParams
+
+
+@pytest.fixture
+def gateway():
+    with FakeZibalGateway() as gateway:
+        yield gateway
+
+
+@pytest.fixture
+def client(gateway):
+    with ZibalIPGClient("zibal", base_url=gateway.base_url) as client:
+        yield client
+
+
+def start_payment(gateway, track_id, **params):
+    response = requests.get(
+        gateway.payment_base_url + str(track_id), params=params, allow_redirects=False
+    )
+    assert response.status_code == 302
+    query = parse_qs(urlsplit(response.headers["Location"]).query)
+    return TransactionCallbackQueryParams(
+        success=int(query["success"][0]),
+        track_id=int(query["trackId"][0]),
+        order_id=query["orderId"][0],
+        status=int(query["status"][0]),
+    )
+
+
+def test_payment_flow_state_transitions(gateway, client):
+    assert client.check_service_status()
+    require_response = client.request_transaction(
+        amount=25000, callback_url="https://localhost:8000/", order_id="12"
+    )
+    track_id = require_response.track_id
+    assert client.inquiry_transaction(track_id).status == -1
+    assert client.verify_transaction(track_id).result_code == 202
+
+    callback_params = start_payment(gateway, track_id)
+    assert (callback_params.success, callback_params.status) == (1, 2)
+    assert callback_params.order_id == "12"
+
+    verify_response = client.verify_transaction(track_id)
+    assert (verify_response.result, verify_response.status) == (100, 1)
+    assert verify_response.amount == 25000
+    assert client.verify_transaction(track_id).result_code == 201
+    assert client.inquiry_transaction(track_id).status == 1
+
+
+def test_cancelled_payment(gateway, client):
+    track_id = client.request_transaction(
+        amount=25000, callback_url="https://localhost:8000/", order_id="12"
+    ).track_id
+    callback_params = start_payment(gateway, track_id, status=3)
+    assert (callback_params.success, callback_params.status) == (0, 3)
+    assert client.verify_transaction(track_id).result_code == 202
+
+
+def test_unknown_merchant(gateway):
+    client = ZibalIPGClient("unknown", base_url=gateway.base_url)
+    response = client.request_transaction(
+        amount=25000, callback_url="https://localhost:8000/"
+    )
+    assert response.result_code == 102
+
+
+def test_unknown_track_id(client):
+    assert client.inquiry_transaction(1).result_code == 203
+
+
+def test_error_rate():
+    with FakeZibalGateway(error_rate=1.0) as gateway:
+        client = ZibalIPGClient("zibal", base_url=gateway.base_url)
+        with pytest.raises(RequestError) as exc_info:
+            client.inquiry_transaction(1)
+    assert exc_info.value.status_code in (500, 502, 503)
+
+
+def test_rate_limit():
+    with FakeZibalGateway(rate_limit=1, rate_burst=2) as gateway:
+        client = ZibalIPGClient("zibal", base_url=gateway.base_url)
+        client.inquiry_transaction(1)
+        client.inquiry_transaction(1)
+        with pytest.raises(RequestError) as exc_info:
+            client.inquiry_transaction(1)
+    assert exc_info.value.status_code == 429
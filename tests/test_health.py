@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import ServiceUnavailableError
+from zibal.health import HealthProber
+
+
+def test_verdict_follows_window_success_rate():
+    outcomes = iter([True, False, False, True, True])
+    prober = HealthProber(lambda: next(outcomes), window=3, min_success_rate=0.5)
+    assert prober.healthy  # assumed to be healthy before the first probe
+    assert prober.success_rate is None
+
+    verdicts = []
+    for _ in range(5):
+        prober.probe_once()
+        verdicts.append(prober.healthy)
+    assert verdicts == [True, True, False, False, True]
+    assert len(prober.latencies) == 3
+
+
+def test_failing_probe_is_counted_as_unhealthy():
+    def probe():
+        raise ConnectionError
+
+    prober = HealthProber(probe)
+    assert prober.probe_once() is False
+    assert prober.healthy is False
+
+
+def test_prober_runs_in_background():
+    calls = []
+    prober = HealthProber(lambda: calls.append(1) or True, interval=0.01).start()
+    time.sleep(0.1)
+    prober.stop()
+    assert len(calls) > 1
+    assert prober.last_probed_at is not None
+
+
+def test_client_returns_cached_service_status(mocker):
+    mock_head = mocker.patch(
+        "requests.Session.head", return_value=mocker.MagicMock(status_code=503)
+    )
+    with ZibalIPGClient("zibal", health_check_interval=60) as client:
+        # wait for the first probe of the background thread
+        while client.health_prober.last_probed_at is None:
+            time.sleep(0.001)
+        for _ in range(10):
+            assert client.check_service_status() is False
+    assert mock_head.call_count == 1
+
+
+def test_client_fails_fast_when_unhealthy(mocker):
+    mocker.patch("requests.Session.head", return_value=mocker.MagicMock(status_code=503))
+    mock_post = mocker.patch("requests.Session.post")
+    with ZibalIPGClient(
+        "zibal", health_check_interval=60, fail_fast_when_unhealthy=True
+    ) as client:
+        while client.health_prober.last_probed_at is None:
+            time.sleep(0.001)
+        with pytest.raises(ServiceUnavailableError):
+            client.request_transaction(amount=25000, callback_url="https://localhost/")
+    mock_post.assert_not_called()
@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+# The budget of the time spent importing the modules of the package itself
+# (excluding its dependencies), measured using `python -X importtime`; it
+# is about 15ms, and about 35ms without deferring the build of the models.
+# It can be raised on slow machines by setting ZIBAL_IMPORT_BUDGET_MS.
+IMPORT_BUDGET_MS = float(os.environ.get("ZIBAL_IMPORT_BUDGET_MS", 30))
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+
+
+def test_importing_the_client_is_lazy():
+    code = """
+import json, sys
+import zibal.client
+from zibal.models import schemas
+print(json.dumps({
+    "requests": "requests" in sys.modules,
+    "built_models": [
+        name for name, value in vars(schemas).items()
+        if isinstance(value, type)
+        and issubclass(value, schemas.BaseModel)
+        and value.__pydantic_complete__
+    ],
+}))
+"""
+    result = json.loads(run_python("-c", code).stdout)
+    assert result == {"requests": False, "built_models": []}
+
+
+def test_importing_the_package_imports_nothing():
+    code = "import sys, zibal; print('pydantic' in sys.modules)"
+    assert run_python("-c", code).stdout.strip() == "False"
+
+
+def test_lazy_package_attributes():
+    import zibal
+    from zibal.client import ZibalIPGClient
+
+    assert zibal.ZibalIPGClient is ZibalIPGClient
+    assert "ZibalIPGClient" in dir(zibal)
+
+
+def test_import_time_budget():
+    output = run_python("-X", "importtime", "-c", "import zibal.client").stderr
+    self_time = 0
+    for line in output.splitlines():
+        self_us, _, name = line[len("import time:"):].split("|")
+        if name.strip().startswith("zibal"):
+            self_time += int(self_us)
+    assert self_time / 1000 < IMPORT_BUDGET_MS, (
+        f"importing zibal took {self_time / 1000:.1f}ms, "
+        f"over the budget of {IMPORT_BUDGET_MS}ms"
+    )
@@ -0,0 +1,77 @@
+import pytest
+
+from zibal.client import ZibalEndPoints, ZibalIPGClient
+from zibal.exceptions import RequestError
+from zibal.instrumentation import PHASES, CallTimings, LatencyRecorder
+
+from .responses import ALREADY_VERIFIED_VERIFY_RESPONSE, VALID_VERIFY_RESPONSE
+
+
+@pytest.fixture
+def mock_request(mocker):
+    def mock(return_data, status_code=200):
+        mock_response = mocker.MagicMock()
+        mock_response.json.return_value = return_data
+        mock_response.status_code = status_code
+        return mocker.patch("requests.Session.post", return_value=mock_response)
+
+    return mock
+
+
+def test_hook_receives_phase_timings(mock_request):
+    mock_post = mock_request(VALID_VERIFY_RESPONSE)
+    reports = []
+    client = ZibalIPGClient("zibal")
+    client.add_hook(reports.append)
+    client.verify_transaction(track_id=12345)
+
+    [timings] = reports
+    assert timings.endpoint == ZibalEndPoints.VERIFY
+    assert timings.result == 100
+    assert timings.error is None
+    assert all(getattr(timings, phase) >= 0 for phase in PHASES)
+    assert timings.total == pytest.approx(sum(getattr(timings, p) for p in PHASES))
+    # the request data is encoded by the client itself when timed
+    assert mock_post.call_args.kwargs["data"] == b'{"merchant": "zibal", "trackId": 12345}'
+
+
+def test_hook_receives_result_code_of_failed_result(mock_request):
+    mock_request(ALREADY_VERIFIED_VERIFY_RESPONSE)
+    reports = []
+    client = ZibalIPGClient("zibal")
+    client.add_hook(reports.append)
+    client.verify_transaction(track_id=12345)
+    assert reports[0].result == 201
+
+
+def test_hook_receives_errors(mock_request):
+    mock_request({}, status_code=500)
+    reports = []
+    client = ZibalIPGClient("zibal")
+    client.add_hook(reports.append)
+    with pytest.raises(RequestError):
+        client.inquiry_transaction(track_id=12345)
+    assert isinstance(reports[0].error, RequestError)
+
+
+def test_calls_are_not_timed_without_hooks(mocker, mock_request):
+    mock_request(VALID_VERIFY_RESPONSE)
+    mock_timer = mocker.patch("zibal.client.PhaseTimer")
+    client = ZibalIPGClient("zibal")
+    hook = mocker.MagicMock()
+    client.add_hook(hook)
+    client.remove_hook(hook)
+    client.verify_transaction(track_id=12345)
+    mock_timer.assert_not_called()
+
+
+def test_latency_recorder_percentiles():
+    recorder = LatencyRecorder()
+    for send in range(1, 101):
+        recorder(CallTimings(endpoint=ZibalEndPoints.INQUIRY, send=send / 1000))
+
+    percentiles = recorder.percentiles("inquiry", "send")
+    assert percentiles == {50: 0.05, 95: 0.095, 99: 0.099}
+    assert recorder.percentiles(ZibalEndPoints.INQUIRY, "total")[99] == 0.099
+    assert recorder.percentiles("verify") == {}
+    assert ("inquiry", "decode") in recorder.summary()
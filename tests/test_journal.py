@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from pydantic import ValidationError
+
+from zibal.client import ZibalIPGClient
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.journal import DONE, PENDING, VerifyJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    with VerifyJournal(str(tmp_path / "journal.db")) as journal:
+        yield journal
+
+
+@pytest.fixture
+def gateway():
+    with FakeZibalGateway() as gateway:
+        yield gateway
+
+
+def test_journal_records_intents_and_outcomes(journal):
+    journal.record_intent("zibal", 1)
+    journal.record_intent("zibal", 2)
+    journal.record_intent("other", 3)
+    journal.record_outcome("zibal", 1, 100, 1)
+
+    assert journal.unfinished("zibal") == [2]
+    assert sorted(journal.unfinished()) == [2, 3]
+    entry = journal.get("zibal", 1)
+    assert (entry.state, entry.result, entry.status) == (DONE, 100, 1)
+    assert journal.get("zibal", 4) is None
+
+    # a new intent reopens the entry
+    journal.record_intent("zibal", 1)
+    assert journal.get("zibal", 1).state == PENDING
+
+
+def test_journal_survives_reopening(tmp_path):
+    path = str(tmp_path / "journal.db")
+    with VerifyJournal(path) as journal:
+        journal.record_intent("zibal", 1)
+        journal.record_intent("zibal", 2)
+        journal.record_outcome("zibal", 2, 201)
+    with VerifyJournal(path) as journal:
+        assert journal.unfinished("zibal") == [1]
+
+
+def test_journal_group_commits_concurrent_writes(tmp_path):
+    with VerifyJournal(str(tmp_path / "journal.db"), commit_delay=0.01) as journal:
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            list(executor.map(lambda i: journal.record_intent("zibal", i), range(100)))
+        assert journal.stats.writes == 100
+        assert journal.stats.commits < 100
+        assert len(journal.unfinished()) == 100
+
+
+def test_journal_is_closed(journal):
+    journal.close()
+    with pytest.raises(RuntimeError):
+        journal.record_intent("zibal", 1)
+
+
+def test_journal_write_errors_fail_only_their_own_write(journal):
+    with pytest.raises(OverflowError):
+        journal.record_intent("zibal", 2**63)
+    journal.record_intent("zibal", 5)
+    assert journal.unfinished() == [5]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_journal_fails_writes_once_the_writer_thread_stops(tmp_path, mocker):
+    journal = VerifyJournal(str(tmp_path / "journal.db"))
+    mocker.patch.object(journal, "_commit", side_effect=ValueError("unexpected"))
+    with pytest.raises(RuntimeError):
+        journal.record_intent("zibal", 1)
+    journal._thread.join()
+    with pytest.raises(RuntimeError):
+        journal.record_intent("zibal", 2)
+
+
+def test_client_journals_verifies_and_replays_unfinished(gateway, journal):
+    client = ZibalIPGClient("zibal", base_url=gateway.base_url, verify_journal=journal)
+    paid, unpaid, crashed = (
+        client.request_transaction(
+            amount=25000, callback_url="https://localhost:8000/"
+        ).track_id
+        for _ in range(3)
+    )
+    gateway.state.pay(paid)
+    gateway.state.pay(crashed)
+
+    assert client.verify_transaction(paid).result == 100
+    assert client.verify_transaction(unpaid).result_code == 202
+    assert journal.get("zibal", paid).status == 1
+    assert journal.get("zibal", unpaid).result == 202
+
+    # the worker died after recording the intent of a verify
+    journal.record_intent("zibal", crashed)
+    assert journal.unfinished("zibal") == [crashed]
+
+    [(track_id, result)] = client.replay_verify_journal()
+    assert (track_id, result.result) == (crashed, 100)
+    assert journal.unfinished("zibal") == []
+    client.close()
+
+
+def test_client_journal_keeps_network_errors_unfinished(mocker, journal):
+    mocker.patch(
+        "requests.Session.post", side_effect=requests.exceptions.ConnectionError
+    )
+    client = ZibalIPGClient("zibal", verify_journal=journal)
+    [(_, result)] = client.verify_many([1])
+    assert isinstance(result, Exception)
+    assert journal.unfinished("zibal") == [1]
+
+
+def test_client_journal_skips_invalid_track_ids(journal):
+    client = ZibalIPGClient("zibal", verify_journal=journal)
+    with pytest.raises(ValidationError):
+        client.verify_transaction("abc")
+    assert journal.unfinished() == []
@@ -0,0 +1,83 @@
+import math
+from datetime import datetime
+
+import pytest
+
+from zibal.ledger import MISSING_CODE, TransactionLedger, parse_timestamp
+from zibal.models.schemas import TransactionInquiryResponse, TransactionVerifyResponse
+
+from .responses import VALID_INQUIRY_RESPONSE, VALID_VERIFY_RESPONSE
+
+
+def inquiry_response(**fields):
+    return TransactionInquiryResponse.from_camel_case({**VALID_INQUIRY_RESPONSE, **fields})
+
+
+@pytest.fixture
+def ledger():
+    ledger = TransactionLedger()
+    ledger.extend(
+        [
+            (1, inquiry_response(amount=1000, paidAt="2024-08-16T10:00:00")),
+            (2, inquiry_response(amount=2000, wage=1, paidAt="2024-08-16T12:00:00")),
+            (3, inquiry_response(amount=4000, status=2, paidAt="2024-08-17T10:00:00")),
+            (4, Exception("failed inquiry")),
+        ]
+    )
+    return ledger
+
+
+def test_ledger_aggregates(ledger):
+    assert len(ledger) == 3
+    assert ledger.count(by="status") == {1: 2, 2: 1}
+    assert ledger.sum("amount") == 7000
+    assert ledger.sum("amount", by="status") == {1: 3000, 2: 4000}
+    assert ledger.sum("shaparak_fee", by="wage") == {0: 2400, 1: 1200}
+    assert ledger.where("status", 1).sum("amount", by="wage") == {0: 1000, 1: 2000}
+
+
+def test_ledger_window(ledger):
+    day = ledger.window(datetime(2024, 8, 16), datetime(2024, 8, 17))
+    assert list(day.column("track_id")) == [1, 2]
+    assert len(ledger.window(start=datetime(2024, 8, 16, 11))) == 2
+    with pytest.raises(ValueError):
+        ledger.window(column="amount")
+
+
+def test_ledger_window_index_is_rebuilt_after_adding_rows(ledger):
+    ledger.add(5, inquiry_response(paidAt="2024-08-16T08:00:00"))
+    ledger.add(6, inquiry_response(paidAt="2024-08-15T23:59:59"))
+    day = ledger.window(datetime(2024, 8, 16), datetime(2024, 8, 17))
+    # rows are kept in the order they were added, not in the time order
+    assert list(day.column("track_id")) == [1, 2, 5]
+    assert day.sum("amount") == 1000 + 2000 + VALID_INQUIRY_RESPONSE["amount"]
+
+    ledger.add(7, inquiry_response(paidAt="2024-08-16T09:00:00"))
+    day = ledger.window(datetime(2024, 8, 16), datetime(2024, 8, 17))
+    assert list(day.column("track_id")) == [1, 2, 5, 7]
+
+
+def test_ledger_verify_responses_have_missing_fields():
+    ledger = TransactionLedger()
+    ledger.add(1, TransactionVerifyResponse.from_camel_case(VALID_VERIFY_RESPONSE))
+    assert ledger.column("wage")[0] == MISSING_CODE
+    assert ledger.column("shaparak_fee")[0] == 0
+    assert math.isnan(ledger.column("verified_at")[0])
+    assert len(ledger.window(column="verified_at")) == 0
+
+
+def test_ledger_snapshot_round_trip(ledger, tmp_path):
+    path = str(tmp_path / "ledger.bin")
+    ledger.save(path)
+    loaded = TransactionLedger.load(path)
+    for name in ("track_id", "amount", "status", "wage", "paid_at"):
+        assert loaded.column(name) == ledger.column(name)
+
+    (tmp_path / "other.bin").write_bytes(b"not a ledger at all")
+    with pytest.raises(ValueError):
+        TransactionLedger.load(str(tmp_path / "other.bin"))
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("1970-01-01T00:00:01.5") == 1.5
+    assert math.isnan(parse_timestamp(None))
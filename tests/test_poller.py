@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from zibal.client import ZibalIPGClient
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.poller import PendingTransaction, TransactionPoller
+
+
+@pytest.fixture
+def gateway():
+    with FakeZibalGateway() as gateway:
+        yield gateway
+
+
+@pytest.fixture
+def client(gateway):
+    with ZibalIPGClient("zibal", base_url=gateway.base_url) as client:
+        yield client
+
+
+def request_transaction(client):
+    return client.request_transaction(
+        amount=25000, callback_url="https://localhost:8000/"
+    ).track_id
+
+
+def test_poller_verifies_paid_and_completes_final_transactions(gateway, client, clock):
+    paid, cancelled, waiting = (request_transaction(client) for _ in range(3))
+    gateway.state.pay(paid)
+    gateway.state.pay(cancelled, status=3)
+
+    events = []
+    poller = TransactionPoller(client, on_complete=events.append, clock=clock)
+    for track_id in (paid, cancelled, waiting):
+        poller.add(track_id)
+
+    returned = poller.tick()
+    assert returned == events
+    outcomes = {event.track_id: (event.outcome, event.status) for event in events}
+    assert outcomes == {paid: ("verified", 1), cancelled: ("failed", 3)}
+    assert gateway.state.transactions[paid].status == 1
+
+    # the waiting transaction is not polled again until its interval passes
+    assert len(poller) == 1 and waiting in poller
+    assert poller.next_due_at() == clock.now + poller.min_interval
+    assert poller.tick() == []
+
+    gateway.state.pay(waiting)
+    clock.now += poller.min_interval
+    [event] = poller.tick()
+    assert (event.track_id, event.outcome) == (waiting, "verified")
+    assert len(poller) == 0
+
+
+def test_poller_expires_and_fails_invalid_transactions(client, clock):
+    waiting = request_transaction(client)
+    poller = TransactionPoller(client, max_age=60, clock=clock)
+    poller.add(waiting)
+    poller.add(123)  # unknown track id
+
+    [event] = poller.tick()
+    assert (event.track_id, event.outcome) == (123, "failed")
+    assert event.result.result_code == 203
+
+    clock.now += 60
+    [event] = poller.tick()
+    assert (event.track_id, event.outcome, event.status) == (waiting, "expired", -1)
+
+
+def test_poller_discard(client, clock):
+    poller = TransactionPoller(client, clock=clock)
+    poller.add(request_transaction(client))
+    poller.discard(next(iter(poller._pending)))
+    assert poller.tick() == []
+    assert poller.next_due_at() is None
+
+
+def test_poller_keeps_transactions_added_again_while_polled(client, clock):
+    track_id = request_transaction(client)
+    poller = TransactionPoller(client, clock=clock)
+    poller.add(track_id)
+    [item] = poller._pop_due()
+
+    poller.discard(track_id)
+    poller.add(track_id)
+    poller._complete(item, "failed", None)
+    assert track_id in poller
+    assert poller._pending[track_id] is not item
+
+
+def test_poller_batches_due_transactions(client, clock):
+    track_ids = [request_transaction(client) for _ in range(5)]
+    poller = TransactionPoller(client, batch_size=2, clock=clock)
+    for track_id in track_ids:
+        poller.add(track_id)
+
+    polled = []
+    for _ in range(3):
+        batch = poller._pop_due()
+        polled.append(len(batch))
+        for item in batch:
+            poller._reschedule(item)
+    assert polled == [2, 2, 1]
+
+
+def test_next_interval_adapts_to_age_status_and_errors(client):
+    poller = TransactionPoller(
+        client, min_interval=5, max_interval=300, age_factor=0.25
+    )
+    item = PendingTransaction(track_id=1, added_at=0, due_at=0, last_status=-1)
+    assert poller.next_interval(item, now=1) == 5
+    assert poller.next_interval(item, now=100) == 25
+    assert poller.next_interval(item, now=10000) == 300
+
+    item.last_status = 2
+    assert poller.next_interval(item, now=10000) == 5
+
+    item.errors = 3
+    assert poller.next_interval(item, now=10000) == 20
+
+
+def test_poller_reschedules_batch_after_unexpected_error(client, mocker, caplog, clock):
+    track_id = request_transaction(client)
+    poller = TransactionPoller(client, min_interval=5, clock=clock, tick_interval=0.01)
+    poller.add(track_id)
+    mocker.patch.object(client, "inquiry_many", side_effect=ValueError("unexpected"))
+
+    with pytest.raises(ValueError):
+        poller.tick()
+    assert poller._pending[track_id].errors == 1
+    assert poller.next_due_at() == clock.now + 5
+
+    # the background thread logs the failures and keeps polling
+    clock.now += 5
+    poller.start()
+    deadline = time.monotonic() + 5
+    while client.inquiry_many.call_count < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    poller.stop()
+    assert "Poller tick failed" in caplog.text
+    assert poller._pending[track_id].errors == 2
+    assert poller.next_due_at() == clock.now + 10
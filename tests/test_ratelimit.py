@@ -0,0 +1,114 @@
+import multiprocessing
+import time
+
+import pytest
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import DeadlineExceededError, RequestError
+from zibal.ratelimit import FileTokenBucket, RateLimiter, TokenBucket
+
+from .responses import VALID_INQUIRY_RESPONSE
+
+
+@pytest.fixture
+def mock_request(mocker):
+    def mock(return_data, status_code=200):
+        mock_response = mocker.MagicMock()
+        mock_response.json.return_value = return_data
+        mock_response.status_code = status_code
+        return mocker.patch("requests.Session.post", return_value=mock_response)
+
+    return mock
+
+
+def test_token_bucket_allows_bursts_then_paces():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    now[0] = 0.5
+    assert bucket.try_acquire() == 0
+
+
+def test_token_bucket_acquire_waits_and_times_out():
+    bucket = TokenBucket(rate=20, burst=1)
+    assert bucket.acquire() == pytest.approx(0, abs=0.01)
+    assert bucket.acquire() == pytest.approx(0.05, abs=0.03)
+    assert TokenBucket(rate=0.1, burst=1).acquire() is not None
+    bucket = TokenBucket(rate=0.1, burst=1)
+    bucket.acquire()
+    assert bucket.acquire(timeout=0.01) is None
+
+
+def _take_tokens(path, count, results):
+    bucket = FileTokenBucket(path, rate=0.001, burst=10)
+    results.put(sum(bucket.try_acquire() == 0 for _ in range(count)))
+
+
+def test_file_token_bucket_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "bucket")
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_take_tokens, args=(path, 10, results))
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert sum(results.get() for _ in processes) == 10
+
+
+def test_rate_limiter_adapts_rate():
+    limiter = RateLimiter(rate=10, increase_step=1)
+    limiter.record_limited("verify")
+    assert limiter.stats["verify"].rate == 5
+    assert limiter.stats["verify"].limited == 1
+    limiter.record_success("verify")
+    assert limiter.stats["verify"].rate == 6
+    for _ in range(10):
+        limiter.record_success("verify")
+    assert limiter.stats["verify"].rate == 10
+    # other endpoints have their own buckets
+    assert limiter.bucket("inquiry").rate == 10
+
+
+def test_client_is_paced_by_rate_limiter(mock_request):
+    mock_request(VALID_INQUIRY_RESPONSE)
+    limiter = RateLimiter(rate=20, burst=1)
+    client = ZibalIPGClient("zibal", rate_limiter=limiter)
+    start = time.monotonic()
+    for _ in range(3):
+        client.inquiry_transaction(track_id=12345)
+    assert time.monotonic() - start >= 0.09
+    stats = limiter.stats["inquiry"]
+    assert (stats.acquired, stats.delayed) == (3, 2)
+    assert stats.max_wait > 0
+
+
+def test_client_slows_down_when_limited(mock_request):
+    mock_request({"message": "too many requests"}, 429)
+    limiter = RateLimiter(rate=10)
+    client = ZibalIPGClient("zibal", rate_limiter=limiter)
+    with pytest.raises(RequestError):
+        client.inquiry_transaction(track_id=12345)
+    assert limiter.stats["inquiry"].rate == 5
+
+
+def test_client_ignores_limit_status_of_transactions(mock_request):
+    mock_request({**VALID_INQUIRY_RESPONSE, "status": 7})
+    limiter = RateLimiter(rate=10)
+    client = ZibalIPGClient("zibal", rate_limiter=limiter)
+    client.inquiry_transaction(track_id=12345)
+    assert limiter.stats["inquiry"].rate == 10
+
+
+def test_rate_limiter_wait_is_bounded_by_deadline(mock_request):
+    mock_request(VALID_INQUIRY_RESPONSE)
+    limiter = RateLimiter(rate=0.1, burst=1)
+    client = ZibalIPGClient("zibal", rate_limiter=limiter, deadline=0.05)
+    client.inquiry_transaction(track_id=12345)
+    with pytest.raises(DeadlineExceededError):
+        client.inquiry_transaction(track_id=12345)
+    assert limiter.stats["inquiry"].rejected == 1
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from zibal.client import ZibalIPGClient
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.reconciliation import (
+    ExpectedRecord,
+    Reconciler,
+    read_csv,
+    read_jsonl,
+)
+
+
+@pytest.fixture
+def gateway():
+    with FakeZibalGateway() as gateway:
+        yield gateway
+
+
+@pytest.fixture
+def client(gateway):
+    with ZibalIPGClient("zibal", base_url=gateway.base_url) as client:
+        yield client
+
+
+def create_transaction(gateway, amount, order_id, verify=True):
+    track_id = gateway.state.request(
+        {
+            "merchant": "zibal",
+            "amount": amount,
+            "callbackUrl": "https://localhost/",
+            "orderId": order_id,
+        }
+    )["trackId"]
+    if verify:
+        gateway.state.pay(track_id)
+        gateway.state.verify({"merchant": "zibal", "trackId": track_id})
+    return track_id
+
+
+def test_reconcile_reports_mismatches_and_totals(gateway, client, tmp_path):
+    matching = create_transaction(gateway, 25000, "1")
+    wrong_amount = create_transaction(gateway, 30000, "2")
+    unpaid = create_transaction(gateway, 40000, "3", verify=False)
+    gateway.state.transactions[wrong_amount].wage = 1
+
+    path = tmp_path / "orders.csv"
+    path.write_text(
+        "trackId,amount,status,orderId\n"
+        f"{matching},25000,1,1\n"
+        f"{wrong_amount},35000,1,2\n"
+        f"{unpaid},40000,1,\n"
+        "123,1000,1,4\n"
+    )
+    reconciler = Reconciler(client, max_workers=2)
+    mismatches = {
+        mismatch.track_id: mismatch for mismatch in reconciler.reconcile(read_csv(path))
+    }
+
+    assert set(mismatches) == {wrong_amount, unpaid, 123}
+    assert mismatches[wrong_amount].differences == {"amount": (35000, 30000)}
+    assert mismatches[unpaid].differences == {"status": (1, -1)}
+    assert mismatches[123].error.startswith("203")
+
+    totals = reconciler.totals
+    assert totals.records == 4
+    assert (totals.matched, totals.mismatched, totals.failed) == (1, 2, 1)
+    assert totals.amount == 55000
+    assert totals.shaparak_fee == 2400
+    assert totals.summary()["by_wage"] == {
+        "Deduction from transaction": {"count": 1, "amount": 25000, "shaparak_fee": 1200},
+        "Deduction from wallet": {"count": 1, "amount": 30000, "shaparak_fee": 1200},
+    }
+
+
+def test_reconcile_jsonl_and_plain_track_ids(gateway, client, tmp_path):
+    track_id = create_transaction(gateway, 25000, "1")
+    path = tmp_path / "orders.jsonl"
+    path.write_text(json.dumps({"trackId": track_id, "orderId": "other"}) + "\n\n")
+
+    reconciler = Reconciler(client)
+    [mismatch] = reconciler.reconcile(read_jsonl(path))
+    assert mismatch.differences == {"order_id": ("other", "1")}
+
+    assert list(reconciler.reconcile([track_id, {"track_id": track_id}])) == []
+    assert reconciler.totals.records == 3
+
+
+def test_reconcile_reads_records_lazily(gateway, client):
+    track_id = create_transaction(gateway, 25000, "1")
+    consumed = []
+
+    def records():
+        for index in range(1000):
+            consumed.append(index)
+            yield ExpectedRecord(track_id=track_id, amount=1)
+
+    mismatches = Reconciler(client, max_workers=2).reconcile(records())
+    next(mismatches)
+    assert len(consumed) < 10
+    mismatches.close()
+
+
+def test_expected_record_from_dict():
+    record = ExpectedRecord.from_dict(
+        {"trackId": "12", "amount": "1000", "refNumber": "", "orderId": 5, "extra": 1}
+    )
+    assert record == ExpectedRecord(track_id=12, amount=1000, order_id="5")
@@ -0,0 +1,265 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import CircuitOpenError, DeadlineExceededError, RequestError
+from zibal.resilience import CircuitBreaker, CircuitState, RetryPolicy
+from zibal.transport import FakeTransport, TransportResponse
+
+from .responses import (
+    ALREADY_VERIFIED_VERIFY_RESPONSE,
+    VALID_INQUIRY_RESPONSE,
+    VALID_REQUIRE_RESPONSE,
+    VALID_VERIFY_RESPONSE,
+)
+
+RESPONSES = {
+    "/v1/request": VALID_REQUIRE_RESPONSE,
+    "/v1/verify": VALID_VERIFY_RESPONSE,
+    "/v1/inquiry": VALID_INQUIRY_RESPONSE,
+}
+
+
+class FaultInjectingHandler(BaseHTTPRequestHandler):
+    """
+    Serves the valid responses, unless a fault is queued for the requested
+    path; faults are either an HTTP status code, "drop" for closing the
+    connection without a response, or a (delay, fault) tuple.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.hits.append(self.path)
+        faults = self.server.faults.get(self.path)
+        fault = faults.pop(0) if faults else None
+        if isinstance(fault, tuple):
+            delay, fault = fault
+            time.sleep(delay)
+        if fault == "drop":
+            self.close_connection = True
+            return
+        if isinstance(fault, dict):
+            self.send_json(200, fault)
+        elif fault is not None:
+            self.send_json(fault, {"message": "injected fault"})
+        else:
+            self.send_json(200, RESPONSES[self.path])
+
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients are expected to hang up on delayed faults
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer(("127.0.0.1", 0), FaultInjectingHandler)
+    server.faults = {}
+    server.hits = []
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+FAST_RETRIES = RetryPolicy(max_attempts=3, backoff_base=0.01)
+
+
+@pytest.mark.parametrize("fault", [503, 429, "drop"])
+def test_inquiry_is_retried_on_transient_faults(stub_server, fault):
+    stub_server.faults["/v1/inquiry"] = [fault, fault]
+    client = ZibalIPGClient(
+        "zibal", base_url=stub_server.base_url, retry_policy=FAST_RETRIES
+    )
+    response = client.inquiry_transaction(track_id=12345)
+    assert response.amount == VALID_INQUIRY_RESPONSE["amount"]
+    assert stub_server.hits.count("/v1/inquiry") == 3
+
+
+def test_retries_give_up_after_max_attempts(stub_server):
+    stub_server.faults["/v1/inquiry"] = [503, 503, 503]
+    client = ZibalIPGClient(
+        "zibal", base_url=stub_server.base_url, retry_policy=FAST_RETRIES
+    )
+    with pytest.raises(RequestError) as exc_info:
+        client.inquiry_transaction(track_id=12345)
+    assert exc_info.value.status_code == 503
+    assert stub_server.hits.count("/v1/inquiry") == 3
+
+
+def test_non_retryable_status_code_is_not_retried(stub_server):
+    stub_server.faults["/v1/inquiry"] = [404]
+    client = ZibalIPGClient(
+        "zibal", base_url=stub_server.base_url, retry_policy=FAST_RETRIES
+    )
+    with pytest.raises(RequestError):
+        client.inquiry_transaction(track_id=12345)
+    assert stub_server.hits.count("/v1/inquiry") == 1
+
+
+def test_transaction_request_is_not_retried(stub_server):
+    stub_server.faults["/v1/request"] = [503]
+    client = ZibalIPGClient(
+        "zibal", base_url=stub_server.base_url, retry_policy=FAST_RETRIES
+    )
+    with pytest.raises(RequestError):
+        client.request_transaction(amount=25000, callback_url="https://localhost/")
+    assert stub_server.hits.count("/v1/request") == 1
+
+
+def test_retried_verify_treats_already_verified_as_success(stub_server):
+    # the first verify reaches the IPG, but its response is lost
+    stub_server.faults["/v1/verify"] = [
+        (0.3, 200),
+        ALREADY_VERIFIED_VERIFY_RESPONSE,
+    ]
+    client = ZibalIPGClient(
+        "zibal",
+        base_url=stub_server.base_url,
+        request_timeout=0.1,
+        retry_policy=FAST_RETRIES,
+    )
+    response = client.verify_transaction(track_id=12345)
+    assert response.result == 100
+    assert response.amount == VALID_INQUIRY_RESPONSE["amount"]
+    assert stub_server.hits == ["/v1/verify", "/v1/verify", "/v1/inquiry"]
+
+
+def test_deadline_bounds_the_whole_call(stub_server):
+    stub_server.faults["/v1/inquiry"] = [(0.5, 200)] * 5
+    client = ZibalIPGClient(
+        "zibal",
+        base_url=stub_server.base_url,
+        retry_policy=RetryPolicy(max_attempts=5, backoff_base=0.01),
+        deadline=0.3,
+    )
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        client.inquiry_transaction(track_id=12345)
+    assert time.monotonic() - start < 0.5
+
+
+def test_circuit_breaker_fails_fast_during_cool_down(stub_server):
+    now = [0.0]
+    breaker = CircuitBreaker(
+        failure_threshold=2, reset_timeout=10, clock=lambda: now[0]
+    )
+    stub_server.faults["/v1/inquiry"] = [503, 503]
+    client = ZibalIPGClient(
+        "zibal", base_url=stub_server.base_url, circuit_breaker=breaker
+    )
+
+    for _ in range(2):
+        with pytest.raises(RequestError):
+            client.inquiry_transaction(track_id=12345)
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        client.inquiry_transaction(track_id=12345)
+    assert stub_server.hits.count("/v1/inquiry") == 2
+
+    now[0] = 10.0
+    assert breaker.state == CircuitState.HALF_OPEN
+    client.inquiry_transaction(track_id=12345)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_already_verified_retry_survives_failed_inquiry():
+    verify_responses = [TransportResponse(503, b"unavailable"), ALREADY_VERIFIED_VERIFY_RESPONSE]
+    transport = FakeTransport(
+        {
+            "verify": lambda data: verify_responses.pop(0),
+            "inquiry": TransportResponse(503, b"unavailable"),
+        }
+    )
+    client = ZibalIPGClient(
+        "zibal",
+        transport=transport,
+        retry_policy=RetryPolicy(max_attempts=2, backoff_base=0),
+    )
+    result = client.verify_transaction(track_id=12345)
+    assert result.result_code == 201
+    assert transport.calls == {"verify": 2, "inquiry": 1}
+
+
+def test_open_circuit_is_not_retried():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    transport = FakeTransport({"inquiry": VALID_INQUIRY_RESPONSE})
+    client = ZibalIPGClient(
+        "zibal",
+        transport=transport,
+        circuit_breaker=breaker,
+        retry_policy=RetryPolicy(max_attempts=5, backoff_base=1, jitter=False),
+    )
+
+    start = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        client.inquiry_transaction(track_id=12345)
+    assert time.monotonic() - start < 0.5
+    assert transport.calls["inquiry"] == 0
+
+
+def test_failed_half_open_trial_reopens_circuit():
+    now = [0.0]
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=10, clock=lambda: now[0]
+    )
+    breaker.record_failure()
+    now[0] = 10.0
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # only a single trial is let through
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_unexpected_error_of_half_open_trial_reopens_circuit():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+
+    def inquiry(data):
+        raise ValueError("unexpected")
+
+    client = ZibalIPGClient(
+        "zibal", transport=FakeTransport({"inquiry": inquiry}), circuit_breaker=breaker
+    )
+    now[0] = 10.0
+    with pytest.raises(ValueError):
+        client.inquiry_transaction(track_id=12345)
+    assert breaker.state == CircuitState.OPEN
+
+    now[0] = 20.0
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.before_request()
+
+
+def test_backoff_is_capped_and_jittered():
+    policy = RetryPolicy(backoff_base=1, backoff_max=4)
+    assert all(0 <= policy.backoff(10) <= 4 for _ in range(100))
+    assert RetryPolicy(backoff_base=1, jitter=False).backoff(3) == 4
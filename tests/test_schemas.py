@@ -1,4 +1,5 @@
 from zibal.models.schemas import (
+    TransactionInquiryResponse,
     TransactionRequireRequest,
     TransactionRequireResponse,
     TransactionVerifyRequest,
@@ -77,3 +78,59 @@ def test_verify_transaction_response_model():
         "order_id": "12",
         "multiplexing_info": [],
     }
+
+
+def test_irregular_multiplexing_infos_key_is_mapped():
+    response_data = {
+        "paidAt": "2024-02-26T20:47:34.429060",
+        "status": 1,
+        "amount": 25000,
+        "result": 100,
+        "message": "some message",
+        "multiplexingInfos": ["first", "second"],
+    }  # data receieved from zibal IPG
+    data_model = TransactionVerifyResponse.from_camel_case(response_data)
+    assert data_model.multiplexing_info == ["first", "second"]
+    assert data_model.model_dump_to_camel()["multiplexingInfos"] == [
+        "first",
+        "second",
+    ]
+    # the received data should be left untouched
+    assert "statusMeaning" not in response_data
+
+
+def test_inquiry_transaction_response_model_accepts_snake_case_keys():
+    response_data = {
+        "created_at": "2024-08-16T21:45:02.686000",
+        "paid_at": "2024-08-16T21:47:16.541000",
+        "verified_at": "2024-08-16T21:47:50.629000",
+        "status": 1,
+        "amount": 25000,
+        "description": "",
+        "wage": 0,
+        "shaparak_fee": 1200,
+        "result": 100,
+        "message": "success",
+    }
+    data_model = TransactionInquiryResponse.from_camel_case(response_data)
+    assert data_model.shaparak_fee == 1200
+    assert data_model.status_meaning == STATUS_CODES.get(1)
+
+
+def test_construct_from_camel_case_sets_derived_fields():
+    response_data = {
+        "createdAt": "2024-08-16T21:45:02.686000",
+        "paidAt": "2024-08-16T21:47:16.541000",
+        "verifiedAt": "2024-08-16T21:47:50.629000",
+        "status": 1,
+        "amount": 25000,
+        "description": "",
+        "wage": 0,
+        "shaparakFee": 1200,
+        "result": 100,
+        "message": "success",
+        "multiplexingInfos": ["first"],
+    }  # data receieved from zibal IPG
+    constructed = TransactionInquiryResponse.construct_from_camel_case(response_data)
+    validated = TransactionInquiryResponse.from_camel_case(response_data)
+    assert constructed.model_dump() == validated.model_dump()
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from zibal.client import ZibalIPGClient
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.templates import JSON_HEADERS, RequestTemplate
+
+from .responses import VALID_REQUIRE_RESPONSE
+
+
+def test_template_matches_request_data():
+    client = ZibalIPGClient("zibal")
+    template = client.create_request_template(
+        callback_url="https://localhost:8000/",
+        description="Order payment",
+        allowed_cards=["6037991234567890"],
+        ledger_id="ledger",
+    )
+    data = template.build(25000, order_id="12", mobile="09123456789")
+
+    expected = client._build_require_data(
+        amount=25000,
+        callback_url="https://localhost:8000/",
+        description="Order payment",
+        order_id="12",
+        mobile="09123456789",
+        allowed_cards=["6037991234567890"],
+        ledger_id="ledger",
+    )
+    assert data == expected
+    assert json.loads(data.body) == expected
+
+
+def test_template_description_pattern():
+    template = RequestTemplate(
+        "zibal", "https://localhost:8000/", description="Payment of order {order_id}"
+    )
+    data = template.build(25000, order_id="12")
+    assert data["description"] == "Payment of order 12"
+    assert json.loads(data.body)["description"] == "Payment of order 12"
+    assert "description" not in template.fixed_data
+
+
+def test_template_validates_fields():
+    with pytest.raises(ValidationError):
+        RequestTemplate("zibal", "not a url")
+
+    template = RequestTemplate("zibal", "https://localhost:8000/")
+    with pytest.raises(ValidationError):
+        template.build(100)
+    with pytest.raises(ValidationError):
+        template.build("25000")
+    with pytest.raises(ValidationError):
+        template.build(25000, order_id=12)
+
+
+def test_request_transaction_from_template_sends_encoded_body(mocker):
+    mock_response = mocker.MagicMock()
+    mock_response.json.return_value = VALID_REQUIRE_RESPONSE
+    mock_response.status_code = 200
+    mock_post = mocker.patch("requests.Session.post", return_value=mock_response)
+
+    client = ZibalIPGClient("zibal")
+    template = client.create_request_template(callback_url="https://localhost:8000/")
+    response_data_model = client.request_transaction_from_template(
+        template, amount=25000, order_id="12"
+    )
+
+    assert response_data_model.track_id == VALID_REQUIRE_RESPONSE["trackId"]
+    kwargs = mock_post.call_args.kwargs
+    assert kwargs["headers"] == JSON_HEADERS
+    assert json.loads(kwargs["data"]) == {
+        "merchant": "zibal",
+        "callbackUrl": "https://localhost:8000/",
+        "amount": 25000,
+        "orderId": "12",
+    }
+
+
+def test_request_transaction_from_template_with_gateway():
+    with FakeZibalGateway() as gateway, ZibalIPGClient(
+        "zibal", base_url=gateway.base_url
+    ) as client:
+        template = client.create_request_template(
+            callback_url="https://localhost:8000/", description="Order {order_id}"
+        )
+        track_id = client.request_transaction_from_template(
+            template, amount=25000, order_id="12"
+        ).track_id
+        transaction = gateway.state.transactions[track_id]
+        assert (transaction.amount, transaction.order_id) == (25000, "12")
+        assert transaction.description == "Order 12"
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from zibal.client import ZibalIPGClient
+from zibal.exceptions import RequestError
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.transport import (
+    FakeTransport,
+    RecordReplayTransport,
+    ReplayMissError,
+    Transport,
+    TransportResponse,
+)
+
+from .responses import VALID_REQUIRE_RESPONSE, VALID_VERIFY_RESPONSE
+
+
+def test_fake_transport_with_gateway_state():
+    transport = FakeTransport()
+    client = ZibalIPGClient("zibal", transport=transport)
+    assert client.check_service_status()
+
+    track_id = client.request_transaction(
+        amount=25000, callback_url="https://localhost:8000/"
+    ).track_id
+    assert client.verify_transaction(track_id).result_code == 202
+    transport.state.pay(track_id)
+    assert client.verify_transaction(track_id).status == 1
+    assert client.inquiry_transaction(track_id).status == 1
+    assert transport.calls == {"request": 1, "verify": 2, "inquiry": 1}
+
+
+def test_fake_transport_with_payloads():
+    transport = FakeTransport(
+        {
+            "request": VALID_REQUIRE_RESPONSE,
+            "verify": lambda data: {**VALID_VERIFY_RESPONSE, "orderId": str(data["trackId"])},
+            "inquiry": TransportResponse(502, b"bad gateway"),
+        }
+    )
+    client = ZibalIPGClient("zibal", transport=transport, trusted_decode=True)
+    assert client.request_transaction(
+        amount=25000, callback_url="https://localhost:8000/"
+    ).track_id == VALID_REQUIRE_RESPONSE["trackId"]
+    assert client.verify_transaction(12).order_id == "12"
+    with pytest.raises(RequestError) as exc_info:
+        client.inquiry_transaction(12)
+    assert exc_info.value.status_code == 502
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "exchanges.jsonl")
+    with FakeZibalGateway() as gateway:
+        recorder = RecordReplayTransport(path, mode="record")
+        with ZibalIPGClient(
+            "zibal", base_url=gateway.base_url, transport=recorder
+        ) as client:
+            assert client.check_service_status()
+            track_id = client.request_transaction(
+                amount=25000, callback_url="https://localhost:8000/"
+            ).track_id
+            gateway.state.pay(track_id)
+            recorded = [client.verify_transaction(track_id) for _ in range(2)]
+
+    # the gateway is stopped, so the exchanges can only be replayed
+    replayer = RecordReplayTransport(path)
+    with ZibalIPGClient("zibal", base_url=gateway.base_url, transport=replayer) as client:
+        assert client.check_service_status()
+        assert client.request_transaction(
+            amount=25000, callback_url="https://localhost:8000/"
+        ).track_id == track_id
+        replayed = [client.verify_transaction(track_id) for _ in range(3)]
+        with pytest.raises(ReplayMissError):
+            client.inquiry_transaction(track_id)
+
+    assert replayed[0] == recorded[0]
+    # repeated requests are replayed in order and the last one is repeated
+    assert replayed[1] == replayed[2] == recorded[1]
+    assert recorded[1].result_code == 201
+
+
+def test_recorded_exchanges_are_redacted(tmp_path):
+    path = tmp_path / "exchanges.jsonl"
+    recorder = RecordReplayTransport(str(path), mode="record", transport=FakeTransport())
+    with ZibalIPGClient("zibal", transport=recorder) as client:
+        track_id = client.request_transaction(
+            amount=25000, callback_url="https://localhost:8000/", mobile="09123456789"
+        ).track_id
+
+    request = json.loads(json.loads(path.read_text())["request"])
+    assert request["merchant"] == request["mobile"] == "***"
+    # the masked requests are still matched on replay
+    with ZibalIPGClient("other-merchant", transport=RecordReplayTransport(str(path))) as client:
+        assert client.request_transaction(
+            amount=25000, callback_url="https://localhost:8000/", mobile="09123456789"
+        ).track_id == track_id
+
+
+def test_record_replay_mode_is_validated(tmp_path):
+    with pytest.raises(ValueError):
+        RecordReplayTransport(str(tmp_path / "exchanges.jsonl"), mode="live")
+
+
+def test_incomplete_transports_cant_be_instantiated():
+    class PostOnlyTransport(Transport):
+        def post(self, url, data, timeout, body=None, stream=False):
+            return TransportResponse(200, b"{}")
+
+    with pytest.raises(TypeError, match="head"):
+        PostOnlyTransport()
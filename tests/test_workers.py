@@ -0,0 +1,116 @@
+import pickle
+import queue
+
+import pytest
+
+from zibal.fake_gateway import FakeZibalGateway
+from zibal.models.schemas import TransactionInquiryResponse, TransactionVerifyResponse
+from zibal.workers import INQUIRY, VERIFY, WorkerError, WorkerPool, _put, shard_for
+
+
+@pytest.fixture
+def gateway():
+    with FakeZibalGateway() as gateway:
+        yield gateway
+
+
+def create_paid_transactions(gateway, count):
+    track_ids = []
+    for _ in range(count):
+        response = gateway.state.request(
+            {"merchant": "zibal", "amount": 25000, "callbackUrl": "https://localhost/"}
+        )
+        gateway.state.pay(response["trackId"])
+        track_ids.append(response["trackId"])
+    return track_ids
+
+
+def test_worker_pool_verifies_and_reports_stats(gateway):
+    track_ids = create_paid_transactions(gateway, 20)
+    with WorkerPool(
+        "zibal", processes=2, threads=2, client_kwargs={"base_url": gateway.base_url}
+    ) as pool:
+        results = dict(pool.verify_many(track_ids))
+        stats = pool.drain()
+
+    assert sorted(results) == sorted(track_ids)
+    assert all(isinstance(result, TransactionVerifyResponse) for result in results.values())
+    assert [worker_stats.worker for worker_stats in stats] == [0, 1]
+    assert sum(worker_stats.processed for worker_stats in stats) == 20
+    assert all(worker_stats.throughput > 0 for worker_stats in stats)
+
+
+def test_worker_pool_keeps_the_order_of_a_transaction(gateway):
+    [track_id] = create_paid_transactions(gateway, 1)
+    with WorkerPool(
+        "zibal", processes=2, threads=4, client_kwargs={"base_url": gateway.base_url}
+    ) as pool:
+        job_ids = [
+            pool.submit(INQUIRY, track_id),
+            pool.submit(VERIFY, track_id),
+            pool.submit(INQUIRY, track_id),
+            pool.submit(VERIFY, track_id),
+        ]
+        results = {job_id: result for job_id, _, result in pool.results(timeout=10)}
+
+    first_inquiry, verify, second_inquiry, second_verify = (
+        results[job_id] for job_id in job_ids
+    )
+    assert isinstance(first_inquiry, TransactionInquiryResponse)
+    assert first_inquiry.status == 2
+    assert verify.result == 100
+    assert second_inquiry.status == 1
+    assert second_verify.result_code == 201
+
+
+def test_worker_pool_returns_errors_as_results():
+    with WorkerPool(
+        "zibal",
+        processes=1,
+        threads=1,
+        client_kwargs={"base_url": "http://127.0.0.1:9/", "request_timeout": 1},
+    ) as pool:
+        [(track_id, result)] = pool.inquiry_many([123])
+        [stats] = pool.drain()
+    assert track_id == 123
+    assert isinstance(result, Exception)
+    assert stats.errors == 1
+
+
+def test_worker_pool_rejects_jobs_after_drain():
+    pool = WorkerPool("zibal", processes=1, threads=1)
+    pool.drain()
+    with pytest.raises(RuntimeError):
+        pool.submit(VERIFY, 1)
+    with pytest.raises(ValueError):
+        pool.submit("refund", 1)
+
+
+def test_shard_for_is_stable():
+    assert shard_for(3714061657, 4) == 3714061657 % 4
+
+
+def test_worker_pool_reports_workers_failing_to_start():
+    pool = WorkerPool("zibal", processes=2, threads=1, client_kwargs={"bogus": 1})
+    with pytest.raises(WorkerError, match="failed to start"):
+        list(pool.verify_many([1, 2, 3]))
+    pool.terminate()
+
+
+def test_worker_pool_reports_dead_workers():
+    pool = WorkerPool(
+        "zibal", processes=2, threads=1, client_kwargs={"base_url": "http://127.0.0.1:9/"}
+    )
+    pool._workers[0].kill()
+    pool._workers[0].join()
+    with pytest.raises(WorkerError, match="Worker 0 has died"):
+        pool.drain()
+    assert not any(process.is_alive() for process in pool._workers)
+
+
+def test_unpicklable_results_are_reported_as_errors():
+    results = queue.Queue()
+    _put(results, (1, 123, lambda: None))
+    job_id, track_id, result = pickle.loads(results.get())
+    assert (job_id, track_id) == (1, 123)
+    assert isinstance(result, WorkerError)